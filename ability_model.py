@@ -0,0 +1,168 @@
+"""
+Online Elo-style ability and difficulty estimates
+
+Each student has an ability (theta) and each question a difficulty (b) on
+the same logit scale, as in a 1PL (Rasch) model: the expected chance of a
+correct answer is 1 / (1 + exp(b - theta)). Every graded answer moves both
+estimates towards the observed outcome, with a step size that shrinks as
+the student or question accumulates answers. A submission therefore costs
+one read and one write per question plus one for the student, and progress
+or calibration are single document reads.
+
+Documents:
+    student_abilities/{student_key}    theta, answered, correct, per-subject theta
+    question_calibration/{question_key} difficulty, attempts, correct
+"""
+import math
+import hashlib
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from names import normalize_name
+from config import ABILITY_K_BASE, ABILITY_K_DECAY
+
+
+def normalize_student_name(name):
+    """Case- and whitespace-insensitive form of a typed student name"""
+    return normalize_name(name)
+
+
+def student_key(student_name):
+    return hashlib.sha256(normalize_student_name(student_name).encode("utf-8")).hexdigest()[:32]
+
+
+def question_key(question):
+    """
+    Stable identifier for a question
+
+    Questions published since question IDs were introduced use their
+    question_id; older ones fall back to a hash of the question text.
+    """
+    if question.get("question_id"):
+        return question["question_id"]
+    text = " ".join(question.get("question", "").split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def expected_score(theta, difficulty):
+    return 1.0 / (1.0 + math.exp(difficulty - theta))
+
+
+def step_size(count):
+    """Learning rate that starts large and settles as evidence accumulates"""
+    return ABILITY_K_BASE / (1.0 + ABILITY_K_DECAY * count)
+
+
+def update_abilities(db, ticket, student_name, responses):
+    """
+    Apply one graded submission to the student's and questions' estimates
+
+    Estimates are read once and the changes written back as Increment
+    transforms in one batch, so concurrent submissions never overwrite
+    each other's updates.
+
+    Args:
+        db: Firestore client
+        ticket: Ticket dict whose questions the answers refer to
+        student_name: Name the student submitted with
+        responses: Answers keyed by question index (int or str)
+    """
+    questions = ticket.get("questions", [])
+    answered = []
+    for index, answer in responses.items():
+        index = int(index)
+        if index < len(questions):
+            question = questions[index]
+            answered.append((question, question_key(question), answer == question.get("correct_answer")))
+    if not answered:
+        return
+
+    student_ref = db.collection("student_abilities").document(student_key(student_name))
+    question_refs = [db.collection("question_calibration").document(key) for _, key, _ in answered]
+    snapshots = {snap.reference.path: snap for snap in db.get_all([student_ref] + question_refs)}
+
+    student_snap = snapshots.get(student_ref.path)
+    student = student_snap.to_dict() if student_snap and student_snap.exists else {}
+    theta = student.get("theta", 0.0)
+    k_student = step_size(student.get("answered", 0))
+
+    batch = db.batch()
+    theta_delta = 0.0
+    for (question, key, is_correct), ref in zip(answered, question_refs):
+        snap = snapshots.get(ref.path)
+        calibration = snap.to_dict() if snap and snap.exists else {}
+        difficulty = calibration.get("difficulty", 0.0)
+
+        surprise = is_correct - expected_score(theta, difficulty)
+        theta_delta += k_student * surprise
+        batch.set(ref, {
+            "difficulty": firestore.Increment(-step_size(calibration.get("attempts", 0)) * surprise),
+            "attempts": firestore.Increment(1),
+            "correct": firestore.Increment(int(is_correct)),
+            "question": question.get("question", "")[:200],
+            "subject": ticket.get("subject", ""),
+            "updated_at": datetime.now()
+        }, merge=True)
+
+    # Per-subject entries live in a map keyed by a short hash of the subject
+    subject = ticket.get("subject", "")
+    subject_id = hashlib.sha256(subject.encode("utf-8")).hexdigest()[:12]
+    batch.set(student_ref, {
+        "student_name": student.get("student_name") or student_name.strip(),
+        "theta": firestore.Increment(theta_delta),
+        "answered": firestore.Increment(len(answered)),
+        "correct": firestore.Increment(sum(1 for _, _, is_correct in answered if is_correct)),
+        "subjects": {subject_id: {
+            "subject": subject,
+            "theta": firestore.Increment(theta_delta),
+            "answered": firestore.Increment(len(answered))
+        }},
+        "updated_at": datetime.now()
+    }, merge=True)
+    batch.commit()
+
+
+def get_student_ability(db, student_name):
+    """
+    A student's current estimate
+
+    Returns:
+        dict: theta, answered, correct, mastery (expected % correct on an
+            average-difficulty question) and per-subject entries, or None
+    """
+    try:
+        snap = db.collection("student_abilities").document(student_key(student_name)).get()
+        if not snap.exists:
+            return None
+        ability = snap.to_dict()
+        ability["mastery"] = round(expected_score(ability.get("theta", 0.0), 0.0) * 100, 1)
+        ability["subjects"] = sorted(
+            ({**s, "mastery": round(expected_score(s.get("theta", 0.0), 0.0) * 100, 1)}
+             for s in ability.get("subjects", {}).values()),
+            key=lambda s: s["subject"])
+        return ability
+    except Exception as e:
+        print(f"Error retrieving student ability: {e}")
+        return None
+
+
+def get_question_calibration(db, questions):
+    """
+    Calibrated difficulty for each question, in the same order
+
+    Returns:
+        list: Calibration dicts (difficulty, attempts, correct), or None for
+            questions nobody has answered yet
+    """
+    try:
+        refs = [db.collection("question_calibration").document(question_key(q)) for q in questions]
+        snapshots = {snap.reference.path: snap for snap in db.get_all(refs)}
+        calibrations = []
+        for ref in refs:
+            snap = snapshots.get(ref.path)
+            calibrations.append(snap.to_dict() if snap and snap.exists else None)
+        return calibrations
+    except Exception as e:
+        print(f"Error retrieving question calibration: {e}")
+        return [None] * len(questions)
@@ -0,0 +1,363 @@
+"""
+Local SQLite mirror of tickets, responses and the question bank
+
+Ad-hoc questions such as "which subtopics did section B struggle with this
+month" would otherwise mean streaming whole collections out of Firestore.
+sync_mirror copies tickets, student responses and all_questions into a
+SQLite file (ANALYTICS_MIRROR_PATH), flattening every response into one
+row per answered question, and the query helpers below aggregate over it
+at local-disk speed.
+
+Syncs are incremental: each collection keeps a watermark (the newest
+created/updated/completed timestamp seen) and the next run only reads
+documents changed since then, minus MIRROR_SYNC_OVERLAP seconds to allow
+for clock skew between writers. Rows are upserted, so the overlap is
+harmless. Deletes are not visible to a timestamp query; run with --full
+now and then (e.g. after archiving) to rebuild the mirror from scratch.
+
+    python analytics_mirror.py            # incremental sync
+    python analytics_mirror.py --full     # drop and reload everything
+"""
+import sqlite3
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from firebase_helper import init_firestore, all_responses, match_response_answers
+from ability_model import question_key
+from config import ANALYTICS_MIRROR_PATH, MIRROR_SYNC_OVERLAP
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id TEXT PRIMARY KEY,
+    title TEXT,
+    subject TEXT,
+    teacher_name TEXT,
+    status TEXT,
+    roster_id TEXT,
+    version INTEGER,
+    total_questions INTEGER,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS ticket_questions (
+    ticket_id TEXT,
+    question_index INTEGER,
+    question_id TEXT,
+    question TEXT,
+    topic TEXT,
+    subtopic TEXT,
+    correct_answer TEXT,
+    PRIMARY KEY (ticket_id, question_index)
+);
+CREATE TABLE IF NOT EXISTS responses (
+    response_id TEXT PRIMARY KEY,
+    ticket_id TEXT,
+    student_name TEXT,
+    correct_count INTEGER,
+    total_questions INTEGER,
+    percentage REAL,
+    completed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS response_answers (
+    response_id TEXT,
+    ticket_id TEXT,
+    question_index INTEGER,
+    answer TEXT,
+    PRIMARY KEY (response_id, question_index)
+);
+CREATE TABLE IF NOT EXISTS questions (
+    doc_id TEXT PRIMARY KEY,
+    subject TEXT,
+    topic TEXT,
+    subtopic TEXT,
+    question TEXT,
+    correct_answer TEXT,
+    source TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    collection TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_teacher ON tickets (teacher_name);
+CREATE INDEX IF NOT EXISTS idx_responses_ticket ON responses (ticket_id);
+CREATE INDEX IF NOT EXISTS idx_responses_completed ON responses (completed_at);
+CREATE INDEX IF NOT EXISTS idx_answers_ticket ON response_answers (ticket_id, question_index);
+"""
+
+MIRROR_TABLES = ("tickets", "ticket_questions", "responses", "response_answers", "questions", "sync_state")
+
+
+def _as_utc(value):
+    """Firestore returns aware datetimes, while naive ones were written as UTC"""
+    if not isinstance(value, datetime):
+        return None
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _sql_time(value):
+    """Timestamp as UTC text that sorts correctly and works with SQLite date functions"""
+    value = _as_utc(value)
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+def connect(path=None):
+    """Open the mirror (ANALYTICS_MIRROR_PATH by default), creating its tables on first use"""
+    conn = sqlite3.connect(path or ANALYTICS_MIRROR_PATH)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_watermark(conn, collection):
+    row = conn.execute("SELECT watermark FROM sync_state WHERE collection = ?", (collection,)).fetchone()
+    return datetime.fromisoformat(row["watermark"]) if row and row["watermark"] else None
+
+
+def _set_watermark(conn, collection, watermark):
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_state (collection, watermark, synced_at) VALUES (?, ?, ?)",
+        (collection, watermark.isoformat() if watermark else None, _sql_time(datetime.now(timezone.utc))))
+
+
+def _changed_docs(query, fields, since):
+    """
+    Documents of a query changed since a watermark, deduplicated by path
+
+    Each timestamp field is queried separately (a document matches if any
+    of them is newer), since Firestore cannot OR range filters on
+    different fields.
+    """
+    if since is None:
+        return {doc.reference.path: doc for doc in query.stream()}
+    since = since - timedelta(seconds=MIRROR_SYNC_OVERLAP)
+    docs = {}
+    for field in fields:
+        for doc in query.where(filter=FieldFilter(field, ">=", since)).stream():
+            docs[doc.reference.path] = doc
+    return docs
+
+
+def _newest(current, data, fields):
+    for field in fields:
+        value = _as_utc(data.get(field))
+        if value and (current is None or value > current):
+            current = value
+    return current
+
+
+def sync_tickets(db, conn):
+    fields = ("created_at", "updated_at")
+    watermark = get_watermark(conn, "tickets")
+    docs = _changed_docs(db.collection("tickets"), fields, watermark)
+
+    for doc in docs.values():
+        ticket = doc.to_dict()
+        ticket_id = ticket.get("ticket_id", doc.id)
+        conn.execute(
+            "INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (ticket_id, ticket.get("title", ""), ticket.get("subject", ""), ticket.get("teacher_name", ""),
+             ticket.get("status", ""), ticket.get("roster_id"), ticket.get("version", 1),
+             ticket.get("total_questions", 0), _sql_time(ticket.get("created_at")),
+             _sql_time(ticket.get("updated_at"))))
+        # Edits can change topics and answer keys, so a ticket's questions are replaced whole
+        conn.execute("DELETE FROM ticket_questions WHERE ticket_id = ?", (ticket_id,))
+        conn.executemany(
+            "INSERT INTO ticket_questions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(ticket_id, index, question_key(q), q.get("question", ""), q.get("topic") or "General",
+              q.get("subtopic") or "General", q.get("correct_answer"))
+             for index, q in enumerate(ticket.get("questions", []))])
+        watermark = _newest(watermark, ticket, fields)
+
+    _set_watermark(conn, "tickets", watermark)
+    return len(docs)
+
+
+def _mirrored_questions(conn, ticket_id, cache):
+    """A ticket's question references as stored in the mirror, for matching answers"""
+    if ticket_id not in cache:
+        rows = conn.execute(
+            "SELECT question_index, question_id FROM ticket_questions WHERE ticket_id = ? ORDER BY question_index",
+            (ticket_id,)).fetchall()
+        cache[ticket_id] = ([None] * len(rows), {row["question_id"]: row["question_index"] for row in rows})
+    return cache[ticket_id]
+
+
+def sync_responses(db, conn):
+    """Mirror responses changed since the last sync (run after sync_tickets)"""
+    fields = ("completed_at", "regraded_at")
+    watermark = get_watermark(conn, "responses")
+    docs = _changed_docs(all_responses(db), fields, watermark)
+
+    ticket_cache = {}
+    for path, doc in docs.items():
+        response = doc.to_dict()
+        ticket_id = response.get("ticket_id", "")
+        score = response.get("score", {})
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, ticket_id, response.get("student_name", ""), score.get("correct_count", 0),
+             score.get("total_questions", 0), score.get("percentage", 0),
+             _sql_time(response.get("completed_at"))))
+
+        questions, key_index = _mirrored_questions(conn, ticket_id, ticket_cache)
+        conn.execute("DELETE FROM response_answers WHERE response_id = ?", (path,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO response_answers VALUES (?, ?, ?, ?)",
+            [(path, ticket_id, index, answer)
+             for index, answer in match_response_answers(response, questions, key_index)])
+        watermark = _newest(watermark, response, fields)
+
+    _set_watermark(conn, "responses", watermark)
+    return len(docs)
+
+
+def sync_questions(db, conn):
+    fields = ("created_at",)
+    watermark = get_watermark(conn, "all_questions")
+    docs = _changed_docs(db.collection("all_questions"), fields, watermark)
+
+    rows = []
+    for doc in docs.values():
+        question = doc.to_dict()
+        rows.append((doc.id, question.get("subject", ""), question.get("topic") or "General",
+                     question.get("subtopic") or "General", question.get("question", ""),
+                     question.get("correct_answer"), question.get("source", ""),
+                     _sql_time(question.get("created_at"))))
+        watermark = _newest(watermark, question, fields)
+    conn.executemany("INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    _set_watermark(conn, "all_questions", watermark)
+    return len(docs)
+
+
+def sync_mirror(db, path=None, full=False):
+    """
+    Bring the local mirror up to date
+
+    Args:
+        db: Firestore client
+        path: SQLite file of the mirror (ANALYTICS_MIRROR_PATH by default)
+        full: Drop everything and reload, picking up deleted documents
+
+    Returns:
+        dict: Number of documents read per collection, or None on error
+    """
+    conn = connect(path)
+    try:
+        with conn:
+            if full:
+                for table in MIRROR_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+            # Tickets first: responses are matched against the mirrored questions
+            return {
+                "tickets": sync_tickets(db, conn),
+                "responses": sync_responses(db, conn),
+                "all_questions": sync_questions(db, conn)
+            }
+    except Exception as e:
+        print(f"Error syncing analytics mirror: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def query(conn, sql, params=()):
+    """Run an ad-hoc SQL query against the mirror and return the rows as dicts"""
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def subtopic_performance(conn, teacher_name=None, subject=None, roster_id=None, since=None, until=None):
+    """
+    Accuracy per topic and subtopic, weakest first
+
+    Args:
+        conn: Mirror connection from connect()
+        teacher_name: Only tickets of this teacher
+        subject: Only tickets of this subject
+        roster_id: Only tickets assigned to this class roster
+        since: Only responses completed at or after this datetime
+        until: Only responses completed before this datetime
+
+    Returns:
+        list: {"subject", "topic", "subtopic", "attempts", "correct", "accuracy", "students"}
+    """
+    filters = []
+    params = []
+    for column, value in (("t.teacher_name", teacher_name), ("t.subject", subject), ("t.roster_id", roster_id)):
+        if value:
+            filters.append(f"{column} = ?")
+            params.append(value)
+    if since:
+        filters.append("r.completed_at >= ?")
+        params.append(_sql_time(since))
+    if until:
+        filters.append("r.completed_at < ?")
+        params.append(_sql_time(until))
+
+    sql = f"""
+        SELECT t.subject, q.topic, q.subtopic,
+               COUNT(*) AS attempts,
+               SUM(a.answer = q.correct_answer) AS correct,
+               ROUND(100.0 * SUM(a.answer = q.correct_answer) / COUNT(*), 1) AS accuracy,
+               COUNT(DISTINCT LOWER(TRIM(r.student_name))) AS students
+        FROM response_answers a
+        JOIN responses r ON r.response_id = a.response_id
+        JOIN tickets t ON t.ticket_id = a.ticket_id
+        JOIN ticket_questions q ON q.ticket_id = a.ticket_id AND q.question_index = a.question_index
+        {"WHERE " + " AND ".join(filters) if filters else ""}
+        GROUP BY t.subject, q.topic, q.subtopic
+        ORDER BY accuracy ASC, attempts DESC
+    """
+    return query(conn, sql, params)
+
+
+def student_performance(conn, teacher_name=None, roster_id=None, since=None):
+    """Submissions and average score per student, lowest average first"""
+    filters = []
+    params = []
+    for column, value in (("t.teacher_name", teacher_name), ("t.roster_id", roster_id)):
+        if value:
+            filters.append(f"{column} = ?")
+            params.append(value)
+    if since:
+        filters.append("r.completed_at >= ?")
+        params.append(_sql_time(since))
+
+    sql = f"""
+        SELECT MIN(r.student_name) AS student_name,
+               COUNT(*) AS submissions,
+               ROUND(AVG(r.percentage), 1) AS average_score,
+               MAX(r.completed_at) AS last_submission
+        FROM responses r
+        JOIN tickets t ON t.ticket_id = r.ticket_id
+        {"WHERE " + " AND ".join(filters) if filters else ""}
+        GROUP BY LOWER(TRIM(r.student_name))
+        ORDER BY average_score ASC
+    """
+    return query(conn, sql, params)
+
+
+def last_synced(conn):
+    """When the mirror was last synced (UTC text), or None if it never was"""
+    row = conn.execute("SELECT MIN(synced_at) AS synced_at FROM sync_state").fetchone()
+    return row["synced_at"] if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the local SQLite analytics mirror from Firestore")
+    parser.add_argument("--path", default=ANALYTICS_MIRROR_PATH, help="Mirror database file")
+    parser.add_argument("--full", action="store_true", help="Rebuild the mirror from scratch")
+    args = parser.parse_args()
+
+    counts = sync_mirror(init_firestore(), args.path, args.full)
+    if counts is None:
+        raise SystemExit(1)
+    print(", ".join(f"{count} {collection}" for collection, count in counts.items()) + f" synced to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
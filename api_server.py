@@ -0,0 +1,226 @@
+"""
+Lightweight HTTP API for taking exit tickets without a Streamlit session
+
+Endpoints:
+    GET  /tickets/{ticket_id}            Ticket questions (without answers), with ETag
+    POST /tickets/{ticket_id}/responses  {"student_name": ..., "answers": {"0": "B", ...}}
+    GET  /health                         Liveness probe
+
+Answers are keyed by the question's index in the ticket's question list.
+Scores are computed on the server and the per-question feedback is
+returned with the submission result.
+
+Unlike the Streamlit quiz, the API does not hand each student a balanced
+subset of QUESTIONS_PER_STUDENT questions: it serves and grades the whole
+ticket. A submission is scored out of every question on the ticket, with
+questions left out counted as wrong, and the stored response lists every
+question (unanswered ones as UNANSWERED_CODE), so regrading uses the same
+denominator. On tickets longer than QUESTIONS_PER_STUDENT, API scores are
+therefore out of more questions than app scores.
+
+Run with any ASGI server, e.g.:
+    uvicorn api_server:app --workers 4
+"""
+import json
+import time
+import asyncio
+import hashlib
+import threading
+
+from firebase_helper import init_firestore, get_exit_ticket, save_student_response
+
+from config import API_TICKET_CACHE_TTL
+
+db = init_firestore()
+
+_ticket_cache = {}
+_ticket_cache_lock = threading.Lock()
+
+
+def load_ticket(ticket_id):
+    """Return (ticket, etag) from a short-lived in-process cache, or (None, None)"""
+    ticket_id = ticket_id.upper().strip()
+    now = time.monotonic()
+    with _ticket_cache_lock:
+        cached = _ticket_cache.get(ticket_id)
+        if cached and cached[2] > now:
+            return cached[0], cached[1]
+
+    ticket = get_exit_ticket(db, ticket_id)
+    if not ticket:
+        return None, None
+
+    body = public_ticket(ticket)
+    etag = '"' + hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:32] + '"'
+    with _ticket_cache_lock:
+        _ticket_cache[ticket_id] = (ticket, etag, now + API_TICKET_CACHE_TTL)
+    return ticket, etag
+
+
+def ticket_is_active(ticket_id):
+    """
+    Read a ticket's current status, bypassing the cache
+
+    Submissions check this so a deactivated ticket stops accepting them
+    at once rather than after API_TICKET_CACHE_TTL; a closed ticket is
+    dropped from the cache so GET reports it too.
+    """
+    ticket_id = ticket_id.upper().strip()
+    try:
+        snap = db.collection("tickets").document(ticket_id).get(field_paths=["status"])
+        active = snap.exists and snap.to_dict().get("status") == "active"
+    except Exception as e:
+        print(f"Error checking ticket status: {e}")
+        return False
+    if not active:
+        with _ticket_cache_lock:
+            _ticket_cache.pop(ticket_id, None)
+    return active
+
+
+def public_ticket(ticket):
+    """Ticket fields safe to send to students (no answer key)"""
+    return {
+        "ticket_id": ticket["ticket_id"],
+        "title": ticket.get("title", "Exit Ticket"),
+        "subject": ticket.get("subject", ""),
+        "teacher_name": ticket.get("teacher_name", ""),
+        "status": ticket.get("status", "unknown"),
+        "questions": [
+            {"index": i, "question_id": q.get("question_id"), "question": q["question"], "options": q["options"]}
+            for i, q in enumerate(ticket.get("questions", []))
+        ]
+    }
+
+
+def grade_submission(ticket, answers):
+    """
+    Score answers keyed by question index against the ticket's answer key
+
+    Every question served counts towards the total; a question without an
+    answer is graded as wrong.
+
+    Returns:
+        tuple: (answers by index, score data, feedback for every question)
+
+    Raises:
+        ValueError: If a key is not a question index or an answer is not
+            one of that question's option keys
+    """
+    questions = ticket.get("questions", [])
+    graded = {}
+    for key, answer in answers.items():
+        try:
+            index = int(key)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{key}' is not a question index")
+        if not 0 <= index < len(questions):
+            raise ValueError(f"This ticket has no question {index}")
+        if not isinstance(answer, str) or answer not in questions[index]["options"]:
+            raise ValueError(f"Answer to question {index} must be one of {', '.join(questions[index]['options'])}")
+        graded[index] = answer
+
+    feedback = [{
+        "index": index,
+        "answer": graded.get(index),
+        "correct_answer": question["correct_answer"],
+        "is_correct": graded.get(index) == question["correct_answer"],
+        "explanation": question.get("explanation", "")
+    } for index, question in enumerate(questions)]
+
+    correct_count = sum(1 for item in feedback if item["is_correct"])
+    total_questions = len(questions)
+    score_data = {
+        "correct_count": correct_count,
+        "total_questions": total_questions,
+        "percentage": (correct_count / total_questions) * 100 if total_questions else 0
+    }
+    return graded, score_data, feedback
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def send_json(send, status, payload=None, headers=None):
+    body = b"" if payload is None else json.dumps(payload, default=str).encode("utf-8")
+    response_headers = [(b"content-type", b"application/json")]
+    for name, value in (headers or {}).items():
+        response_headers.append((name.encode("latin-1"), value.encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def handle_get_ticket(scope, send, ticket_id):
+    ticket, etag = await asyncio.to_thread(load_ticket, ticket_id)
+    if not ticket:
+        await send_json(send, 404, {"error": "Ticket not found"})
+        return
+
+    cache_headers = {"etag": etag, "cache-control": f"public, max-age={API_TICKET_CACHE_TTL}"}
+    request_headers = dict(scope.get("headers", []))
+    if request_headers.get(b"if-none-match", b"").decode("latin-1") == etag:
+        await send_json(send, 304, headers=cache_headers)
+        return
+
+    await send_json(send, 200, public_ticket(ticket), headers=cache_headers)
+
+
+async def handle_submit(receive, send, ticket_id):
+    try:
+        payload = json.loads(await read_body(receive) or b"{}")
+    except ValueError:
+        await send_json(send, 400, {"error": "Request body must be JSON"})
+        return
+
+    student_name = str(payload.get("student_name", "")).strip()
+    answers = payload.get("answers")
+    if not student_name or not isinstance(answers, dict) or not answers:
+        await send_json(send, 400, {"error": "student_name and answers are required"})
+        return
+
+    ticket, _ = await asyncio.to_thread(load_ticket, ticket_id)
+    if not ticket:
+        await send_json(send, 404, {"error": "Ticket not found"})
+        return
+    if not await asyncio.to_thread(ticket_is_active, ticket_id):
+        await send_json(send, 403, {"error": "This exit ticket is no longer active"})
+        return
+
+    try:
+        graded, score_data, feedback = grade_submission(ticket, answers)
+    except ValueError as e:
+        await send_json(send, 400, {"error": str(e)})
+        return
+
+    saved = await asyncio.to_thread(save_student_response, db, ticket["ticket_id"], student_name, graded, score_data,
+                                    ticket)
+    if not saved:
+        await send_json(send, 409, {"error": "You have already completed this exit ticket"})
+        return
+
+    await send_json(send, 201, {"saved": True, "score": score_data, "feedback": feedback})
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] != "http":
+        return
+
+    method = scope["method"]
+    parts = [part for part in scope["path"].split("/") if part]
+
+    if parts == ["health"]:
+        await send_json(send, 200, {"status": "ok"})
+    elif len(parts) == 2 and parts[0] == "tickets" and method == "GET":
+        await handle_get_ticket(scope, send, parts[1])
+    elif len(parts) == 3 and parts[0] == "tickets" and parts[2] == "responses" and method == "POST":
+        await handle_submit(receive, send, parts[1])
+    else:
+        await send_json(send, 404, {"error": "Not found"})
@@ -5,13 +5,14 @@ from profile_pannel import create_user_account
 import google.generativeai as genai
 import json
 import os
-import random
 import time
 
 st.set_page_config(page_title="Exit Ticket Generator", layout="wide")
 
-from config import DEFAULT_QUESTIONS_COUNT
+from config import DEFAULT_QUESTIONS_COUNT, CLIENT_SIDE_QUIZ, QUESTIONS_PER_STUDENT
 from ui import app_ui
+from mcq_generator import build_mcq_prompt, parse_mcq_response
+from perf_log import timed
 
 db = init_firestore()
 
@@ -74,83 +75,56 @@ GOOGLE_API_KEY = st.secrets["api_keys"]["google_api_key"]
 if GOOGLE_API_KEY:
     genai.configure(api_key=GOOGLE_API_KEY)
 
-# Enhanced system prompt for better API integration
-SYSTEM_PROMPT = """You are a highly qualified MCQ generator for an engineering college lecture. Your task is to create exactly {num_questions} multiple-choice questions (MCQs) based strictly on the list of topics provided from a lecture. These MCQs serve as exit ticket questions to assess students' understanding of core concepts.
-
-Instructions:
-- Only use concepts that were explicitly covered in the given topic list
-- Do not include or infer content beyond the provided topics
-- Focus on the most essential technical points, definitions, principles, or equations
-- Each question must have one correct answer and three plausible distractors
-- The correct answer must be factually accurate
-- Write short, clear, and professional questions and answer choices
-- Use standard engineering terminology and units
-- Keep all technical details precise and concise
-
-Output Format (JSON):
-{
-  "questions": [
-    {
-      "question": "Question text here?",
-      "options": {
-        "A": "Option A text",
-        "B": "Option B text", 
-        "C": "Option C text",
-        "D": "Option D text"
-      },
-      "correct_answer": "C",
-      "explanation": "Brief explanation of why this answer is correct",
-      "topic": "Main topic of the question",
-      "subtopic": "Subtopic or Specific concept of focus area"
-    }
-  ]
-}
-
-Requirements:
-- Return ONLY valid JSON format
-- Ensure all questions are relevant to the provided topics and the subject
-- Do not deviate and hallucinate from the subject
-- Make explanations educational and clear
-- Each question MUST include both a "topic" and "subtopic" field. These are mandatory.
-- Use engineering-appropriate language and precision"""
-
-def generate_mcqs(lecture_topics, ai_instructions, num_questions, subject):
-    """Generate MCQs using Google AI Studio"""
+def generate_mcqs(lecture_topics, ai_instructions, num_questions, subject, call_type="ticket", existing_questions=None):
+    """Generate MCQs, billing the model calls to the signed-in teacher
+
+    Usage of every generation and regeneration for the current draft adds
+    up in session state and is stored on the ticket when it is published.
+    """
+    import uuid
+    from usage_tracking import usage_scope, merge_usage
+    
+    if 'generation_draft_id' not in st.session_state:
+        st.session_state.generation_draft_id = uuid.uuid4().hex
+    teacher_name = st.session_state.get('username', 'Unknown Teacher')
+    with usage_scope(db, teacher_name, st.session_state.generation_draft_id) as usage:
+        mcqs = request_mcqs(lecture_topics, ai_instructions, num_questions, subject, call_type, existing_questions)
+    st.session_state.generation_usage = merge_usage(st.session_state.get('generation_usage'), usage.totals)
+    return mcqs
+
+def request_mcqs(lecture_topics, ai_instructions, num_questions, subject, call_type="ticket", existing_questions=None):
+    """Generate MCQs using Google AI Studio
+
+    call_type selects the model tier from MODEL_ROUTES in config.py.
+    existing_questions lists question texts the new MCQs must not duplicate.
+    """
+    from usage_tracking import BudgetExceededError
     try:
         if not GOOGLE_API_KEY:
             st.error("Google API key not found. Please set GOOGLE_API_KEY in your environment variables.")
             return None
         
+        # Long transcripts are condensed into a topic list first (cached per chunk)
+        from lecture_ingest import needs_ingestion, condense_lecture_topics
+        if needs_ingestion(lecture_topics):
+            progress = st.progress(0.0, text="Condensing long lecture notes...")
+            lecture_topics = condense_lecture_topics(
+                lecture_topics, db,
+                lambda done, total: progress.progress(done / total, text=f"Condensing lecture notes ({done}/{total} sections)...")
+            )
+            progress.empty()
+        
         # Create the prompt with system prompt
-        prompt = f"""{SYSTEM_PROMPT}
-
-Subject:
-{subject}
-
-Lecture Topics:
-{lecture_topics}
-
-Additional Instructions:
-{ai_instructions if ai_instructions.strip() else "No additional instructions provided."}
-
-Please generate exactly {num_questions} MCQs based on the above topics and instructions. Do not generate fewer or more.
+        prompt = build_mcq_prompt(lecture_topics, ai_instructions, num_questions, subject,
+                                  existing_questions=existing_questions)
 
-Return ONLY the JSON format as specified above."""
-
-        # Generate response using Gemini
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        response = model.generate_content(prompt)
+        # Generate response using the routed Gemini model (falls back on timeout)
+        from model_router import generate_content
+        response, model_name = generate_content(prompt, call_type=call_type)
         
         # Parse JSON response
         try:
-            # Extract JSON from response
-            response_text = response.text
-            # Find JSON content (handle cases where response might have extra text)
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            json_str = response_text[start_idx:end_idx]
-            
-            mcqs = json.loads(json_str)
+            mcqs = parse_mcq_response(response.text)
             
             from firebase_helper import save_question
             for q in mcqs.get("questions", []):
@@ -165,28 +139,51 @@ Return ONLY the JSON format as specified above."""
             st.text(response.text)
             return None
             
+    except BudgetExceededError as e:
+        st.error(f"💸 {e}")
+        return None
     except Exception as e:
         st.error(f"Error generating MCQs: {e}")
         return None
 
 def regenerate_teacher_question(question_index, subject, topics, instructions):
-    """Regenerate a single question for teachers"""
-    with st.spinner("🔄 Regenerating question..."):
-        # Generate a single question
-        mcqs = generate_mcqs(topics, instructions, 1, subject)
+    """Regenerate a single question for teachers (called from its card fragment)"""
+    regenerate_teacher_questions([question_index], subject, topics, instructions, rerun_scope="fragment")
+
+def regenerate_teacher_questions(question_indices, subject, topics, instructions, rerun_scope="app"):
+    """Regenerate several questions for teachers with a single model call"""
+    all_mcqs = st.session_state.teacher_all_mcqs
+    question_indices = sorted(set(question_indices))
+    retained = [q['question'] for i, q in enumerate(all_mcqs) if i not in question_indices]
+
+    spinner_text = "🔄 Regenerating question..." if len(question_indices) == 1 else f"🔄 Regenerating {len(question_indices)} questions..."
+    with st.spinner(spinner_text):
+        # Ask for all replacements at once on the fast model tier
+        mcqs = generate_mcqs(topics, instructions, len(question_indices), subject,
+                             call_type="regenerate", existing_questions=retained)
         
         if mcqs and 'questions' in mcqs and len(mcqs['questions']) > 0:
-            # Replace the question at the given index
-            st.session_state.teacher_all_mcqs[question_index] = mcqs['questions'][0]
-            st.success("✅ Question regenerated successfully!")
-            st.rerun()
+            replacements = mcqs['questions']
+            if len(replacements) < len(question_indices):
+                st.warning(f"Only {len(replacements)} of {len(question_indices)} questions could be regenerated.")
+            
+            # Swap the replacements in at the selected positions
+            for question_index, new_question in zip(question_indices, replacements):
+                st.session_state.teacher_all_mcqs[question_index] = new_question
+                st.session_state.pop(f"teacher_regen_select_{question_index}", None)
+            
+            st.success("✅ Questions regenerated successfully!" if len(question_indices) > 1 else "✅ Question regenerated successfully!")
+            st.rerun(scope=rerun_scope)
         else:
             st.error("Failed to regenerate question. Please try again.")
 
 
+@timed("full_run")
 def main():
     from login_page import login
     
+    # Global styles are injected once per script run here; fragment reruns
+    # don't execute main(), so they never resend this stylesheet
     st.markdown(
         app_ui,
         unsafe_allow_html=True
@@ -198,15 +195,19 @@ def main():
         layout="wide"
     )
     
-    # If not logged in, show login
+    # If not logged in, try the stored session before showing login
     if not st.session_state.get("logged_in", False):
-        login()
-        return
+        from login_page import restore_session
+        if not restore_session():
+            login()
+            return
     
     # Show sidebar info and logout button
     st.sidebar.success(f"Logged in as {st.session_state.get('role')} ({st.session_state.get('username')})")
     
     if st.sidebar.button("🚪 Logout"):
+        from login_page import logout
+        logout()
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.rerun()
@@ -223,7 +224,7 @@ def main():
 
 def teacher_dashboard():
     st.sidebar.title("👩‍🏫 Teacher Dashboard")
-    page = st.sidebar.radio("Navigate", ["📘 Create Exit Ticket", "🎫 My Published Tickets"])
+    page = st.sidebar.radio("Navigate", ["📘 Create Exit Ticket", "🎫 My Published Tickets", "🧭 Topic Mastery", "👥 Class Rosters", "💰 AI Usage"])
     
     if page == "📘 Create Exit Ticket":
         st.title("🎓 Create Exit Ticket")
@@ -254,6 +255,15 @@ def teacher_dashboard():
     
     elif page == "🎫 My Published Tickets":
         view_published_tickets_page()
+    
+    elif page == "🧭 Topic Mastery":
+        view_topic_mastery_page()
+    
+    elif page == "👥 Class Rosters":
+        view_rosters_page()
+    
+    elif page == "💰 AI Usage":
+        view_ai_usage_page()
 
 def student_dashboard():
     st.sidebar.title("🎓 Student Dashboard")
@@ -280,10 +290,10 @@ def student_dashboard():
             show_ticket_input_page()
 
         elif not st.session_state.ticket_quiz_completed:
-            # 🔁 Randomly select only 3 questions once
+            # 🔁 Assign a balanced subset of questions once
             if 'ticket_initialized' not in st.session_state:
-                all_questions = st.session_state.ticket_data['questions']
-                st.session_state.ticket_data['questions'] = random.sample(all_questions, min(3, len(all_questions)))
+                from question_assignment import assign_questions
+                st.session_state.ticket_data['questions'] = assign_questions(db, st.session_state.ticket_data, QUESTIONS_PER_STUDENT)
                 st.session_state.ticket_current_question = 0
                 st.session_state.ticket_user_answers = {}
                 st.session_state.ticket_quiz_completed = False
@@ -295,15 +305,30 @@ def student_dashboard():
             show_ticket_results_page()
     
 
+def read_lecture_files(uploaded_files):
+    """Extracted text of each uploaded lecture file, or None if one could not be read"""
+    from lecture_files import load_lecture_file
+    
+    texts = []
+    with st.spinner("📄 Reading lecture files..."):
+        for uploaded in uploaded_files:
+            try:
+                result = load_lecture_file(uploaded, uploaded.name, db)
+            except ValueError as e:
+                st.error(f"❌ {uploaded.name}: {e}")
+                return None
+            if not result['text']:
+                st.warning(f"⚠️ No text found in {uploaded.name} (scanned PDFs are not supported)")
+                continue
+            if result['truncated']:
+                st.warning(f"⚠️ {uploaded.name} is very long; only its beginning was used")
+            texts.append(f"From {uploaded.name}:\n{result['text']}")
+    return texts
+
 def show_teacher_input_page():
     """Input page specifically for teachers"""
     from config import DEFAULT_QUESTIONS_COUNT
     
-    st.markdown(
-        app_ui,
-        unsafe_allow_html=True
-    )
-    
     st.markdown("Enter all details marked with `*` to generate MCQs")
     st.header("📝 Enter Lecture Information")
     
@@ -324,6 +349,13 @@ def show_teacher_input_page():
             height=100,
             help="Include all important topics, definitions, formulas, and concepts that were covered"
         )
+        from lecture_files import SUPPORTED_EXTENSIONS
+        uploaded_files = st.file_uploader(
+            "...or upload slides, PDFs or notes",
+            type=list(SUPPORTED_EXTENSIONS),
+            accept_multiple_files=True,
+            help="Text is extracted from each file and added to the summary above"
+        )
         
         ai_instruction_options = {
             "None": "",
@@ -357,10 +389,20 @@ def show_teacher_input_page():
         submitted = st.form_submit_button("🚀 Generate MCQs", type="primary")
         
         if submitted:
+            if uploaded_files:
+                file_texts = read_lecture_files(uploaded_files)
+                if file_texts is None:
+                    return
+                lecture_topics = "\n\n".join(part for part in [lecture_topics.strip()] + file_texts if part)
+            
             if not lecture_topics.strip():
                 st.error("Please enter lecture topics to generate MCQs.")
                 return
             
+            # A new draft starts here; drop usage left by abandoned drafts or failed publishes
+            st.session_state.pop('generation_draft_id', None)
+            st.session_state.pop('generation_usage', None)
+            
             with st.spinner("🤖 Generating MCQs with AI..."):
                 mcqs = generate_mcqs(lecture_topics, ai_instructions, num_questions, subject)
                 
@@ -398,78 +440,20 @@ def show_teacher_questions_page():
     st.markdown(f"**Total Questions Generated:** {len(all_mcqs)}")
     st.markdown("---")
 
-    for i, question_data in enumerate(all_mcqs):
-        edit_key = f"teacher_edit_mode_{i}"
-        if edit_key not in st.session_state:
-            st.session_state[edit_key] = False
-
-        with st.expander(f"Question {i + 1}: {question_data['question'][:50]}..."):
-            if not st.session_state[edit_key]:
-                st.markdown(f"**Question:** {question_data['question']}")
-
-                for option, text in question_data['options'].items():
-                    if option == question_data['correct_answer']:
-                        st.markdown(f"✅ **{option}) {text}** (Correct Answer)")
-                    else:
-                        st.markdown(f"{option}) {text}")
-
-                st.markdown(f"**Explanation:** {question_data.get('explanation', 'No explanation provided.')}")
-                st.markdown(f"**Topic:** {question_data.get('topic', 'Unknown')}")
-                st.markdown(f"**Subtopic:** {question_data.get('subtopic', 'Unknown')}")
-
-                col1, col2 = st.columns([1, 1])
-                with col1:
-                    if st.button("✏️ Edit", key=f"teacher_edit_btn_{i}"):
-                        st.session_state[edit_key] = True
-                with col2:
-                    if st.button("🔁 Regenerate", key=f"teacher_regen_{i}"):
-                        regenerate_teacher_question(i, subject, topics, instructions)
-
-            else:
-                # EDIT MODE
-                st.markdown("### ✏️ Editing Mode")
-                edited_question = st.text_area("Edit Question", question_data['question'], key=f"teacher_q_text_{i}")
-
-                edited_options = {}
-                correct_option = st.selectbox(
-                    "Correct Answer",
-                    list(question_data['options'].keys()),
-                    index=list(question_data['options'].keys()).index(question_data['correct_answer']),
-                    key=f"teacher_correct_{i}"
-                )
-
-                for option in sorted(question_data['options'].keys()):
-                    edited_options[option] = st.text_input(
-                        f"Option {option}",
-                        value=question_data['options'][option],
-                        key=f"teacher_opt_{i}_{option}"
-                    )
-
-                edited_explanation = st.text_area("Explanation", question_data.get('explanation', ''), key=f"teacher_exp_{i}")
-                edited_topic = st.text_input("Topic", question_data.get('topic', ''), key=f"teacher_topic_{i}")
-                edited_subtopic = st.text_input("Subtopic", question_data.get('subtopic', ''), key=f"teacher_subtopic_{i}")
-
-                col1, col2 = st.columns([1, 1])
-                with col1:
-                    if st.button("💾 Save", key=f"teacher_save_{i}"):
-                        st.session_state.teacher_all_mcqs[i] = {
-                            "question": edited_question,
-                            "options": edited_options,
-                            "correct_answer": correct_option,
-                            "explanation": edited_explanation,
-                            "topic": edited_topic,
-                            "subtopic": edited_subtopic,
-                        }
-                        st.session_state[edit_key] = False
-                        st.success("✅ Question updated.")
-                        st.rerun()
-                with col2:
-                    if st.button("❌ Cancel", key=f"teacher_cancel_{i}"):
-                        st.session_state[edit_key] = False
-                        st.rerun()
+    # Each card is its own fragment, so editing one question reruns only that card
+    for i in range(len(all_mcqs)):
+        show_teacher_question_card(i)
 
     st.markdown("---")
 
+    # Selections change inside the card fragments, so read them at click time
+    if st.button("🔁 Regenerate Selected", key="teacher_regen_selected_btn"):
+        selected_indices = [i for i in range(len(all_mcqs)) if st.session_state.get(f"teacher_regen_select_{i}", False)]
+        if selected_indices:
+            regenerate_teacher_questions(selected_indices, subject, topics, instructions)
+        else:
+            st.warning("Select at least one question to regenerate.")
+
     col1, col2 = st.columns([1, 1])
     with col1:
         if st.button("🔄 Generate New Set", key="teacher_generate_new_btn"):
@@ -489,9 +473,120 @@ def show_teacher_questions_page():
             # st.rerun()
 
     with col2:
+        from rosters import get_rosters_by_teacher
+        rosters = get_rosters_by_teacher(db, st.session_state.get('username', 'Unknown Teacher'))
+        if rosters:
+            roster_names = {r['roster_id']: r.get('name', 'Untitled') for r in rosters}
+            st.selectbox(
+                "Class roster",
+                [None] + list(roster_names.keys()),
+                format_func=lambda roster_id: roster_names.get(roster_id, "No roster"),
+                key="teacher_publish_roster"
+            )
         if st.button("📤 PUBLISH Exit Ticket", key="teacher_publish_btn"):
             publish_exit_ticket()
 
+def teacher_edit_widget_keys(question_index):
+    """Widget keys holding the in-progress edit of one question"""
+    i = question_index
+    options = st.session_state.teacher_all_mcqs[i]['options'].keys()
+    return ([f"teacher_q_text_{i}", f"teacher_correct_{i}", f"teacher_exp_{i}",
+             f"teacher_topic_{i}", f"teacher_subtopic_{i}"]
+            + [f"teacher_opt_{i}_{option}" for option in options])
+
+def start_teacher_edit(question_index):
+    st.session_state[f"teacher_edit_mode_{question_index}"] = True
+
+def save_teacher_edit(question_index):
+    """Save callback: copy the card's edit widgets back into the question list"""
+    i = question_index
+    question_data = st.session_state.teacher_all_mcqs[i]
+    st.session_state.teacher_all_mcqs[i] = {
+        **question_data,
+        "question": st.session_state[f"teacher_q_text_{i}"],
+        "options": {option: st.session_state[f"teacher_opt_{i}_{option}"] for option in sorted(question_data['options'].keys())},
+        "correct_answer": st.session_state[f"teacher_correct_{i}"],
+        "explanation": st.session_state[f"teacher_exp_{i}"],
+        "topic": st.session_state[f"teacher_topic_{i}"],
+        "subtopic": st.session_state[f"teacher_subtopic_{i}"],
+    }
+    st.session_state[f"teacher_just_saved_{i}"] = True
+    cancel_teacher_edit(i)
+
+def cancel_teacher_edit(question_index):
+    """Leave edit mode and drop the card's local edit state"""
+    for key in teacher_edit_widget_keys(question_index):
+        st.session_state.pop(key, None)
+    st.session_state[f"teacher_edit_mode_{question_index}"] = False
+
+@st.fragment
+def show_teacher_question_card(i):
+    """Review/edit card for a single generated question"""
+    question_data = st.session_state.teacher_all_mcqs[i]
+    edit_key = f"teacher_edit_mode_{i}"
+    if edit_key not in st.session_state:
+        st.session_state[edit_key] = False
+
+    with st.expander(f"Question {i + 1}: {question_data['question'][:50]}..."):
+        if st.session_state.pop(f"teacher_just_saved_{i}", False):
+            st.success("✅ Question updated.")
+
+        if not st.session_state[edit_key]:
+            st.markdown(f"**Question:** {question_data['question']}")
+
+            for option, text in question_data['options'].items():
+                if option == question_data['correct_answer']:
+                    st.markdown(f"✅ **{option}) {text}** (Correct Answer)")
+                else:
+                    st.markdown(f"{option}) {text}")
+
+            st.markdown(f"**Explanation:** {question_data.get('explanation', 'No explanation provided.')}")
+            st.markdown(f"**Topic:** {question_data.get('topic', 'Unknown')}")
+            st.markdown(f"**Subtopic:** {question_data.get('subtopic', 'Unknown')}")
+
+            st.checkbox("Select for regeneration", key=f"teacher_regen_select_{i}")
+
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                st.button("✏️ Edit", key=f"teacher_edit_btn_{i}", on_click=start_teacher_edit, args=(i,))
+            with col2:
+                if st.button("🔁 Regenerate", key=f"teacher_regen_{i}"):
+                    regenerate_teacher_question(
+                        i,
+                        st.session_state.get("teacher_subject", ""),
+                        st.session_state.get("teacher_lecture_topics", ""),
+                        st.session_state.get("teacher_ai_instructions", "")
+                    )
+
+        else:
+            # EDIT MODE
+            st.markdown("### ✏️ Editing Mode")
+            st.text_area("Edit Question", question_data['question'], key=f"teacher_q_text_{i}")
+
+            st.selectbox(
+                "Correct Answer",
+                list(question_data['options'].keys()),
+                index=list(question_data['options'].keys()).index(question_data['correct_answer']),
+                key=f"teacher_correct_{i}"
+            )
+
+            for option in sorted(question_data['options'].keys()):
+                st.text_input(
+                    f"Option {option}",
+                    value=question_data['options'][option],
+                    key=f"teacher_opt_{i}_{option}"
+                )
+
+            st.text_area("Explanation", question_data.get('explanation', ''), key=f"teacher_exp_{i}")
+            st.text_input("Topic", question_data.get('topic', ''), key=f"teacher_topic_{i}")
+            st.text_input("Subtopic", question_data.get('subtopic', ''), key=f"teacher_subtopic_{i}")
+
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                st.button("💾 Save", key=f"teacher_save_{i}", on_click=save_teacher_edit, args=(i,))
+            with col2:
+                st.button("❌ Cancel", key=f"teacher_cancel_{i}", on_click=cancel_teacher_edit, args=(i,))
+
 def publish_exit_ticket():
     """Publish the current questions as an exit ticket"""
     try:
@@ -507,9 +602,14 @@ def publish_exit_ticket():
         
         # Create exit ticket
         from firebase_helper import create_exit_ticket
-        ticket = create_exit_ticket(db, questions, teacher_name, subject, lecture_topics)
+        roster_id = st.session_state.get('teacher_publish_roster')
+        ticket = create_exit_ticket(db, questions, teacher_name, subject, lecture_topics, roster_id=roster_id)
         
         if ticket:
+            from usage_tracking import record_ticket_usage
+            record_ticket_usage(db, ticket['ticket_id'], st.session_state.pop('generation_usage', None),
+                                st.session_state.pop('generation_draft_id', None))
+            
             st.success(f"🎉 Exit Ticket Published Successfully!")
             st.info(f"**Ticket ID: {ticket['ticket_id']}**")
             st.markdown(f"**Title:** {ticket['title']}")
@@ -537,7 +637,6 @@ def publish_exit_ticket():
 def view_published_tickets_page():
     """Display all tickets published by the current teacher"""
     st.header("🎫 My Published Exit Tickets")
-    st.markdown(app_ui, unsafe_allow_html=True)
     
     teacher_name = st.session_state.get('username', 'Unknown Teacher')
     
@@ -552,6 +651,20 @@ def view_published_tickets_page():
     st.markdown(f"**Total Published Tickets:** {len(tickets)}")
     st.markdown("---")
     
+    if 'show_archived_analytics_for' in st.session_state:
+        view_archived_ticket_analytics(st.session_state.show_archived_analytics_for)
+        if st.button("🔙 Back to All Tickets"):
+            del st.session_state.show_archived_analytics_for
+            st.rerun()
+        return
+    
+    if 'edit_ticket_for' in st.session_state:
+        edit_published_ticket(st.session_state.edit_ticket_for)
+        if st.button("🔙 Back to All Tickets"):
+            del st.session_state.edit_ticket_for
+            st.rerun()
+        return
+    
     # ADD: Check if we should show analytics for a specific ticket
     if 'show_analytics_for' in st.session_state:
         view_ticket_analytics(st.session_state.show_analytics_for)
@@ -560,6 +673,9 @@ def view_published_tickets_page():
             st.rerun()
         return
     
+    show_bulk_ticket_actions(tickets)
+    show_archived_tickets(teacher_name)
+    
     for idx, ticket in enumerate(tickets):
         with st.expander(f"🎫 {ticket.get('title', 'Untitled')} - ID: {ticket['ticket_id']}"):
             col1, col2 = st.columns([2, 1])
@@ -591,8 +707,12 @@ def view_published_tickets_page():
                 
                 # ADD: Show response count
                 from firebase_helper import get_ticket_analytics
-                analytics = get_ticket_analytics(db, ticket['ticket_id'])
+                analytics = get_ticket_analytics(db, ticket['ticket_id'], ticket=ticket)
                 st.markdown(f"**📊 Responses:** {analytics['total_responses']} | **📈 Avg Score:** {analytics['average_score']}%")
+                if analytics.get('completion'):
+                    completion = analytics['completion']
+                    st.markdown(f"**✅ Completion:** {completion['completion_rate']}% of {completion['roster_name']} "
+                                f"({len(completion['missing'])} missing)")
             
             with col2:
                 # Action buttons
@@ -605,6 +725,10 @@ def view_published_tickets_page():
                     st.session_state.show_analytics_for = ticket['ticket_id']
                     st.rerun()
                 
+                if st.button("✏️ Edit Questions", key=f"edit_{idx}"):
+                    st.session_state.edit_ticket_for = ticket['ticket_id']
+                    st.rerun()
+                
                 if ticket.get('status') == 'active':
                     if st.button("🔒 Deactivate", key=f"deactivate_{idx}"):
                         from firebase_helper import update_ticket_status
@@ -634,6 +758,316 @@ def view_published_tickets_page():
                 if len(questions) > 2:
                     st.markdown(f"... and {len(questions) - 2} more questions")
 
+def edit_published_ticket(ticket_id):
+    """Edit a published ticket's questions and regrade existing responses"""
+    from firebase_helper import get_exit_ticket, update_exit_ticket, get_ticket_versions
+    from regrade import regrade_ticket
+    
+    ticket = get_exit_ticket(db, ticket_id)
+    if not ticket:
+        st.error("Ticket not found!")
+        return
+    
+    st.header(f"✏️ Edit Ticket: {ticket_id}")
+    st.markdown(f"**Title:** {ticket.get('title', 'N/A')} | **Version:** {ticket.get('version', 1)}")
+    st.info("Saving creates a new version and regrades every existing response against the new answer key.")
+    
+    version = ticket.get('version', 1)
+    edited = []
+    for i, question in enumerate(ticket.get('questions', [])):
+        prefix = f"edit_{ticket_id}_v{version}_{i}"
+        with st.expander(f"Question {i+1}: {question.get('question', '')[:60]}"):
+            text = st.text_area("Question", question.get('question', ''), key=f"{prefix}_q")
+            options = {}
+            for letter, option in question.get('options', {}).items():
+                options[letter] = st.text_input(f"Option {letter}", option, key=f"{prefix}_{letter}")
+            letters = list(options.keys())
+            correct = st.selectbox(
+                "Correct Answer", letters,
+                index=letters.index(question['correct_answer']) if question.get('correct_answer') in letters else 0,
+                key=f"{prefix}_correct"
+            )
+            explanation = st.text_area("Explanation", question.get('explanation', ''), key=f"{prefix}_exp")
+            edited.append(dict(question, question=text, options=options, correct_answer=correct, explanation=explanation))
+    
+    note = st.text_input("Change note (optional)", key=f"edit_{ticket_id}_v{version}_note")
+    if st.button("💾 Save & Regrade", type="primary", key=f"edit_{ticket_id}_save"):
+        if edited == ticket.get('questions', []):
+            st.warning("No changes to save.")
+        else:
+            previous, updated = update_exit_ticket(db, ticket_id, edited, st.session_state.get('username', 'Unknown Teacher'), note)
+            if not updated:
+                st.error("Failed to save the ticket.")
+            else:
+                progress_bar = st.progress(0.0, text="Regrading responses...")
+                result = regrade_ticket(db, previous, updated,
+                                        progress_callback=lambda done, total: progress_bar.progress(done / total))
+                progress_bar.progress(1.0, text="Regrading complete")
+                st.success(f"✅ Saved version {updated['version']}. Regraded {result['checked']} responses, "
+                           f"{result['changed']} scores changed.")
+                if result['skipped']:
+                    st.warning(f"{result['skipped']} older responses don't record which questions they answered "
+                               "and were left unchanged.")
+    
+    versions = get_ticket_versions(db, ticket_id)
+    if versions:
+        with st.expander(f"🕘 Version History ({len(versions)} earlier)"):
+            for v in versions:
+                saved_at = v.get('saved_at')
+                saved_at = saved_at.strftime('%Y-%m-%d %H:%M') if hasattr(saved_at, 'strftime') else str(saved_at)
+                key = ", ".join(f"Q{i+1}={q.get('correct_answer')}" for i, q in enumerate(v.get('questions', [])))
+                st.markdown(f"**v{v.get('version')}** replaced {saved_at} by {v.get('replaced_by', 'unknown')}"
+                            f"{' - ' + v['note'] if v.get('note') else ''}  \nAnswer key: {key}")
+
+def show_bulk_ticket_actions(tickets):
+    """Apply a status change or a cascading delete to many tickets at once"""
+    with st.expander("🗂️ Bulk Actions"):
+        ticket_labels = {t['ticket_id']: f"{t['ticket_id']} - {t.get('title', 'Untitled')} ({t.get('status', 'unknown')})" for t in tickets}
+        selected_ids = st.multiselect(
+            "Select tickets",
+            options=list(ticket_labels.keys()),
+            format_func=lambda ticket_id: ticket_labels[ticket_id],
+            key="bulk_ticket_ids"
+        )
+        action = st.selectbox("Action", ["🔒 Deactivate", "✅ Activate", "📦 Archive", "🗑️ Delete"], key="bulk_ticket_action")
+        
+        confirmed = True
+        if action == "🗑️ Delete":
+            st.warning("Deleting a ticket also deletes all of its student responses. This cannot be undone.")
+            confirmed = st.checkbox("I understand, delete the selected tickets", key="bulk_delete_confirm")
+        
+        if st.button("Apply to Selected", key="bulk_ticket_apply", disabled=not selected_ids or not confirmed):
+            from firebase_helper import bulk_update_ticket_status, bulk_delete_tickets
+            
+            if action == "🗑️ Delete":
+                progress_bar = st.progress(0.0, text="Deleting tickets and responses...")
+                
+                def report_progress(done, total):
+                    progress_bar.progress(min(done / total, 1.0), text=f"Deleted {done} of {total} documents")
+                
+                result = bulk_delete_tickets(db, selected_ids, progress_callback=report_progress)
+                if result is None:
+                    st.error("❌ Error deleting tickets. Please try again.")
+                    return
+                st.success(f"Deleted {result['tickets']} tickets and {result['responses']} responses.")
+                if result['failed']:
+                    st.error(f"❌ Could not fully delete {', '.join(result['failed'])}. Please try again.")
+                    return
+            else:
+                status = {"🔒 Deactivate": "inactive", "✅ Activate": "active", "📦 Archive": "archived"}[action]
+                updated = bulk_update_ticket_status(db, selected_ids, status)
+                st.success(f"Updated {updated} of {len(selected_ids)} tickets to {status}.")
+            
+            st.session_state.pop("bulk_ticket_ids", None)
+            st.rerun()
+
+def view_rosters_page():
+    """Create and maintain class rosters used for completion tracking"""
+    st.header("👥 Class Rosters")
+    
+    teacher_name = st.session_state.get('username', 'Unknown Teacher')
+    from rosters import get_rosters_by_teacher, get_roster, save_roster, delete_roster, parse_roster_text
+    
+    with st.expander("➕ New Roster", expanded=False):
+        name = st.text_input("Class name", key="new_roster_name")
+        students_text = st.text_area("Students (one name per line, as students will type it)", height=200, key="new_roster_students")
+        if st.button("💾 Save Roster", key="new_roster_save"):
+            students = parse_roster_text(students_text)
+            if not name.strip() or not students:
+                st.warning("Enter a class name and at least one student.")
+            elif save_roster(db, teacher_name, name.strip(), students):
+                st.success(f"✅ Saved {name.strip()} with {len(students)} students")
+                st.rerun()
+            else:
+                st.error("Failed to save roster.")
+    
+    rosters = get_rosters_by_teacher(db, teacher_name)
+    if not rosters:
+        st.info("📭 No rosters yet.")
+        return
+    
+    for roster_summary in rosters:
+        roster_id = roster_summary['roster_id']
+        with st.expander(f"👥 {roster_summary.get('name', 'Untitled')} - {roster_summary.get('student_count', 0)} students"):
+            roster = get_roster(db, roster_id) or {}
+            students_text = st.text_area("Students", "\n".join(roster.get('students', [])), height=200,
+                                         key=f"roster_students_{roster_id}")
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("💾 Update", key=f"roster_update_{roster_id}"):
+                    save_roster(db, teacher_name, roster_summary.get('name', 'Untitled'),
+                                parse_roster_text(students_text), roster_id=roster_id)
+                    st.rerun()
+            with col2:
+                if st.button("🗑️ Delete", key=f"roster_delete_{roster_id}"):
+                    delete_roster(db, roster_id)
+                    st.rerun()
+
+def view_topic_mastery_page():
+    """Heatmap of correctness by topic and subtopic across all of the teacher's tickets"""
+    st.header("🧭 Topic Mastery")
+    
+    teacher_name = st.session_state.get('username', 'Unknown Teacher')
+    from firebase_helper import get_topic_rollups, rebuild_topic_rollups
+    
+    if st.button("🔄 Recalculate from All Responses",
+                 help="Include responses saved before mastery tracking existed. "
+                      "Submissions made while it runs are left out, so recalculate when no class is taking a ticket."):
+        with st.spinner("Recalculating..."):
+            rebuilt = rebuild_topic_rollups(db, teacher_name)
+        if rebuilt is None:
+            st.error("❌ Error recalculating topic mastery. Please try again.")
+        else:
+            st.rerun()
+    
+    rollups = get_topic_rollups(db, teacher_name)
+    if not rollups:
+        st.info("📭 No student responses yet.")
+        return
+    
+    subjects = sorted({r['subject'] for r in rollups})
+    subject = st.selectbox("Subject", ["All Subjects"] + subjects)
+    if subject != "All Subjects":
+        rollups = [r for r in rollups if r['subject'] == subject]
+    
+    import altair as alt
+    fields = ("subject", "topic", "subtopic", "accuracy", "correct", "attempts")
+    heatmap = alt.Chart(alt.Data(values=[{f: r[f] for f in fields} for r in rollups])).mark_rect().encode(
+        x=alt.X("subtopic:N", title="Subtopic"),
+        y=alt.Y("topic:N", title="Topic"),
+        color=alt.Color("accuracy:Q", title="% Correct", scale=alt.Scale(domain=[0, 100], scheme="redyellowgreen")),
+        tooltip=["subject:N", "topic:N", "subtopic:N", "accuracy:Q", "correct:Q", "attempts:Q"]
+    )
+    st.altair_chart(heatmap, use_container_width=True)
+    
+    weakest = sorted(rollups, key=lambda r: r['accuracy'])[:5]
+    st.subheader("Needs Review")
+    for r in weakest:
+        st.markdown(f"- **{r['topic']} / {r['subtopic']}** ({r['subject']}): {r['accuracy']}% of {r['attempts']} answers correct")
+    
+    show_mirror_drilldown(teacher_name, subject)
+
+def show_mirror_drilldown(teacher_name, subject):
+    """Subtopic accuracy for a period and class, answered from the local analytics mirror"""
+    from datetime import datetime, timedelta, timezone
+    from analytics_mirror import connect, sync_mirror, subtopic_performance, last_synced
+    from rosters import get_rosters_by_teacher
+    
+    with st.expander("📅 By Period and Class"):
+        conn = connect()
+        try:
+            synced = last_synced(conn)
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.caption(f"Local analytics mirror, last synced {synced} UTC" if synced
+                           else "The local analytics mirror has not been synced yet.")
+            with col2:
+                if st.button("🔄 Sync Now", key="mirror_sync"):
+                    with st.spinner("Syncing changes since the last run..."):
+                        sync_mirror(db)
+                    st.rerun()
+            if not synced:
+                return
+            
+            days = st.selectbox("Period", [7, 30, 90, 365], index=1, format_func=lambda d: f"Last {d} days")
+            rosters = get_rosters_by_teacher(db, teacher_name)
+            roster = st.selectbox("Class", [None] + rosters,
+                                  format_func=lambda r: "All Classes" if r is None else r.get('name', 'Untitled'))
+            
+            rows = subtopic_performance(conn, teacher_name,
+                                        subject=None if subject == "All Subjects" else subject,
+                                        roster_id=roster['roster_id'] if roster else None,
+                                        since=datetime.now(timezone.utc) - timedelta(days=days))
+        finally:
+            conn.close()
+        
+        if not rows:
+            st.info("No answers in this period.")
+            return
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def view_ai_usage_page():
+    """Token spend, daily budget and cache savings of the teacher's question generation"""
+    st.header("💰 AI Usage")
+    
+    teacher_name = st.session_state.get('username', 'Unknown Teacher')
+    from config import DAILY_BUDGET_USD, DAILY_TOKEN_BUDGET
+    from usage_tracking import get_usage_history
+    from firebase_helper import get_all_tickets_by_teacher
+    
+    history = get_usage_history(db, teacher_name, days=14)
+    if not history:
+        st.error("Could not load usage.")
+        return
+    today = history[-1]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Spent Today", f"${today['cost_usd']:.4f}")
+    with col2:
+        st.metric("Tokens Today", f"{today['total_tokens']:,}")
+    with col3:
+        st.metric("Model Calls Today", today['calls'])
+    with col4:
+        st.metric("Saved by Caching (14 days)", f"${sum(d['cost_saved_usd'] for d in history):.4f}",
+                  help=f"{sum(d['cache_hits'] for d in history)} cached results, "
+                       f"about {sum(d['tokens_saved'] for d in history):,} prompt tokens")
+    
+    if DAILY_BUDGET_USD:
+        used = min(today['cost_usd'] / DAILY_BUDGET_USD, 1.0)
+        st.progress(used, text=f"Daily budget: ${today['cost_usd']:.4f} of ${DAILY_BUDGET_USD:.2f}")
+    if DAILY_TOKEN_BUDGET:
+        used = min(today['total_tokens'] / DAILY_TOKEN_BUDGET, 1.0)
+        st.progress(used, text=f"Daily token budget: {today['total_tokens']:,} of {DAILY_TOKEN_BUDGET:,}")
+    
+    st.subheader("Last 14 Days")
+    st.bar_chart({d['date']: d['cost_usd'] for d in history}, x_label="Date", y_label="USD")
+    
+    if today['by_call_type']:
+        st.subheader("Today by Call Type")
+        st.dataframe([
+            {"call type": call_type,
+             "calls": usage.get('calls', 0),
+             "prompt tokens": usage.get('prompt_tokens', 0),
+             "output tokens": usage.get('output_tokens', 0),
+             "cost (USD)": round(usage.get('cost_usd', 0), 4),
+             "avg latency (s)": round(usage.get('latency_seconds', 0) / usage['calls'], 2) if usage.get('calls') else None,
+             "cache hits": usage.get('cache_hits', 0)}
+            for call_type, usage in sorted(today['by_call_type'].items())
+        ], use_container_width=True, hide_index=True)
+    
+    tickets = [t for t in get_all_tickets_by_teacher(db, teacher_name) if t.get('generation_usage')]
+    if tickets:
+        st.subheader("Cost per Ticket")
+        st.dataframe([
+            {"ticket": t['ticket_id'],
+             "title": t.get('title', ''),
+             "calls": t['generation_usage'].get('calls', 0),
+             "tokens": t['generation_usage'].get('total_tokens', 0),
+             "cost (USD)": round(t['generation_usage'].get('cost_usd', 0), 4)}
+            for t in tickets
+        ], use_container_width=True, hide_index=True)
+
+def show_archived_tickets(teacher_name):
+    """List tickets moved to archive storage by the retention job"""
+    from archival import get_archived_tickets_by_teacher
+    archived = get_archived_tickets_by_teacher(db, teacher_name)
+    if not archived:
+        return
+    
+    with st.expander(f"📦 Archived Tickets ({len(archived)})"):
+        for idx, meta in enumerate(archived):
+            summary = meta.get('summary', {})
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.markdown(f"**{meta.get('title', 'Untitled')}** - `{meta['ticket_id']}` | "
+                            f"📊 {summary.get('total_responses', 0)} responses | "
+                            f"📈 {summary.get('average_score', 0)}%")
+            with col2:
+                if st.button("📊 View Analytics", key=f"archived_analytics_{idx}"):
+                    st.session_state.show_archived_analytics_for = meta['ticket_id']
+                    st.rerun()
+
 def show_ticket_input_page():
     """Page for students to enter ticket ID"""
     
@@ -685,8 +1119,6 @@ def show_ticket_input_page():
 def show_ticket_quiz_page():
     """Display the exit ticket quiz interface"""
     ticket_data = st.session_state.ticket_data
-    questions = ticket_data['questions']
-    current_q = st.session_state.ticket_current_question
 
     # Display ticket info
     st.header(f"🎫 {ticket_data.get('title', 'Exit Ticket')}")
@@ -733,6 +1165,37 @@ def show_ticket_quiz_page():
     
     st.markdown("---")
 
+    if CLIENT_SIDE_QUIZ:
+        # Navigation runs in the browser; each answer only reruns this fragment
+        show_ticket_quiz_component_fragment()
+        return
+
+    # Navigation and answer feedback only rerun this fragment
+    show_ticket_question_fragment()
+
+@st.fragment
+def show_ticket_quiz_component_fragment():
+    """Browser-side quiz; the answer key is revealed one locked answer at a time"""
+    from quiz_component import exit_ticket_quiz
+    
+    ticket_data = st.session_state.ticket_data
+    answers = exit_ticket_quiz(ticket_data['questions'], key=f"exit_ticket_quiz_{ticket_data['ticket_id']}")
+    if answers is not None:
+        st.session_state.ticket_user_answers = answers
+        st.session_state.ticket_quiz_completed = True
+        st.rerun()
+
+def go_to_ticket_question(question_index):
+    """Button callback that moves the exit ticket quiz to another question"""
+    st.session_state.ticket_current_question = question_index
+
+@st.fragment
+@timed("quiz_fragment")
+def show_ticket_question_fragment():
+    """Question, answer form and navigation for the exit ticket quiz"""
+    questions = st.session_state.ticket_data['questions']
+    current_q = st.session_state.ticket_current_question
+
     if current_q >= len(questions):
         st.session_state.ticket_quiz_completed = True
         st.rerun()
@@ -777,22 +1240,38 @@ def show_ticket_quiz_page():
     # Navigation buttons (outside the form)
     col1, col2 = st.columns([1, 1])
 
+    # Navigation uses callbacks so the fragment's own rerun already shows the
+    # new question, instead of rendering twice via st.rerun()
     with col1:
         if current_q > 0:
-            if st.button("⬅️ Previous Question", key=f"ticket_prev_{current_q}"):
-                st.session_state.ticket_current_question = current_q - 1
-                st.rerun()
+            st.button("⬅️ Previous Question", key=f"ticket_prev_{current_q}",
+                      on_click=go_to_ticket_question, args=(current_q - 1,))
 
     with col2:
         if current_q < len(questions) - 1:
-            if st.button("➡️ Next Question", key=f"ticket_next_{current_q}"):
-                st.session_state.ticket_current_question = current_q + 1
-                st.rerun()
+            st.button("➡️ Next Question", key=f"ticket_next_{current_q}",
+                      on_click=go_to_ticket_question, args=(current_q + 1,))
         else:
+            # Results live outside the fragment, so finishing needs a full rerun
             if st.button("🏁 Finish Exit Ticket", key=f"ticket_finish_{current_q}"):
                 st.session_state.ticket_quiz_completed = True
                 st.rerun()
 
+def show_student_progress(student_name, subject):
+    """Show the student's running mastery estimate after a submission"""
+    from ability_model import get_student_ability
+    ability = get_student_ability(db, student_name)
+    if not ability:
+        return
+    
+    subject_mastery = next((s['mastery'] for s in ability['subjects'] if s['subject'] == subject), None)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("🧠 Overall Mastery", f"{ability['mastery']}%", help=f"Based on {ability.get('answered', 0)} answers")
+    if subject_mastery is not None:
+        with col2:
+            st.metric(f"📘 {subject} Mastery", f"{subject_mastery}%")
+
 def show_ticket_results_page():
     """Display results after completing the exit ticket"""
     ticket_data = st.session_state.ticket_data
@@ -840,12 +1319,14 @@ def show_ticket_results_page():
                     ticket_data['ticket_id'], 
                     st.session_state.get('student_name', 'Unknown'),
                     user_answers,
-                    score_data
+                    score_data,
+                    ticket=ticket_data
                 )
                 
                 if success:
                     st.session_state.response_saved = True
                     st.success("✅ Your response has been recorded!")
+                    show_student_progress(st.session_state.get('student_name', 'Unknown'), ticket_data.get('subject', ''))
                 else:
                     st.error("❌ You have already completed this exit ticket!")
                     st.info("Each student can attempt an exit ticket only once.")
@@ -989,8 +1470,8 @@ def show_input_page():
 def regenerate_question(question_index, subject, topics, instructions):
     """Regenerate a single question"""
     with st.spinner("🔄 Regenerating question..."):
-        # Generate a single question
-        mcqs = generate_mcqs(topics, instructions, 1, subject)
+        # Generate a single question on the fast model tier
+        mcqs = generate_mcqs(topics, instructions, 1, subject, call_type="regenerate")
         
         if mcqs and 'questions' in mcqs and len(mcqs['questions']) > 0:
             # Replace the question at the given index
@@ -1167,8 +1648,115 @@ def view_ticket_analytics(ticket_id):
         return
     
     # Get analytics
-    analytics = get_ticket_analytics(db, ticket_id)
+    analytics = get_ticket_analytics(db, ticket_id, ticket=ticket_data)
     
+    render_ticket_analytics(ticket_data, analytics)
+    show_ticket_completion(ticket_data, analytics.get('completion'))
+    show_question_calibration(ticket_data.get('questions', []))
+
+def change_ticket_roster(ticket_id):
+    """Roster picker callback: runs only when the teacher picks another roster"""
+    from rosters import assign_roster
+    
+    if not assign_roster(db, ticket_id, st.session_state[f"ticket_roster_{ticket_id}"]):
+        st.session_state[f"ticket_roster_failed_{ticket_id}"] = True
+
+def show_ticket_completion(ticket_data, completion):
+    """Roster completion for a ticket, with a picker to attach or change its roster"""
+    from rosters import get_rosters_by_teacher
+    
+    st.markdown("---")
+    st.subheader("✅ Completion")
+    
+    ticket_id = ticket_data['ticket_id']
+    rosters = get_rosters_by_teacher(db, ticket_data.get('teacher_name', ''))
+    options = [None] + [r['roster_id'] for r in rosters]
+    names = {r['roster_id']: f"{r.get('name', 'Untitled')} ({r.get('student_count', 0)} students)" for r in rosters}
+    current = ticket_data.get('roster_id')
+    if current and current not in options:
+        # The attached roster was deleted; keep showing it rather than detaching it
+        options.append(current)
+        names[current] = "Deleted roster"
+    st.selectbox(
+        "Class roster",
+        options,
+        index=options.index(current) if current in options else 0,
+        format_func=lambda roster_id: names.get(roster_id, "No roster"),
+        key=f"ticket_roster_{ticket_id}",
+        on_change=change_ticket_roster,
+        args=(ticket_id,)
+    )
+    if st.session_state.pop(f"ticket_roster_failed_{ticket_id}", False):
+        st.error("Failed to update the roster.")
+    
+    if not completion:
+        st.info("Attach a class roster to see who hasn't submitted yet.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("📈 Completion Rate", f"{completion['completion_rate']}%")
+    with col2:
+        st.metric("🙋 Submitted", f"{len(completion['completed'])}/{completion['roster_size']}")
+    with col3:
+        st.metric("⏳ Missing", len(completion['missing']))
+    
+    if completion['missing']:
+        with st.expander(f"⏳ Not yet submitted ({len(completion['missing'])})"):
+            st.markdown("\n".join(f"- {name}" for name in completion['missing']))
+    if completion['unexpected']:
+        with st.expander(f"❓ Submitted but not on the roster ({len(completion['unexpected'])})"):
+            st.markdown("\n".join(f"- {name}" for name in completion['unexpected']))
+
+def show_question_calibration(questions):
+    """Per-question difficulty estimated across every ticket that used the question"""
+    from ability_model import get_question_calibration
+    calibrations = get_question_calibration(db, questions)
+    rows = []
+    for i, (question, calibration) in enumerate(zip(questions, calibrations)):
+        if not calibration:
+            continue
+        attempts = calibration.get('attempts', 0)
+        rows.append({
+            "Question": f"Q{i+1}: {question.get('question', '')[:60]}",
+            "Difficulty": round(calibration.get('difficulty', 0.0), 2),
+            "Answered": attempts,
+            "% Correct": round(calibration.get('correct', 0) / attempts * 100, 1) if attempts else 0
+        })
+    if rows:
+        st.markdown("---")
+        st.subheader("🎯 Question Difficulty")
+        st.caption("Higher is harder; 0 is a question an average student answers correctly half the time.")
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def view_archived_ticket_analytics(ticket_id):
+    """
+    Display analytics for an archived ticket, loaded from its archive blob
+    """
+    st.header(f"📦 Archived Ticket: {ticket_id}")
+    
+    from archival import load_archived_ticket
+    
+    with st.spinner("Loading archive..."):
+        archive = load_archived_ticket(db, ticket_id)
+    if not archive:
+        st.error("Archived ticket not found!")
+        return
+    
+    st.caption(f"Archived on {archive.get('archived_at', 'Unknown')[:10]}")
+    summary = archive.get("summary", {})
+    analytics = {
+        "total_responses": summary.get("total_responses", 0),
+        "unique_students": summary.get("unique_students", 0),
+        "average_score": summary.get("average_score", 0),
+        "responses": archive.get("responses", [])
+    }
+    render_ticket_analytics(archive["ticket"], analytics)
+
+def render_ticket_analytics(ticket_data, analytics):
+    """
+    Display ticket info, summary metrics and each student's answers
+    """
     # Display ticket info
     st.markdown(f"**Title:** {ticket_data.get('title', 'N/A')}")
     st.markdown(f"**Subject:** {ticket_data.get('subject', 'N/A')}")
@@ -1193,6 +1781,10 @@ def view_ticket_analytics(ticket_id):
     if analytics['total_responses'] > 0:
         st.subheader("📋 Student Responses")
         
+        from firebase_helper import match_response_answers
+        from ability_model import question_key
+        key_index = {question_key(q): i for i, q in enumerate(ticket_data.get('questions', []))}
+        
         responses = analytics.get('responses', [])
         for i, response in enumerate(responses):
             with st.expander(f"👤 {response.get('student_name', 'Unknown')} - {response.get('score', {}).get('percentage', 0):.1f}%"):
@@ -1216,13 +1808,11 @@ def view_ticket_analytics(ticket_id):
                     
                     st.markdown(f"**Completed:** {formatted_time}")
                 
-                # Show detailed responses - FIXED LOGIC
+                # Show detailed responses, matched to ticket questions by question ID
                 st.markdown("**Answers:**")
-                responses_dict = response.get('responses', {})
                 questions = ticket_data.get('questions', [])
                 
-                for q_idx_str, student_answer in responses_dict.items():
-                    q_idx = int(q_idx_str)  # Convert string back to int for indexing
+                for q_idx, student_answer in sorted(match_response_answers(response, questions, key_index)):
                     if q_idx < len(questions):
                         question = questions[q_idx]
                         correct_answer = question['correct_answer']
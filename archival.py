@@ -0,0 +1,233 @@
+"""
+Move old closed tickets out of the hot Firestore collections
+
+A ticket is archived when its status is no longer 'active' and it has not
+been created or updated for TICKET_RETENTION_DAYS. The ticket, all of its
+responses and a precomputed summary are written as one gzipped JSON blob
+(to ARCHIVE_BUCKET in Cloud Storage, or ARCHIVE_DIR on disk), a small
+archived_tickets/{ticket_id} document records where it went, and only then
+are the hot documents deleted. Re-running after a failure is safe.
+
+Schedule it with cron or Cloud Scheduler, e.g. nightly:
+    0 3 * * * cd /srv/exit-tickets && python archival.py
+    python archival.py --dry-run --days 30
+"""
+import os
+import gzip
+import json
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from firebase_helper import (
+    init_firestore, get_ticket_responses, get_ticket_analytics, get_ticket_versions, bulk_delete_tickets,
+    question_answer_counts
+)
+from config import TICKET_RETENTION_DAYS, ARCHIVE_BUCKET, ARCHIVE_DIR
+
+ARCHIVE_FORMAT_VERSION = 1
+
+
+def _as_utc(value):
+    """Firestore returns aware datetimes, while naive ones were written as UTC"""
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def find_archivable_tickets(db, retention_days=TICKET_RETENTION_DAYS):
+    """
+    Closed tickets whose last change is older than the retention period
+
+    Args:
+        db: Firestore client
+        retention_days: Days a closed ticket stays in the hot collections
+
+    Returns:
+        list: Ticket dicts ready to archive, oldest first
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+    # A single-field range filter needs no composite index; status is checked here
+    docs = db.collection("tickets").where(filter=FieldFilter("created_at", "<", cutoff)).stream()
+
+    tickets = []
+    for doc in docs:
+        ticket = doc.to_dict()
+        if ticket.get("status") == "active":
+            continue
+        last_change = _as_utc(ticket.get("updated_at")) or _as_utc(ticket.get("created_at"))
+        if last_change and last_change < cutoff:
+            tickets.append(ticket)
+
+    tickets.sort(key=lambda t: _as_utc(t.get("created_at")))
+    return tickets
+
+
+def summarize_ticket(ticket, analytics):
+    """Precomputed numbers shown for an archived ticket without opening its blob"""
+    question_stats = question_answer_counts(analytics.get("responses", []), ticket.get("questions", []))
+    return {
+        "total_responses": analytics.get("total_responses", 0),
+        "unique_students": analytics.get("unique_students", 0),
+        "average_score": analytics.get("average_score", 0),
+        "question_stats": question_stats
+    }
+
+
+def write_archive_blob(ticket_id, data):
+    """Store compressed archive bytes and return the location they were written to"""
+    name = f"ticket_archives/{ticket_id}.json.gz"
+    if ARCHIVE_BUCKET:
+        from firebase_admin import storage
+        storage.bucket(ARCHIVE_BUCKET).blob(name).upload_from_string(data, content_type="application/gzip")
+        return f"gs://{ARCHIVE_BUCKET}/{name}"
+
+    path = os.path.join(ARCHIVE_DIR, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_archive_blob(location):
+    if location.startswith("gs://"):
+        from firebase_admin import storage
+        bucket_name, name = location[len("gs://"):].split("/", 1)
+        return storage.bucket(bucket_name).blob(name).download_as_bytes()
+    with open(location, "rb") as f:
+        return f.read()
+
+
+def archive_ticket(db, ticket):
+    """
+    Write one ticket, its responses and summary to archive storage, then delete it
+
+    Args:
+        db: Firestore client
+        ticket: Ticket dict as stored in Firestore
+
+    Returns:
+        dict: The archived_tickets metadata, or None if archiving failed
+    """
+    ticket_id = ticket["ticket_id"]
+    try:
+        responses = get_ticket_responses(db, ticket_id)
+        analytics = get_ticket_analytics(db, ticket_id, ticket=ticket)
+        summary = summarize_ticket(ticket, analytics)
+
+        archived_at = datetime.now(timezone.utc)
+        blob = {
+            "format_version": ARCHIVE_FORMAT_VERSION,
+            "archived_at": archived_at,
+            "ticket": ticket,
+            "responses": responses,
+            "versions": get_ticket_versions(db, ticket_id),
+            "summary": summary
+        }
+        data = gzip.compress(json.dumps(blob, default=_json_default, separators=(",", ":")).encode("utf-8"))
+        location = write_archive_blob(ticket_id, data)
+
+        metadata = {
+            "ticket_id": ticket_id,
+            "title": ticket.get("title", ""),
+            "subject": ticket.get("subject", ""),
+            "teacher_name": ticket.get("teacher_name", ""),
+            "total_questions": ticket.get("total_questions", 0),
+            "created_at": ticket.get("created_at"),
+            "archived_at": archived_at,
+            "location": location,
+            "size_bytes": len(data),
+            "summary": {k: v for k, v in summary.items() if k != "question_stats"}
+        }
+        db.collection("archived_tickets").document(ticket_id).set(metadata)
+
+        # Hot data goes only after the blob and its metadata are safely stored
+        result = bulk_delete_tickets(db, [ticket_id])
+        if result is None or result["failed"]:
+            print(f"Error archiving ticket {ticket_id}: archived copy stored but the ticket could not be deleted")
+            return None
+        return metadata
+
+    except Exception as e:
+        print(f"Error archiving ticket {ticket_id}: {e}")
+        return None
+
+
+def run_archival(db, retention_days=TICKET_RETENTION_DAYS, dry_run=False):
+    """
+    Archive every closed ticket older than the retention period
+
+    Returns:
+        dict: Lists of archived and failed ticket IDs
+    """
+    archived = []
+    failed = []
+    for ticket in find_archivable_tickets(db, retention_days):
+        if dry_run:
+            archived.append(ticket["ticket_id"])
+            continue
+        if archive_ticket(db, ticket):
+            archived.append(ticket["ticket_id"])
+        else:
+            failed.append(ticket["ticket_id"])
+    return {"archived": archived, "failed": failed}
+
+
+def get_archived_tickets_by_teacher(db, teacher_name):
+    """Metadata of a teacher's archived tickets, most recently archived first"""
+    try:
+        docs = db.collection("archived_tickets") \
+                 .where(filter=FieldFilter("teacher_name", "==", teacher_name)) \
+                 .stream()
+        tickets = [doc.to_dict() for doc in docs]
+        tickets.sort(key=lambda t: _as_utc(t.get("archived_at")) or datetime.min.replace(tzinfo=timezone.utc),
+                     reverse=True)
+        return tickets
+    except Exception as e:
+        print(f"Error retrieving archived tickets: {e}")
+        return []
+
+
+def load_archived_ticket(db, ticket_id):
+    """
+    Load an archived ticket blob on demand
+
+    Returns:
+        dict: {"ticket", "responses", "summary", "archived_at"}, or None
+    """
+    try:
+        ticket_id = ticket_id.upper().strip()
+        meta = db.collection("archived_tickets").document(ticket_id).get()
+        if not meta.exists:
+            return None
+        return json.loads(gzip.decompress(read_archive_blob(meta.to_dict()["location"])))
+    except Exception as e:
+        print(f"Error loading archived ticket: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed exit tickets past the retention period")
+    parser.add_argument("--days", type=int, default=TICKET_RETENTION_DAYS, help="Retention period in days")
+    parser.add_argument("--dry-run", action="store_true", help="List tickets without archiving them")
+    args = parser.parse_args()
+
+    result = run_archival(init_firestore(), args.days, args.dry_run)
+    verb = "Would archive" if args.dry_run else "Archived"
+    print(f"{verb} {len(result['archived'])} tickets: {', '.join(result['archived']) or '-'}")
+    if result["failed"]:
+        print(f"Failed: {', '.join(result['failed'])}")
+
+
+if __name__ == "__main__":
+    main()
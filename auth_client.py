@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import uuid
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    AUTH_BACKEND,
+    AUTH_HTTP_POOL_SIZE,
+    AUTH_HTTP_TIMEOUT,
+    AUTH_SESSION_FILE,
+    AUTH_SESSION_TTL,
+    LOCAL_AUTH_USERS_FILE,
+    PROFILE_CACHE_TTL,
+)
+
+IDENTITY_TOOLKIT_URL = "https://identitytoolkit.googleapis.com/v1"
+SECURE_TOKEN_URL = "https://securetoken.googleapis.com/v1"
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Return the shared keep-alive HTTP session used for auth calls"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=AUTH_HTTP_POOL_SIZE, pool_maxsize=AUTH_HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+
+class FirebaseAuthBackend:
+    """Email/password auth against the Firebase Identity Toolkit REST API"""
+
+    def __init__(self, api_key, db=None):
+        self.api_key = api_key
+        self.db = db
+
+    def sign_in(self, email, password):
+        """Returns the sign-in payload (localId, idToken, refreshToken) or None"""
+        url = f"{IDENTITY_TOOLKIT_URL}/accounts:signInWithPassword?key={self.api_key}"
+        payload = {"email": email, "password": password, "returnSecureToken": True}
+        res = get_http_session().post(url, json=payload, timeout=AUTH_HTTP_TIMEOUT)
+        if res.status_code == 200:
+            return res.json()
+        return None
+
+    def refresh(self, refresh_token):
+        """Exchange a refresh token for a new ID token, returns None if revoked"""
+        url = f"{SECURE_TOKEN_URL}/token?key={self.api_key}"
+        payload = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+        res = get_http_session().post(url, data=payload, timeout=AUTH_HTTP_TIMEOUT)
+        if res.status_code != 200:
+            return None
+        data = res.json()
+        return {
+            "localId": data["user_id"],
+            "idToken": data["id_token"],
+            "refreshToken": data["refresh_token"]
+        }
+
+    def lookup_profile(self, uid):
+        doc = self.db.collection("users").document(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+
+class LocalAuthBackend:
+    """
+    Offline stand-in for Firebase Auth, for load tests and local development
+
+    Users are read from a JSON file of the form
+    {"user@school.edu": {"password": "...", "role": "Teacher"}}
+    """
+
+    def __init__(self, users_path=LOCAL_AUTH_USERS_FILE):
+        self.users = {}
+        if os.path.exists(users_path):
+            with open(users_path, encoding="utf-8") as f:
+                self.users = json.load(f)
+        self.refresh_tokens = {}
+        self.lock = threading.Lock()
+
+    def _uid(self, email):
+        return self.users[email].get("uid") or str(uuid.uuid5(uuid.NAMESPACE_URL, email))
+
+    def _issue(self, email):
+        refresh_token = uuid.uuid4().hex
+        with self.lock:
+            self.refresh_tokens[refresh_token] = email
+        return {
+            "localId": self._uid(email),
+            "email": email,
+            "idToken": uuid.uuid4().hex,
+            "refreshToken": refresh_token
+        }
+
+    def sign_in(self, email, password):
+        user = self.users.get(email)
+        if not user or user.get("password") != password:
+            return None
+        return self._issue(email)
+
+    def refresh(self, refresh_token):
+        with self.lock:
+            email = self.refresh_tokens.pop(refresh_token, None)
+        return self._issue(email) if email else None
+
+    def lookup_profile(self, uid):
+        for email, user in self.users.items():
+            if self._uid(email) == uid:
+                return {"email": email, "role": user.get("role", "Student")}
+        return None
+
+
+def create_auth_backend(api_key, db=None):
+    """Create the auth backend selected by AUTH_BACKEND in config.py"""
+    if AUTH_BACKEND == "local":
+        return LocalAuthBackend()
+    return FirebaseAuthBackend(api_key, db)
+
+
+# --- User profile cache ---
+
+_profile_cache = {}
+_profile_cache_lock = threading.Lock()
+
+
+def get_user_profile(backend, uid):
+    """
+    Return the users/{uid} document, cached for PROFILE_CACHE_TTL seconds
+
+    Nothing invalidates an entry early: profiles are written by the admin
+    panel, a separate process, so the short TTL is what bounds how long a
+    changed role can be stale.
+
+    Args:
+        backend: Auth backend providing lookup_profile
+        uid: Firebase user ID
+
+    Returns:
+        dict: Profile document, or None if the user has no profile
+    """
+    now = time.monotonic()
+    with _profile_cache_lock:
+        cached = _profile_cache.get(uid)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    profile = backend.lookup_profile(uid)
+
+    with _profile_cache_lock:
+        _profile_cache[uid] = (profile, now + PROFILE_CACHE_TTL)
+    return profile
+
+
+# --- Persisted login sessions ---
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+
+def _load_sessions():
+    global _sessions
+    if _sessions is None:
+        _sessions = {}
+        if AUTH_SESSION_FILE and os.path.exists(AUTH_SESSION_FILE):
+            try:
+                with open(AUTH_SESSION_FILE, encoding="utf-8") as f:
+                    _sessions = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading auth sessions: {e}")
+    return _sessions
+
+
+def _save_sessions():
+    if not AUTH_SESSION_FILE:
+        return
+    tmp_path = AUTH_SESSION_FILE + ".tmp"
+    # Refresh tokens are credentials, keep the file private to the server user
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(_sessions, f)
+    os.replace(tmp_path, AUTH_SESSION_FILE)
+
+
+def store_session(email, refresh_token, created_at=None):
+    """
+    Remember a refresh token under a newly minted opaque session ID
+
+    A fresh ID is issued on every sign-in and restore, never one supplied
+    by the browser, so a crafted link cannot fix the session ID in advance.
+    Entries expire AUTH_SESSION_TTL seconds after the original sign-in
+    (pass its created_at when rotating); expired entries are pruned
+    whenever a new one is stored.
+
+    Returns:
+        str: Session ID to hand to the browser
+    """
+    session_id = uuid.uuid4().hex
+    now = time.time()
+    with _sessions_lock:
+        sessions = _load_sessions()
+        for expired in [sid for sid, s in sessions.items() if s.get("expires_at", 0) <= now]:
+            del sessions[expired]
+        created_at = created_at or now
+        sessions[session_id] = {
+            "email": email,
+            "refresh_token": refresh_token,
+            "created_at": created_at,
+            "expires_at": created_at + AUTH_SESSION_TTL
+        }
+        _save_sessions()
+    return session_id
+
+
+def get_session(session_id):
+    """Return the stored {email, refresh_token, created_at} for a session ID, or None if unknown or expired"""
+    with _sessions_lock:
+        session = _load_sessions().get(session_id)
+        if not session:
+            return None
+        # Entries written before expiry was recorded count as expired
+        if session.get("expires_at", 0) <= time.time():
+            del _sessions[session_id]
+            _save_sessions()
+            return None
+        return dict(session)
+
+
+def drop_session(session_id):
+    """Forget a stored session (on logout or when its token is revoked)"""
+    with _sessions_lock:
+        if _load_sessions().pop(session_id, None) is not None:
+            _save_sessions()
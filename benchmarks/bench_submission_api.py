@@ -0,0 +1,115 @@
+"""
+Compare the cost of serving one student through the HTTP API vs Streamlit
+
+Both paths run in-process, so the numbers measure server work rather than
+network latency. Every simulated student writes a response named
+"bench-<uuid>" and updates the ticket's rollups, ability estimates and
+exposure counters, so the benchmark only runs against the Firestore
+emulator (FIRESTORE_EMULATOR_HOST) with a ticket published there.
+
+Usage:
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmarks/bench_submission_api.py --ticket ABC123 --students 50
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+async def call_asgi(app, method, path, body=None):
+    """Send one request straight to an ASGI app and return (status, body)"""
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    request_body = json.dumps(body).encode("utf-8") if body is not None else b""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": request_body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    status = messages[0]["status"]
+    payload = messages[1].get("body", b"")
+    return status, json.loads(payload) if payload else None
+
+
+async def run_api_students(ticket_id, students, concurrency):
+    import api_server
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_student():
+        async with semaphore:
+            status, ticket = await call_asgi(api_server.app, "GET", f"/tickets/{ticket_id}")
+            assert status == 200, f"ticket fetch failed with {status}"
+            answers = {str(q["index"]): "A" for q in ticket["questions"][:3]}
+            status, _ = await call_asgi(api_server.app, "POST", f"/tickets/{ticket_id}/responses",
+                                        {"student_name": f"bench-{uuid.uuid4().hex[:8]}", "answers": answers})
+            assert status == 201, f"submission failed with {status}"
+
+    await asyncio.gather(*(one_student() for _ in range(students)))
+
+
+def bench_api(ticket_id, students, concurrency):
+    start = time.perf_counter()
+    asyncio.run(run_api_students(ticket_id, students, concurrency))
+    return time.perf_counter() - start, students * 2
+
+
+def bench_streamlit(ticket_id, students):
+    """Drive the server-rendered quiz flow (one script run per click)"""
+    import config
+    from streamlit.testing.v1 import AppTest
+
+    config.CLIENT_SIDE_QUIZ = False
+    runs = 0
+    start = time.perf_counter()
+    for _ in range(students):
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+        at.session_state.logged_in = True
+        at.session_state.role = "Student"
+        at.session_state.username = "bench"
+        at.run()
+        at.text_input[0].input(ticket_id)
+        at.button(key="FormSubmitter:ticket_id_form-🚀 Access Exit Ticket").click().run()
+        at.text_input[0].input(f"bench-{uuid.uuid4().hex[:8]}").run()
+        runs += 3
+
+        while not at.session_state.ticket_quiz_completed:
+            current_q = at.session_state.ticket_current_question
+            at.button(key=f"FormSubmitter:ticket_question_{current_q}-Submit Answer").click().run()
+            nav = [b for b in at.button if b.key in (f"ticket_next_{current_q}", f"ticket_finish_{current_q}")]
+            nav[0].click().run()
+            runs += 2
+    return time.perf_counter() - start, runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ticket", required=True, help="Active ticket ID to submit against")
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent API students")
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        parser.error("Set FIRESTORE_EMULATOR_HOST: the benchmark writes responses and must not run against live data")
+
+    api_seconds, api_requests = bench_api(args.ticket, args.students, args.concurrency)
+    st_seconds, st_runs = bench_streamlit(args.ticket, args.students)
+
+    print(f"HTTP API:  {args.students / api_seconds:8.1f} students/s  "
+          f"{api_requests / api_seconds:8.1f} requests/s  ({api_requests} requests)")
+    print(f"Streamlit: {args.students / st_seconds:8.1f} students/s  "
+          f"{st_runs / st_seconds:8.1f} script runs/s  ({st_runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
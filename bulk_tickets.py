@@ -0,0 +1,286 @@
+"""
+Bulk exit ticket pipeline
+
+Generates and publishes a whole semester of exit tickets from a CSV or JSON
+file of lectures. Each row needs `subject` and `lecture_topics`, and may set
+`instructions`, `count` and `title`.
+
+Progress is written to a JSON file after every step, so re-running the same
+command after a crash skips lectures that were already generated (no second
+model call) or published (no duplicate ticket).
+
+Usage:
+    python bulk_tickets.py lectures.csv --teacher teacher@school.edu --workers 4
+"""
+import os
+import csv
+import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_TICKET_QUESTIONS = 5
+MAX_TICKET_QUESTIONS = 10
+
+
+def load_lecture_rows(path):
+    """
+    Read and validate lecture rows from a CSV or JSON file
+
+    Returns:
+        list: Normalized row dicts
+
+    Raises:
+        ValueError: If any row is missing required fields or has a bad count
+    """
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            raw_rows = json.load(f)
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            raw_rows = list(csv.DictReader(f))
+
+    rows = []
+    errors = []
+    for i, raw in enumerate(raw_rows, start=1):
+        subject = (raw.get("subject") or "").strip()
+        lecture_topics = (raw.get("lecture_topics") or "").strip()
+        if not subject or not lecture_topics:
+            errors.append(f"row {i}: subject and lecture_topics are required")
+            continue
+
+        try:
+            count = int(raw.get("count") or DEFAULT_TICKET_QUESTIONS)
+        except (TypeError, ValueError):
+            errors.append(f"row {i}: count must be a number")
+            continue
+        if not 1 <= count <= MAX_TICKET_QUESTIONS:
+            errors.append(f"row {i}: count must be between 1 and {MAX_TICKET_QUESTIONS}")
+            continue
+
+        rows.append({
+            "subject": subject,
+            "lecture_topics": lecture_topics,
+            "instructions": (raw.get("instructions") or "").strip(),
+            "count": count,
+            "title": (raw.get("title") or "").strip() or None
+        })
+
+    if errors:
+        raise ValueError("Invalid lecture file:\n" + "\n".join(errors))
+    return rows
+
+
+def row_keys(rows, teacher_name):
+    """Stable progress keys per row (identical rows get distinct keys)"""
+    keys = []
+    seen = {}
+    for row in rows:
+        payload = json.dumps({"teacher": teacher_name, **row}, sort_keys=True)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        keys.append(f"{digest}:{occurrence}")
+    return keys
+
+
+class ProgressFile:
+    """Thread-safe JSON progress store that survives crashes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.rows = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.rows = json.load(f).get("rows", {})
+
+    def get(self, key):
+        with self.lock:
+            return dict(self.rows.get(key, {}))
+
+    def update(self, key, **fields):
+        with self.lock:
+            self.rows.setdefault(key, {}).update(fields)
+            # Write to a temp file first so a crash never leaves a torn file
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"rows": self.rows}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def generate_pending(rows, keys, progress, workers, db=None, teacher_name=""):
+    """
+    Generate questions for every row that has none yet, with bounded parallelism
+
+    Model usage is billed to teacher_name and kept per row until publishing.
+    """
+    from mcq_generator import generate_mcq_set
+    from usage_tracking import usage_scope
+
+    pending = [(key, row) for key, row in zip(keys, rows)
+               if progress.get(key).get("status") in (None, "pending", "failed")]
+    if not pending:
+        return
+
+    def generate(row):
+        with usage_scope(db, teacher_name) as usage:
+            questions = generate_mcq_set(row["lecture_topics"], row["instructions"], row["count"], row["subject"],
+                                         db=db)
+        return questions, usage.totals
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(generate, row): (key, row) for key, row in pending}
+        for future in as_completed(futures):
+            key, row = futures[future]
+            try:
+                questions, usage = future.result()
+            except Exception as e:
+                print(f"Error generating tickets for {row['subject']}: {e}")
+                progress.update(key, status="failed", error=str(e))
+                continue
+            progress.update(key, status="generated", questions=questions, usage=usage, error=None)
+            print(f"Generated {len(questions)} questions for {row['subject']}")
+
+
+def publish_generated(db, rows, keys, progress, teacher_name):
+    """
+    Publish every generated row through batched Firestore writes
+
+    A row moves through publishing (ticket ID reserved), ticket_created,
+    questions_saved and published, so a resumed run redoes only the steps
+    that had not finished.
+    """
+    from firebase_helper import (
+        create_exit_tickets_batch,
+        generate_ticket_id,
+        get_exit_ticket,
+        save_questions_batch,
+        ticket_exists,
+    )
+    from usage_tracking import record_ticket_usage
+
+    specs = []
+    spec_keys = []
+    for key, row in zip(keys, rows):
+        entry = progress.get(key)
+        status = entry.get("status")
+
+        # A crash between committing and recording it leaves "publishing" on
+        # a ticket that exists; the reserved ID may also have been taken since
+        if status == "publishing" and entry.get("ticket_id"):
+            existing = get_exit_ticket(db, entry["ticket_id"])
+            if existing and existing.get("teacher_name") == teacher_name \
+                    and existing.get("lecture_topics") == row["lecture_topics"]:
+                progress.update(key, status="ticket_created")
+                continue
+        if status not in ("generated", "publishing"):
+            continue
+
+        ticket_id = entry.get("ticket_id")
+        if not ticket_id:
+            ticket_id = generate_ticket_id()
+            while ticket_exists(db, ticket_id) or ticket_id in (s["ticket_id"] for s in specs):
+                ticket_id = generate_ticket_id()
+            progress.update(key, status="publishing", ticket_id=ticket_id)
+
+        specs.append({
+            "ticket_id": ticket_id,
+            "questions": entry["questions"],
+            "teacher_name": teacher_name,
+            "subject": row["subject"],
+            "lecture_topics": row["lecture_topics"],
+            "ticket_title": row["title"]
+        })
+        spec_keys.append(key)
+
+    if specs:
+        # Reserved IDs taken in the meantime are re-rolled; keep the IDs actually used
+        for key, ticket in zip(spec_keys, create_exit_tickets_batch(db, specs)):
+            progress.update(key, status="ticket_created", ticket_id=ticket["ticket_id"])
+
+    created = [key for key in keys if progress.get(key).get("status") == "ticket_created"]
+    if created:
+        # Copies, as the bank entries gain fields the progress file can't hold
+        save_questions_batch(db, [dict(q) for key in created for q in progress.get(key)["questions"]], source="ai")
+        for key in created:
+            progress.update(key, status="questions_saved")
+
+    saved = [key for key in keys if progress.get(key).get("status") == "questions_saved"]
+    for key in saved:
+        entry = progress.get(key)
+        record_ticket_usage(db, entry["ticket_id"], entry.get("usage"))
+        progress.update(key, status="published")
+    if saved:
+        print(f"Published {len(saved)} tickets")
+
+
+def build_manifest(rows, keys, progress):
+    """Summarize the outcome of every row in input order"""
+    manifest = []
+    for i, (key, row) in enumerate(zip(keys, rows), start=1):
+        entry = progress.get(key)
+        manifest.append({
+            "row": i,
+            "subject": row["subject"],
+            "title": row["title"] or f"{row['subject']} Exit Ticket",
+            "status": entry.get("status", "pending"),
+            "ticket_id": entry.get("ticket_id"),
+            "error": entry.get("error")
+        })
+    return manifest
+
+
+def run_bulk_pipeline(db, lectures_path, teacher_name, workers=4, progress_path=None):
+    """
+    Generate and publish exit tickets for every lecture in a file
+
+    Args:
+        db: Firestore client
+        lectures_path: CSV or JSON file of lecture rows
+        teacher_name: Teacher the tickets are published under
+        workers: Maximum number of concurrent model calls
+        progress_path: Resumable progress file (defaults next to the input)
+
+    Returns:
+        list: Manifest entries with the ticket ID of each published lecture
+    """
+    rows = load_lecture_rows(lectures_path)
+    keys = row_keys(rows, teacher_name)
+    progress = ProgressFile(progress_path or lectures_path + ".progress.json")
+
+    generate_pending(rows, keys, progress, workers, db, teacher_name)
+    publish_generated(db, rows, keys, progress, teacher_name)
+
+    return build_manifest(rows, keys, progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and publish exit tickets for a semester of lectures")
+    parser.add_argument("lectures", help="CSV or JSON file of (subject, lecture_topics, instructions, count) rows")
+    parser.add_argument("--teacher", required=True, help="Teacher email the tickets are published under")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent generation calls")
+    parser.add_argument("--progress", help="Progress file used to resume an interrupted run")
+    parser.add_argument("--manifest", help="Write the ticket manifest to this file instead of stdout")
+    args = parser.parse_args()
+
+    from mcq_generator import configure_genai
+    from firebase_helper import init_firestore
+
+    if not configure_genai():
+        parser.error("Google API key not found. Set GOOGLE_API_KEY or .streamlit/secrets.toml")
+
+    manifest = run_bulk_pipeline(init_firestore(), args.lectures, args.teacher,
+                                 workers=max(1, args.workers), progress_path=args.progress)
+
+    output = json.dumps(manifest, indent=2)
+    if args.manifest:
+        with open(args.manifest, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
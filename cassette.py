@@ -0,0 +1,297 @@
+"""
+Record/replay cassettes for Gemini and Firestore traffic
+
+Set CASSETTE_MODE=record to capture every model call and Firestore
+operation to CASSETTE_PATH (gzipped JSON lines), then CASSETTE_MODE=replay
+to serve the same traffic back offline. Replayed calls sleep for the
+recorded latency multiplied by CASSETTE_LATENCY_SCALE (0 disables delays).
+
+Requests are matched exactly first (same prompt, same document path and
+query). Values that differ from run to run, such as random ticket IDs,
+auto document IDs, timestamps and write payloads, fall back to matching the
+next unused interaction with the same shape, so recorded sessions replay
+deterministically.
+"""
+import os
+import re
+import json
+import gzip
+import time
+import uuid
+import base64
+import hashlib
+import threading
+from types import SimpleNamespace
+from datetime import datetime
+from collections import defaultdict, deque
+
+from config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_LATENCY_SCALE
+
+# Query-building calls extend the proxied chain; every other call is an operation
+CHAIN_METHODS = {
+    "collection", "document", "collection_group", "where", "order_by", "limit",
+    "limit_to_last", "offset", "start_at", "start_after", "end_at", "end_before",
+    "select", "count", "sum", "avg", "batch", "bulk_writer",
+}
+# Operations whose payload is volatile and therefore left out of the exact key
+WRITE_METHODS = {"set", "add", "update", "create", "delete"}
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when no recorded interaction matches a request"""
+
+
+class Cassette:
+    def __init__(self, path, mode, latency_scale=1.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.lock = threading.Lock()
+        self.exact = defaultdict(deque)
+        self.shapes = defaultdict(deque)
+
+        if mode == "replay":
+            self._load()
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                # Both indexes share the entry so consuming one consumes it everywhere
+                entry["used"] = False
+                self.exact[entry["key"]].append(entry)
+                self.shapes[entry["shape"]].append(entry)
+
+    def record(self, key, shape, response, latency):
+        line = json.dumps({"key": key, "shape": shape, "response": response, "latency": round(latency, 4)})
+        with self.lock:
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def replay(self, key, shape, with_latency=False):
+        with self.lock:
+            entry = self._take(self.exact.get(key)) or self._take(self.shapes.get(shape))
+        if entry is None:
+            raise CassetteMiss(f"No recorded interaction for {key}")
+        if self.latency_scale:
+            time.sleep(entry["latency"] * self.latency_scale)
+        if with_latency:
+            return entry["response"], entry["latency"]
+        return entry["response"]
+
+    @staticmethod
+    def _take(queue):
+        while queue:
+            entry = queue.popleft()
+            if not entry["used"]:
+                entry["used"] = True
+                return entry
+        return None
+
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def get_active_cassette():
+    """Return the process-wide cassette selected by CASSETTE_MODE, or None"""
+    global _active
+    if CASSETTE_MODE not in ("record", "replay"):
+        return None
+    with _active_lock:
+        if _active is None:
+            _active = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE)
+        return _active
+
+
+# --- Value encoding ---
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, FirestoreProxy):
+        return {"__ref__": value._describe()}
+    if hasattr(value, "field_path") and hasattr(value, "op_string"):
+        return {"__filter__": [value.field_path, value.op_string, _encode(value.value)]}
+    if hasattr(value, "to_dict") and hasattr(value, "exists"):
+        return {"__snapshot__": {
+            "id": value.id,
+            "path": value.reference.path,
+            "exists": value.exists,
+            "data": _encode(value.to_dict())
+        }}
+    if hasattr(value, "alias") and hasattr(value, "value"):
+        return {"__aggregation__": [value.alias, _encode(value.value)]}
+    if hasattr(value, "path") and hasattr(value, "id"):
+        return {"__docref__": value.path}
+    return {"__repr__": type(value).__name__}
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    if "__snapshot__" in value:
+        return ReplayedSnapshot(**value["__snapshot__"])
+    if "__docref__" in value:
+        return ReplayedDocumentReference(value["__docref__"])
+    if "__aggregation__" in value:
+        return ReplayedAggregation(*value["__aggregation__"])
+    if "__repr__" in value:
+        return None
+    return {k: _decode(v) for k, v in value.items()}
+
+
+class ReplayedDocumentReference:
+    def __init__(self, path):
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+
+class ReplayedSnapshot:
+    def __init__(self, id, path, exists, data):
+        self.id = id
+        self.exists = exists
+        self.reference = ReplayedDocumentReference(path)
+        self._data = _decode(data)
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class ReplayedAggregation:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = _decode(value)
+
+
+# --- Firestore proxy ---
+
+def _shape(description):
+    """Wildcard document IDs and literal values so volatile requests still match"""
+    shape = re.sub(r"document\([^)]*\)", "document(*)", description)
+    return re.sub(r"\{.*\}", "{*}", shape)
+
+
+def _unwrap(value):
+    """Real Firestore object behind a proxy, including proxies inside lists (get_all)"""
+    if isinstance(value, FirestoreProxy):
+        return value._target
+    if isinstance(value, list):
+        return [_unwrap(v) for v in value]
+    return value
+
+
+class FirestoreProxy:
+    """Wraps a Firestore client/reference/query and records or replays its operations"""
+
+    def __init__(self, target, cassette, chain=()):
+        self._target = target
+        self._cassette = cassette
+        self._chain = chain
+
+    def _describe(self):
+        return ".".join(self._chain)
+
+    def __getattr__(self, name):
+        if name in ("id", "path") and self._chain:
+            if not self._cassette.replaying:
+                return getattr(self._target, name)
+            segments = []
+            for step in self._chain:
+                if step.startswith(("collection(\"", "document(\"")):
+                    segments.append(json.loads(step[step.index("(") + 1:-1]))
+                elif step == "document(<auto>)":
+                    segments.append(uuid.uuid4().hex[:20])
+            return "/".join(segments) if name == "path" else segments[-1]
+
+        def call(*args, **kwargs):
+            real_args = [_unwrap(a) for a in args]
+            real_kwargs = {k: (v._target if isinstance(v, FirestoreProxy) else v) for k, v in kwargs.items()}
+
+            if name in CHAIN_METHODS:
+                # Auto-generated document IDs differ between runs, keep them out of the key
+                label = "<auto>" if name == "document" and not args else ",".join(
+                    json.dumps(_encode(a), sort_keys=True) for a in list(args) + list(kwargs.values()))
+                step = f"{name}({label})"
+                target = None if self._cassette.replaying else getattr(self._target, name)(*real_args, **real_kwargs)
+                return FirestoreProxy(target, self._cassette, self._chain + (step,))
+
+            payload = "" if name in WRITE_METHODS else json.dumps(
+                _encode([list(args), kwargs]), sort_keys=True)
+            key = f"firestore:{self._describe()}.{name}({payload})"
+            shape = f"firestore:{_shape(self._describe())}.{name}"
+            ref_args = [a._describe() for a in args if isinstance(a, FirestoreProxy)]
+            if ref_args:
+                key += f"@{ref_args}"
+
+            if self._cassette.replaying:
+                return _decode(self._cassette.replay(key, shape))
+
+            start = time.perf_counter()
+            result = getattr(self._target, name)(*real_args, **real_kwargs)
+            if name in ("stream", "get_all"):
+                result = list(result)
+            self._cassette.record(key, shape, _encode(result), time.perf_counter() - start)
+            return result
+
+        return call
+
+
+def wrap_firestore(client):
+    """Wrap a Firestore client with the active cassette, or return it unchanged"""
+    cassette = get_active_cassette()
+    if cassette is None:
+        return client
+    return FirestoreProxy(client, cassette)
+
+
+# --- Model calls ---
+
+class ReplayedModelResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(**usage_metadata) if usage_metadata else None
+
+
+def model_call_keys(prompt, call_type):
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"model:{call_type}:{digest}", f"model:{call_type}"
+
+
+def replay_model_call(cassette, prompt, call_type):
+    """Return (response, model_name, recorded latency) for a recorded model call"""
+    key, shape = model_call_keys(prompt, call_type)
+    recorded, latency = cassette.replay(key, shape, with_latency=True)
+    return ReplayedModelResponse(recorded["text"], recorded.get("usage")), recorded["model"], latency
+
+
+def record_model_call(cassette, prompt, call_type, model_name, response, latency):
+    key, shape = model_call_keys(prompt, call_type)
+    metadata = getattr(response, "usage_metadata", None)
+    # Token counts are kept so usage accounting works the same during replay
+    usage = {field: getattr(metadata, field, 0) or 0
+             for field in ("prompt_token_count", "candidates_token_count", "total_token_count")}
+    cassette.record(key, shape, {"model": model_name, "text": response.text, "usage": usage}, latency)
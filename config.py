@@ -13,7 +13,128 @@ PAGE_LAYOUT = "wide"
 
 # Quiz Configuration
 DEFAULT_QUESTIONS_COUNT = 3
+# Questions each student is assigned from a ticket (see question_assignment.py)
+QUESTIONS_PER_STUDENT = 3
+# Documents the per-ticket question exposure counter is spread over
+EXPOSURE_COUNTER_SHARDS = 4
 
 # UI Configuration
 QUESTION_HEIGHT = 100
-INSTRUCTIONS_HEIGHT = 70 
\ No newline at end of file
+INSTRUCTIONS_HEIGHT = 70
+
+# Model Routing Configuration
+# Ordered model preferences per call type; later models are fallbacks on timeout
+MODEL_ROUTES = {
+    "ticket": ["gemini-2.0-flash-exp", "gemini-1.5-flash"],
+    "regenerate": ["gemini-2.0-flash-lite", "gemini-2.0-flash-exp"],
+    "extract": ["gemini-2.0-flash-lite", "gemini-1.5-flash"],
+}
+# Per-call timeout in seconds for each call type
+MODEL_TIMEOUTS = {
+    "ticket": 60,
+    "regenerate": 20,
+    "extract": 30,
+}
+# Weight of the newest sample in the per-model latency moving average
+MODEL_LATENCY_SMOOTHING = 0.3
+# Seconds a model is moved to the back of its route after timing out
+MODEL_TIMEOUT_COOLDOWN = 300
+
+# Auth Configuration
+# "firebase" uses Firebase Auth; "local" uses an offline stand-in for load tests
+AUTH_BACKEND = os.getenv("AUTH_BACKEND", "firebase")
+LOCAL_AUTH_USERS_FILE = os.getenv("LOCAL_AUTH_USERS_FILE", "local_auth_users.json")
+AUTH_HTTP_POOL_SIZE = 10
+AUTH_HTTP_TIMEOUT = 10  # seconds
+# Seconds a users/{uid} profile document is cached after it is read. The cache is
+# per process and the admin panel runs separately, so a role change made there
+# reaches the app's sign-ins only after this long
+PROFILE_CACHE_TTL = 60
+# File where refresh tokens are kept so a page reload doesn't force a new sign-in
+AUTH_SESSION_FILE = os.getenv("AUTH_SESSION_FILE", ".streamlit/auth_sessions.json")
+# Seconds a remembered login stays valid; the session ID is rotated on every restore
+AUTH_SESSION_TTL = int(os.getenv("AUTH_SESSION_TTL", str(7 * 24 * 3600)))
+
+# Performance Logging
+# Set PERF_LOGGING=1 to print server time for every script run and fragment rerun
+PERF_LOGGING = os.getenv("PERF_LOGGING") == "1"
+
+# Student Quiz Configuration
+# Run the exit ticket quiz in the browser; each answer is locked on the server
+# before its correct answer is sent back, so the key is never exposed up front
+CLIENT_SIDE_QUIZ = True
+
+# HTTP API Configuration
+# Seconds a fetched ticket is cached by api_server.py and by HTTP clients
+API_TICKET_CACHE_TTL = 60
+
+# Record/Replay Configuration
+# CASSETTE_MODE=record captures Gemini and Firestore traffic, =replay serves it offline
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/session.jsonl.gz")
+# Multiplier for recorded latencies during replay (0 replays instantly)
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))
+
+# Storage Layout
+# "flat" keeps every response in student_responses; "subcollection" stores
+# them under tickets/{ticket_id}/responses (run migrate_responses.py first)
+RESPONSES_LAYOUT = os.getenv("RESPONSES_LAYOUT", "flat")
+
+# Bulk Ticket Operations
+# BulkWriter throttle (writes per second) for cascading ticket deletes
+BULK_DELETE_INITIAL_OPS = 100
+BULK_DELETE_MAX_OPS = 500
+# Attempts per document before a failed delete is reported instead of retried
+BULK_DELETE_MAX_ATTEMPTS = 5
+
+# Ticket Retention
+# Closed (non-active) tickets older than this many days are moved to archive
+# storage by archival.py, one gzipped JSON blob per ticket
+TICKET_RETENTION_DAYS = int(os.getenv("TICKET_RETENTION_DAYS", "180"))
+# Cloud Storage bucket for archive blobs; when empty they are kept in ARCHIVE_DIR
+ARCHIVE_BUCKET = os.getenv("ARCHIVE_BUCKET", "")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archives")
+
+# Admin Statistics
+# Seconds the school-wide aggregation results are cached on the admin page
+ADMIN_STATS_CACHE_TTL = 600
+
+# Ability Model
+# Elo step size for a student/question with n answers is K_BASE / (1 + K_DECAY * n)
+ABILITY_K_BASE = 1.0
+ABILITY_K_DECAY = 0.05
+
+# Class Rosters
+# Seconds a roster's student list is cached when computing completion
+ROSTER_CACHE_TTL = 300
+
+# Analytics Mirror
+# SQLite file that analytics_mirror.py keeps in sync with Firestore for ad-hoc queries
+ANALYTICS_MIRROR_PATH = os.getenv("ANALYTICS_MIRROR_PATH", "analytics_mirror.db")
+# Seconds re-read before each collection's watermark to cover clock skew between writers
+MIRROR_SYNC_OVERLAP = 300
+
+# Lecture Ingestion
+# Lecture text longer than this is condensed chunk by chunk before generation (see lecture_ingest.py)
+INGEST_THRESHOLD_CHARS = 6000
+# Chunk size bounds in characters
+INGEST_CHUNK_MIN_CHARS = 1500
+INGEST_CHUNK_MAX_CHARS = 4000
+# Concurrent "extract" model calls while condensing one lecture
+INGEST_MAX_WORKERS = 4
+
+# Lecture File Upload
+# Characters of text kept from uploaded lecture files (keeps cached text under Firestore's 1 MiB limit)
+UPLOAD_MAX_CHARS = 150000
+
+# Model Usage Accounting
+# USD per million (input, output) tokens for each model; "default" prices unlisted models
+MODEL_PRICING = {
+    "gemini-2.0-flash-exp": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "default": (0.10, 0.40),
+}
+# Per-teacher daily generation limits (0 disables a limit)
+DAILY_BUDGET_USD = float(os.getenv("DAILY_BUDGET_USD", "0"))
+DAILY_TOKEN_BUDGET = int(os.getenv("DAILY_TOKEN_BUDGET", "0"))
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+Headless command-line interface for exit tickets (no Streamlit import)
+
+Examples:
+    python exit_ticket_cli.py generate --subject "Networking" --topics-file lecture.txt --count 5 > questions.json
+    python exit_ticket_cli.py publish --teacher teacher@school.edu --subject "Networking" --questions questions.json
+    python exit_ticket_cli.py list --teacher teacher@school.edu --json
+    python exit_ticket_cli.py analytics ABC123 --json
+    python exit_ticket_cli.py export ABC123 --format csv > responses.csv
+    python exit_ticket_cli.py sync-mirror
+    python exit_ticket_cli.py mirror-query --teacher teacher@school.edu --roster ROSTER_ID --days 30
+
+Heavy dependencies (Firebase, Gemini) are imported only by the subcommands
+that need them, so `--help` and argument errors return immediately.
+"""
+import sys
+import csv
+import json
+import argparse
+
+
+def _db():
+    from firebase_helper import init_firestore
+    return init_firestore()
+
+
+def _read_text(value, path):
+    if path == "-":
+        return sys.stdin.read()
+    if path:
+        from lecture_files import file_extension, extract_text
+        if file_extension(path) in ("pdf", "pptx"):
+            with open(path, "rb") as f:
+                try:
+                    return extract_text(f, path)["text"]
+                except ValueError as e:
+                    sys.exit(f"error: {e}")
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    return value or ""
+
+
+def _emit(args, payload, text_lines):
+    """Print JSON when --json is set, otherwise the human-readable lines"""
+    if args.json:
+        json.dump(payload, sys.stdout, indent=2, default=str)
+        sys.stdout.write("\n")
+    else:
+        for line in text_lines:
+            print(line)
+
+
+def cmd_generate(args):
+    from mcq_generator import configure_genai, generate_mcq_set
+
+    topics = _read_text(args.topics, args.topics_file)
+    if not topics.strip():
+        sys.exit("error: lecture topics are required (--topics or --topics-file)")
+    if not configure_genai():
+        sys.exit("error: Google API key not found. Set GOOGLE_API_KEY or .streamlit/secrets.toml")
+
+    questions = generate_mcq_set(topics, args.instructions, args.count, args.subject)
+    # Generated questions are always JSON so they can be piped into `publish`
+    json.dump({"subject": args.subject, "lecture_topics": topics, "questions": questions},
+              sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+def cmd_publish(args):
+    from firebase_helper import create_exit_ticket, save_questions_batch
+
+    data = json.loads(_read_text(None, args.questions))
+    questions = data.get("questions", data) if isinstance(data, dict) else data
+    subject = args.subject or (data.get("subject") if isinstance(data, dict) else None)
+    topics = args.topics or (data.get("lecture_topics") if isinstance(data, dict) else "") or ""
+    if not subject or not questions:
+        sys.exit("error: a subject and at least one question are required")
+
+    db = _db()
+    ticket = create_exit_ticket(db, questions, args.teacher, subject, topics, args.title)
+    if not ticket:
+        sys.exit("error: failed to publish exit ticket")
+    save_questions_batch(db, [dict(q, subject=subject) for q in questions], source="ai")
+
+    _emit(args, {"ticket_id": ticket["ticket_id"], "title": ticket["title"],
+                 "total_questions": ticket["total_questions"]},
+          [f"Published {ticket['ticket_id']}: {ticket['title']} ({ticket['total_questions']} questions)"])
+
+
+def cmd_list(args):
+    from firebase_helper import get_all_tickets_by_teacher
+
+    tickets = get_all_tickets_by_teacher(_db(), args.teacher)
+    summaries = [{
+        "ticket_id": t["ticket_id"],
+        "title": t.get("title", ""),
+        "subject": t.get("subject", ""),
+        "status": t.get("status", "unknown"),
+        "total_questions": t.get("total_questions", 0),
+        "created_at": t.get("created_at")
+    } for t in tickets]
+    _emit(args, summaries,
+          [f"{t['ticket_id']}  {t['status']:<8}  {t['title']}" for t in summaries] or ["No tickets found."])
+
+
+def cmd_analytics(args):
+    from firebase_helper import get_ticket_analytics
+
+    analytics = get_ticket_analytics(_db(), args.ticket_id)
+    if not args.with_responses:
+        analytics.pop("responses", None)
+    _emit(args, analytics, [f"{key}: {value}" for key, value in analytics.items() if key != "responses"])
+
+
+def cmd_export(args):
+    from firebase_helper import get_exit_ticket, get_ticket_responses, match_response_answers
+    from ability_model import question_key
+
+    db = _db()
+    ticket = get_exit_ticket(db, args.ticket_id) or {}
+    questions = ticket.get("questions", [])
+    key_index = {question_key(q): i for i, q in enumerate(questions)}
+    responses = get_ticket_responses(db, args.ticket_id)
+
+    if args.format == "json":
+        for response in responses:
+            response["answers_by_question"] = {
+                question_key(questions[index]): answer
+                for index, answer in match_response_answers(response, questions, key_index)
+            }
+        json.dump(responses, sys.stdout, indent=2, default=str)
+        sys.stdout.write("\n")
+        return
+
+    # One column per ticket question, blank where the student wasn't asked it
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["student_name", "completed_at", "correct_count", "total_questions", "percentage"]
+                    + [f"Q{i + 1}" for i in range(len(questions))])
+    for response in responses:
+        score = response.get("score", {})
+        answers = [""] * len(questions)
+        for index, answer in match_response_answers(response, questions, key_index):
+            answers[index] = answer
+        writer.writerow([
+            response.get("student_name", ""),
+            response.get("completed_at", ""),
+            score.get("correct_count", 0),
+            score.get("total_questions", 0),
+            score.get("percentage", 0)
+        ] + answers)
+
+
+def cmd_sync_mirror(args):
+    from analytics_mirror import sync_mirror
+
+    counts = sync_mirror(_db(), args.path, args.full)
+    if counts is None:
+        sys.exit("error: failed to sync the analytics mirror")
+    _emit(args, counts, [f"{collection}: {count} documents synced" for collection, count in counts.items()])
+
+
+def cmd_mirror_query(args):
+    """Aggregate over the local mirror without touching Firestore"""
+    from datetime import datetime, timedelta, timezone
+    from analytics_mirror import connect, query, subtopic_performance
+
+    conn = connect(args.path)
+    try:
+        if args.sql:
+            rows = query(conn, args.sql)
+        else:
+            since = datetime.now(timezone.utc) - timedelta(days=args.days) if args.days else None
+            rows = subtopic_performance(conn, args.teacher, args.subject, args.roster, since)
+    finally:
+        conn.close()
+    _emit(args, rows, ["  ".join(str(value) for value in row.values()) for row in rows] or ["No rows."])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Exit ticket generation, publishing and reporting")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    json_flag = argparse.ArgumentParser(add_help=False)
+    json_flag.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+
+    generate = subparsers.add_parser("generate", help="Generate MCQs and print them as JSON")
+    generate.add_argument("--subject", required=True)
+    generate.add_argument("--topics", help="Lecture topics text")
+    generate.add_argument("--topics-file", help="Read lecture topics from a text, PDF or PPTX file ('-' for stdin)")
+    generate.add_argument("--instructions", default="", help="Additional AI instructions")
+    generate.add_argument("--count", type=int, default=5, help="Number of questions")
+    generate.set_defaults(func=cmd_generate)
+
+    publish = subparsers.add_parser("publish", parents=[json_flag], help="Publish generated questions as a ticket")
+    publish.add_argument("--teacher", required=True, help="Teacher email the ticket belongs to")
+    publish.add_argument("--questions", default="-", help="JSON from `generate` ('-' for stdin)")
+    publish.add_argument("--subject", help="Overrides the subject stored in the questions file")
+    publish.add_argument("--topics", help="Overrides the lecture topics stored in the questions file")
+    publish.add_argument("--title", help="Custom ticket title")
+    publish.set_defaults(func=cmd_publish)
+
+    list_cmd = subparsers.add_parser("list", parents=[json_flag], help="List a teacher's tickets")
+    list_cmd.add_argument("--teacher", required=True)
+    list_cmd.set_defaults(func=cmd_list)
+
+    analytics = subparsers.add_parser("analytics", parents=[json_flag], help="Dump analytics for a ticket")
+    analytics.add_argument("ticket_id")
+    analytics.add_argument("--with-responses", action="store_true", help="Include individual responses")
+    analytics.set_defaults(func=cmd_analytics)
+
+    export = subparsers.add_parser("export", help="Export a ticket's responses")
+    export.add_argument("ticket_id")
+    export.add_argument("--format", choices=["json", "csv"], default="json")
+    export.set_defaults(func=cmd_export)
+
+    sync_mirror = subparsers.add_parser("sync-mirror", parents=[json_flag],
+                                        help="Incrementally sync the local SQLite analytics mirror")
+    sync_mirror.add_argument("--path", help="Mirror database file (default ANALYTICS_MIRROR_PATH)")
+    sync_mirror.add_argument("--full", action="store_true", help="Rebuild the mirror from scratch")
+    sync_mirror.set_defaults(func=cmd_sync_mirror)
+
+    mirror_query = subparsers.add_parser("mirror-query", parents=[json_flag],
+                                         help="Subtopic accuracy (or any SQL) from the local mirror")
+    mirror_query.add_argument("--path", help="Mirror database file (default ANALYTICS_MIRROR_PATH)")
+    mirror_query.add_argument("--teacher", help="Only this teacher's tickets")
+    mirror_query.add_argument("--subject", help="Only tickets of this subject")
+    mirror_query.add_argument("--roster", help="Only tickets assigned to this roster ID")
+    mirror_query.add_argument("--days", type=int, help="Only responses from the last N days")
+    mirror_query.add_argument("--sql", help="Run this SQL instead of the subtopic report")
+    mirror_query.set_defaults(func=cmd_mirror_query)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,70 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1.base_query import FieldFilter  # Add this import
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
 import uuid
-from datetime import datetime
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from cassette import wrap_firestore
+from ability_model import question_key
+from config import RESPONSES_LAYOUT, BULK_DELETE_INITIAL_OPS, BULK_DELETE_MAX_OPS, BULK_DELETE_MAX_ATTEMPTS
 
 def init_firestore():
     cred = credentials.Certificate("serviceAccountKey.json")
     if not firebase_admin._apps:
         firebase_admin.initialize_app(cred)
-    return firestore.client()
+    return wrap_firestore(firestore.client())
+
+# Firestore rejects batched writes with more than 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+# Per-ticket subcollections (besides responses) removed when a ticket is deleted
+TICKET_SUBCOLLECTIONS = ("versions", "exposure")
+
+# Placeholder in a response's answer string for a question left unanswered
+UNANSWERED_CODE = "-"
+
+def responses_collection(db, ticket_id):
+    """
+    Collection holding the responses for a ticket
+
+    With RESPONSES_LAYOUT = "subcollection" responses live under
+    tickets/{ticket_id}/responses, so per-ticket reads only touch that
+    ticket's data. The legacy "flat" layout keeps every response in the
+    top-level student_responses collection.
+    """
+    if RESPONSES_LAYOUT == "subcollection":
+        return db.collection("tickets").document(ticket_id).collection("responses")
+    return db.collection("student_responses")
+
+def all_responses(db):
+    """
+    Query over every response of every ticket
+    
+    Subcollection responses are found with a collection-group query, so
+    filters on them need collection-group scoped indexes.
+    """
+    if RESPONSES_LAYOUT == "subcollection":
+        return db.collection_group("responses")
+    return db.collection("student_responses")
 
 def save_question(db, question_obj, source="user"):
     question_obj["source"] = source  # mark whether it's from AI or user
+    question_obj["created_at"] = datetime.now()
     db.collection("all_questions").add(question_obj)
 
+def save_questions_batch(db, questions, source="user"):
+    """Save many questions to the question bank using batched writes"""
+    for start in range(0, len(questions), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for question_obj in questions[start:start + FIRESTORE_BATCH_LIMIT]:
+            question_obj["source"] = source
+            question_obj["created_at"] = datetime.now()
+            batch.set(db.collection("all_questions").document(), question_obj)
+        batch.commit()
+
 def generate_ticket_id():
     """Generate a unique 6-character ticket ID"""
     import random
@@ -23,7 +74,27 @@ def generate_ticket_id():
     ticket_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
     return ticket_id
 
-def create_exit_ticket(db, questions, teacher_name, subject, lecture_topics, ticket_title=None):
+def with_question_ids(questions):
+    """Give every question a stable question_id, keeping any it already has"""
+    return [dict(q, question_id=q.get("question_id") or uuid.uuid4().hex[:12]) for q in questions]
+
+def build_exit_ticket(ticket_id, questions, teacher_name, subject, lecture_topics, ticket_title=None, roster_id=None):
+    """Build the ticket document stored in the tickets collection"""
+    questions = with_question_ids(questions)
+    return {
+        "ticket_id": ticket_id,
+        "title": ticket_title or f"{subject} Exit Ticket",
+        "subject": subject,
+        "lecture_topics": lecture_topics,
+        "teacher_name": teacher_name,
+        "questions": questions,
+        "created_at": datetime.now(),
+        "total_questions": len(questions),
+        "roster_id": roster_id,
+        "status": "active"  # Can be used later for deactivating tickets
+    }
+
+def create_exit_ticket(db, questions, teacher_name, subject, lecture_topics, ticket_title=None, roster_id=None):
     """
     Create an exit ticket with unique ID and store in Firestore
     
@@ -34,6 +105,7 @@ def create_exit_ticket(db, questions, teacher_name, subject, lecture_topics, tic
         subject: Subject of the lecture
         lecture_topics: Topics covered in lecture
         ticket_title: Optional custom title for the ticket
+        roster_id: Optional class roster used for completion tracking
     
     Returns:
         dict: Created ticket object with ticket_id
@@ -47,20 +119,11 @@ def create_exit_ticket(db, questions, teacher_name, subject, lecture_topics, tic
             ticket_id = generate_ticket_id()
         
         # Create ticket object
-        ticket = {
-            "ticket_id": ticket_id,
-            "title": ticket_title or f"{subject} Exit Ticket",
-            "subject": subject,
-            "lecture_topics": lecture_topics,
-            "teacher_name": teacher_name,
-            "questions": questions,
-            "created_at": datetime.now(),
-            "total_questions": len(questions),
-            "status": "active"  # Can be used later for deactivating tickets
-        }
+        ticket = build_exit_ticket(ticket_id, questions, teacher_name, subject, lecture_topics, ticket_title, roster_id)
         
         # Store in Firestore with ticket_id as document ID
         db.collection("tickets").document(ticket_id).set(ticket)
+        register_stats_dimensions(db, [ticket])
         
         return ticket
         
@@ -68,6 +131,45 @@ def create_exit_ticket(db, questions, teacher_name, subject, lecture_topics, tic
         print(f"Error creating exit ticket: {e}")
         return None
 
+def create_exit_tickets_batch(db, ticket_specs):
+    """
+    Create many exit tickets using batched Firestore writes
+    
+    Args:
+        db: Firestore client
+        ticket_specs: List of dicts with questions, teacher_name, subject,
+            lecture_topics and optional ticket_title / roster_id / pre-reserved ticket_id
+    
+    Returns:
+        list: Created ticket objects, in the same order as ticket_specs
+    """
+    tickets = []
+    used_ids = set()
+    for spec in ticket_specs:
+        ticket_id = spec.get("ticket_id")
+        while not ticket_id or ticket_id in used_ids or ticket_exists(db, ticket_id):
+            ticket_id = generate_ticket_id()
+        used_ids.add(ticket_id)
+        
+        tickets.append(build_exit_ticket(
+            ticket_id,
+            spec["questions"],
+            spec["teacher_name"],
+            spec["subject"],
+            spec["lecture_topics"],
+            spec.get("ticket_title"),
+            spec.get("roster_id")
+        ))
+    
+    for start in range(0, len(tickets), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for ticket in tickets[start:start + FIRESTORE_BATCH_LIMIT]:
+            batch.set(db.collection("tickets").document(ticket["ticket_id"]), ticket)
+        batch.commit()
+    register_stats_dimensions(db, tickets)
+    
+    return tickets
+
 def ticket_exists(db, ticket_id):
     """Check if a ticket with given ID already exists"""
     try:
@@ -180,7 +282,7 @@ def update_ticket_status(db, ticket_id, status):
 
 def delete_ticket(db, ticket_id):
     """
-    Delete a ticket from the database
+    Delete a ticket and its responses from the database
     
     Args:
         db: Firestore client
@@ -192,16 +294,209 @@ def delete_ticket(db, ticket_id):
     try:
         ticket_id = ticket_id.upper().strip()
         
-        db.collection("tickets").document(ticket_id).delete()
-        return True
+        result = bulk_delete_tickets(db, [ticket_id])
+        return result is not None and not result["failed"]
         
     except Exception as e:
         print(f"Error deleting ticket: {e}")
         return False
 
-def save_student_response(db, ticket_id, student_name, responses, score_data):
+def ticket_versions_collection(db, ticket_id):
+    """Earlier versions of a ticket, saved each time it is edited"""
+    return db.collection("tickets").document(ticket_id).collection("versions")
+
+def update_exit_ticket(db, ticket_id, questions, edited_by, note=""):
+    """
+    Replace a published ticket's questions, keeping the previous version
+    
+    The current questions are copied to tickets/{ticket_id}/versions/{n}
+    before the ticket is overwritten, so stored responses can still be
+    mapped to the questions they were answered against.
+    
+    Args:
+        db: Firestore client
+        ticket_id: Unique ticket identifier
+        questions: New question list, in the same order as before
+        edited_by: Teacher making the change
+        note: Optional description of the change
+    
+    Returns:
+        tuple: (previous ticket, updated ticket), or (None, None) on error
+    """
+    try:
+        ticket_id = ticket_id.upper().strip()
+        previous = get_exit_ticket(db, ticket_id)
+        if not previous:
+            return None, None
+        
+        questions = with_question_ids(questions)
+        version = previous.get("version", 1)
+        updated_at = datetime.now()
+        batch = db.batch()
+        batch.set(ticket_versions_collection(db, ticket_id).document(str(version)), {
+            "version": version,
+            "questions": previous.get("questions", []),
+            "saved_at": updated_at,
+            "replaced_by": edited_by,
+            "note": note
+        })
+        batch.update(db.collection("tickets").document(ticket_id), {
+            "questions": questions,
+            "total_questions": len(questions),
+            "version": version + 1,
+            "updated_at": updated_at
+        })
+        batch.commit()
+        
+        updated = dict(previous, questions=questions, total_questions=len(questions),
+                       version=version + 1, updated_at=updated_at)
+        return previous, updated
+        
+    except Exception as e:
+        print(f"Error updating exit ticket: {e}")
+        return None, None
+
+def get_ticket_versions(db, ticket_id):
+    """Saved earlier versions of a ticket, newest first"""
+    try:
+        docs = ticket_versions_collection(db, ticket_id.upper().strip()).stream()
+        return sorted((doc.to_dict() for doc in docs), key=lambda v: v.get("version", 0), reverse=True)
+    except Exception as e:
+        print(f"Error retrieving ticket versions: {e}")
+        return []
+
+def bulk_update_ticket_status(db, ticket_ids, status):
+    """
+    Set the status of many tickets (e.g. 'active', 'inactive', 'archived') with batched writes
+    
+    Args:
+        db: Firestore client
+        ticket_ids: Ticket identifiers to update
+        status: New status for every ticket
+    
+    Returns:
+        int: Number of tickets updated
+    """
+    ticket_ids = [ticket_id.upper().strip() for ticket_id in ticket_ids]
+    updated = 0
+    try:
+        for start in range(0, len(ticket_ids), FIRESTORE_BATCH_LIMIT):
+            batch = db.batch()
+            chunk = ticket_ids[start:start + FIRESTORE_BATCH_LIMIT]
+            for ticket_id in chunk:
+                batch.update(db.collection("tickets").document(ticket_id), {
+                    "status": status,
+                    "updated_at": datetime.now()
+                })
+            batch.commit()
+            updated += len(chunk)
+    except Exception as e:
+        print(f"Error updating ticket statuses: {e}")
+    return updated
+
+def ticket_responses_query(db, ticket_id):
+    """Query matching every response document stored for a ticket"""
+    query = responses_collection(db, ticket_id)
+    if RESPONSES_LAYOUT != "subcollection":
+        query = query.where(filter=FieldFilter("ticket_id", "==", ticket_id))
+    return query
+
+def ticket_response_refs(db, ticket_id):
+    """References to every response document stored for a ticket"""
+    # Only the references are needed, so skip downloading field data
+    return [doc.reference for doc in ticket_responses_query(db, ticket_id).select([]).stream()]
+
+def bulk_delete_tickets(db, ticket_ids, progress_callback=None):
+    """
+    Delete tickets together with all of their responses and subcollections
+    
+    Deletes go through a throttled BulkWriter (BULK_DELETE_INITIAL_OPS ramping
+    up to BULK_DELETE_MAX_OPS writes per second). Every response and
+    subcollection document is deleted and flushed before any ticket delete
+    is queued, and a ticket is kept if any of its documents could not be
+    deleted (after BULK_DELETE_MAX_ATTEMPTS tries), so a failure never
+    leaves orphans behind a deleted ticket.
+    
+    Args:
+        db: Firestore client
+        ticket_ids: Ticket identifiers to delete
+        progress_callback: Optional callable(done, total) called as deletes complete
+    
+    Returns:
+        dict: Counts of deleted tickets and responses, and the IDs of
+            tickets that were not (fully) deleted under "failed"; None on error
+    """
+    try:
+        ticket_ids = [ticket_id.upper().strip() for ticket_id in ticket_ids]
+        
+        # Collect everything first so progress can be reported against a total
+        child_refs = {}
+        response_paths = set()
+        for ticket_id in ticket_ids:
+            refs = ticket_response_refs(db, ticket_id)
+            response_paths.update(ref.path for ref in refs)
+            ticket_ref = db.collection("tickets").document(ticket_id)
+            for name in TICKET_SUBCOLLECTIONS:
+                refs.extend(doc.reference for doc in ticket_ref.collection(name).select([]).stream())
+            child_refs[ticket_id] = refs
+        total = sum(len(refs) for refs in child_refs.values()) + len(ticket_ids)
+        
+        failed_paths = set()
+        failed_lock = threading.Lock()
+        
+        def on_error(failure, writer):
+            if failure.attempts < BULK_DELETE_MAX_ATTEMPTS:
+                return True
+            print(f"Error deleting {failure.operation.reference.path}: {failure.message}")
+            with failed_lock:
+                failed_paths.add(failure.operation.reference.path)
+            return False
+        
+        writer = db.bulk_writer(BulkWriterOptions(
+            initial_ops_per_second=BULK_DELETE_INITIAL_OPS,
+            max_ops_per_second=BULK_DELETE_MAX_OPS
+        ))
+        writer.on_write_error(on_error)
+        done = 0
+        
+        def delete_all(refs):
+            nonlocal done
+            # Flush per chunk so progress is reported from the caller's thread
+            for start in range(0, len(refs), FIRESTORE_BATCH_LIMIT):
+                for ref in refs[start:start + FIRESTORE_BATCH_LIMIT]:
+                    writer.delete(ref)
+                writer.flush()
+                done += len(refs[start:start + FIRESTORE_BATCH_LIMIT])
+                if progress_callback:
+                    progress_callback(done, total)
+        
+        delete_all([ref for refs in child_refs.values() for ref in refs])
+        failed = [ticket_id for ticket_id, refs in child_refs.items()
+                  if any(ref.path in failed_paths for ref in refs)]
+        deletable = [ticket_id for ticket_id in ticket_ids if ticket_id not in failed]
+        delete_all([db.collection("tickets").document(ticket_id) for ticket_id in deletable])
+        writer.close()
+        
+        failed += [ticket_id for ticket_id in deletable
+                   if db.collection("tickets").document(ticket_id).path in failed_paths]
+        return {
+            "tickets": len(ticket_ids) - len(failed),
+            # Versions and exposure shards are deleted too but are not responses
+            "responses": len(response_paths - failed_paths),
+            "failed": failed
+        }
+    
+    except Exception as e:
+        print(f"Error deleting tickets: {e}")
+        return None
+
+def save_student_response(db, ticket_id, student_name, responses, score_data, ticket=None):
     """
     Save student's exit ticket responses to Firestore (with duplicate prevention)
+    
+    The ticket's subject and teacher are copied onto the response so
+    school-wide statistics can be aggregated without joining tickets.
+    Pass the already loaded ticket to avoid reading it again.
     """
     try:
         ticket_id = ticket_id.upper().strip()
@@ -215,18 +510,37 @@ def save_student_response(db, ticket_id, student_name, responses, score_data):
         # Convert integer keys to strings for Firestore compatibility
         string_responses = {str(k): v for k, v in responses.items()}
         
+        if ticket is None:
+            ticket = get_exit_ticket(db, ticket_id) or {}
+        question_ids, answers = encode_response_answers(ticket.get("questions", []), string_responses)
+        
         # Create response document
         response_doc = {
             "ticket_id": ticket_id,
+            "subject": ticket.get("subject", ""),
+            "teacher_name": ticket.get("teacher_name", ""),
             "student_name": student_name,
-            "responses": string_responses,
+            # Compact encoding: the questions shown, in order, and one answer letter each
+            "question_ids": question_ids,
+            "answers": answers,
+            "ticket_version": ticket.get("version", 1),
             "score": score_data,
             "completed_at": datetime.now(),
             "submission_id": str(uuid.uuid4())
         }
         
-        # Store in student_responses collection
-        doc_ref = db.collection("student_responses").add(response_doc)
+        # Store in the ticket's responses collection
+        doc_ref = responses_collection(db, ticket_id).add(response_doc)
+        update_topic_rollups(db, ticket, string_responses)
+        
+        from question_assignment import record_exposure
+        record_exposure(db, ticket_id, question_ids)
+        
+        try:
+            from ability_model import update_abilities
+            update_abilities(db, ticket, student_name, string_responses)
+        except Exception as e:
+            print(f"Error updating ability estimates: {e}")
         
         return True
         
@@ -236,6 +550,105 @@ def save_student_response(db, ticket_id, student_name, responses, score_data):
         print(f"ERROR traceback: {traceback.format_exc()}")
         return False
     
+def encode_response_answers(questions, responses):
+    """
+    Compact form of a submission
+    
+    Args:
+        questions: Questions in the order the student saw them
+        responses: Answers keyed by position (int or str)
+    
+    Returns:
+        tuple: (question IDs, string with one answer letter per question,
+            UNANSWERED_CODE where a question was skipped)
+    """
+    codes = []
+    for position in range(len(questions)):
+        answer = responses.get(position, responses.get(str(position)))
+        codes.append(answer[:1] if answer else UNANSWERED_CODE)
+    return [question_key(q) for q in questions], "".join(codes)
+
+def decode_response(response):
+    """
+    (question reference, answer) pairs of a stored response, in any format
+    
+    The reference is a question ID (or question key) for responses that
+    record which questions were shown, and an int position for legacy
+    responses that only stored {"0": "B", ...}.
+    """
+    if "answers" in response:
+        return [(question_id, answer)
+                for question_id, answer in zip(response.get("question_ids", []), response["answers"])
+                if answer != UNANSWERED_CODE]
+    
+    keys = response.get("question_keys")
+    pairs = []
+    for position, answer in response.get("responses", {}).items():
+        position = int(position)
+        if not keys:
+            pairs.append((position, answer))
+        elif position < len(keys):
+            pairs.append((keys[position], answer))
+    return pairs
+
+def response_locatable(response, num_questions):
+    """
+    Whether a response's answers can be placed in a ticket of num_questions
+    
+    Responses that record their questions are matched by question. Legacy
+    responses only have positions within the subset the student was shown,
+    which are ticket positions only when the student answered the whole
+    ticket.
+    """
+    if response.get("question_ids") or response.get("question_keys"):
+        return True
+    return response.get("score", {}).get("total_questions") == num_questions
+
+def match_response_answers(response, questions, key_index=None):
+    """
+    Answers of a response located in a ticket's question list
+    
+    Legacy positional responses that cannot be located (see
+    response_locatable) yield no answers.
+    
+    Args:
+        response: Stored response
+        questions: The ticket's questions
+        key_index: Optional prebuilt {question key: index} for bulk use
+    
+    Returns:
+        list: (question index, answer) pairs
+    """
+    if not response_locatable(response, len(questions)):
+        return []
+    if key_index is None:
+        key_index = {question_key(q): i for i, q in enumerate(questions)}
+    matched = []
+    for ref, answer in decode_response(response):
+        index = ref if isinstance(ref, int) else key_index.get(ref)
+        if index is not None and index < len(questions):
+            matched.append((index, answer))
+    return matched
+
+def question_answer_counts(responses, questions):
+    """
+    Attempts and correct answers per ticket question over many responses
+    
+    Returns:
+        list: {"index", "question_id", "attempts", "correct"} per question
+    """
+    key_index = {question_key(q): i for i, q in enumerate(questions)}
+    attempts = [0] * len(questions)
+    correct = [0] * len(questions)
+    for response in responses:
+        for index, answer in match_response_answers(response, questions, key_index):
+            attempts[index] += 1
+            correct[index] += answer == questions[index].get("correct_answer")
+    return [
+        {"index": i, "question_id": question_key(q), "attempts": attempts[i], "correct": correct[i]}
+        for i, q in enumerate(questions)
+    ]
+
 def get_ticket_responses(db, ticket_id):
     """
     Get all student responses for a specific ticket
@@ -243,10 +656,12 @@ def get_ticket_responses(db, ticket_id):
     try:
         ticket_id = ticket_id.upper().strip()
         
-        # Updated syntax
-        responses_ref = db.collection("student_responses") \
-                         .where(filter=FieldFilter("ticket_id", "==", ticket_id)) \
-                         .stream()
+        if RESPONSES_LAYOUT == "subcollection":
+            responses_ref = responses_collection(db, ticket_id).stream()
+        else:
+            responses_ref = db.collection("student_responses") \
+                             .where(filter=FieldFilter("ticket_id", "==", ticket_id)) \
+                             .stream()
         
         responses = []
         for doc in responses_ref:
@@ -267,10 +682,7 @@ def get_student_response_history(db, student_name):
     try:
         student_name = student_name.strip()
         
-        # Updated syntax
-        responses_ref = db.collection("student_responses") \
-                         .where(filter=FieldFilter("student_name", "==", student_name)) \
-                         .stream()
+        responses_ref = all_responses(db).where(filter=FieldFilter("student_name", "==", student_name)).stream()
         
         responses = []
         for doc in responses_ref:
@@ -284,13 +696,17 @@ def get_student_response_history(db, student_name):
         print(f"Error retrieving student response history: {e}")
         return []
 
-def get_ticket_analytics(db, ticket_id):
+def get_ticket_analytics(db, ticket_id, ticket=None):
     """
     Get analytics summary for a ticket (with duplicate prevention)
     
+    When the ticket has a roster attached, completion_rate is the share of
+    rostered students who submitted and "completion" lists who is missing.
+    
     Args:
         db: Firestore client
         ticket_id: The ticket ID
+        ticket: Already loaded ticket, to avoid reading it again
     
     Returns:
         dict: Analytics data
@@ -298,11 +714,16 @@ def get_ticket_analytics(db, ticket_id):
     try:
         responses = get_ticket_responses(db, ticket_id)
         
+        if ticket is None:
+            ticket = get_exit_ticket(db, ticket_id) or {}
+        completion = get_ticket_completion(db, ticket, [r.get('student_name', '') for r in responses])
+        
         if not responses:
             return {
                 "total_responses": 0,
                 "average_score": 0,
-                "completion_rate": 0,
+                "completion_rate": completion["completion_rate"] if completion else 0,
+                "completion": completion,
                 "unique_students": 0,
                 "responses": []
             }
@@ -337,6 +758,8 @@ def get_ticket_analytics(db, ticket_id):
             "total_responses": total_responses,
             "unique_students": unique_students,
             "average_score": round(average_score, 1),
+            "completion_rate": completion["completion_rate"] if completion else 0,
+            "completion": completion,
             "responses": filtered_responses
         }
         
@@ -346,10 +769,26 @@ def get_ticket_analytics(db, ticket_id):
             "total_responses": 0, 
             "average_score": 0, 
             "completion_rate": 0,
+            "completion": None,
             "unique_students": 0,
             "responses": []
         }
 
+def get_ticket_completion(db, ticket, submitted_names):
+    """
+    Who on the ticket's roster has and hasn't submitted
+    
+    Returns:
+        dict: Result of rosters.compute_completion, or None without a roster
+    """
+    roster_id = ticket.get("roster_id")
+    if not roster_id:
+        return None
+    
+    from rosters import get_roster, compute_completion
+    roster = get_roster(db, roster_id)
+    return compute_completion(roster, submitted_names) if roster else None
+
 def check_student_already_attempted(db, ticket_id, student_name):
     """
     Check if a student has already attempted a specific exit ticket
@@ -367,11 +806,12 @@ def check_student_already_attempted(db, ticket_id, student_name):
         student_name = student_name.strip()
         
         # Query for existing responses from this student for this ticket
-        responses_ref = db.collection("student_responses") \
-                         .where(filter=FieldFilter("ticket_id", "==", ticket_id)) \
-                         .where(filter=FieldFilter("student_name", "==", student_name)) \
-                         .limit(1) \
-                         .stream()
+        query = responses_collection(db, ticket_id)
+        if RESPONSES_LAYOUT != "subcollection":
+            query = query.where(filter=FieldFilter("ticket_id", "==", ticket_id))
+        responses_ref = query.where(filter=FieldFilter("student_name", "==", student_name)) \
+                             .limit(1) \
+                             .stream()
         
         # Check if any document exists
         for doc in responses_ref:
@@ -411,4 +851,251 @@ def get_ticket_stats(db, ticket_id):
             
     except Exception as e:
         print(f"Error getting ticket stats: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+def register_stats_dimensions(db, tickets):
+    """
+    Record the teachers and subjects seen on tickets in stats/dimensions
+    
+    The admin statistics page reads this one document to know which
+    teachers and subjects to aggregate over, instead of listing tickets.
+    """
+    try:
+        db.collection("stats").document("dimensions").set({
+            "teachers": firestore.ArrayUnion(sorted({t["teacher_name"] for t in tickets})),
+            "subjects": firestore.ArrayUnion(sorted({t["subject"] for t in tickets}))
+        }, merge=True)
+    except Exception as e:
+        print(f"Error registering stats dimensions: {e}")
+
+def rebuild_stats_dimensions(db):
+    """
+    Rebuild stats/dimensions from every ticket (one-off backfill for old tickets)
+    
+    Returns:
+        dict: The teachers and subjects found
+    """
+    teachers = set()
+    subjects = set()
+    for doc in db.collection("tickets").select(["teacher_name", "subject"]).stream():
+        data = doc.to_dict()
+        if data.get("teacher_name"):
+            teachers.add(data["teacher_name"])
+        if data.get("subject"):
+            subjects.add(data["subject"])
+    
+    dimensions = {"teachers": sorted(teachers), "subjects": sorted(subjects)}
+    db.collection("stats").document("dimensions").set(dimensions)
+    return dimensions
+
+def run_aggregation(query, avg_field=None):
+    """
+    Count (and optionally average a field of) the documents matching a query
+    
+    Runs as a server-side aggregation, so only the result is downloaded and
+    the cost is one read per 1000 index entries rather than one per document.
+    
+    Returns:
+        dict: {"count": int, "avg": float or None}
+    """
+    aggregation = query.count(alias="count")
+    if avg_field:
+        aggregation = aggregation.avg(avg_field, alias="avg")
+    
+    values = {"count": 0, "avg": None}
+    for result in aggregation.get():
+        for item in result:
+            values[item.alias] = item.value
+    return values
+
+def get_school_stats(db, days=14):
+    """
+    School-wide statistics computed with aggregation queries
+    
+    Args:
+        db: Firestore client
+        days: Number of past days to count responses for
+    
+    Returns:
+        dict: Totals, tickets per teacher, responses per day and mean score per subject
+    """
+    dimensions = db.collection("stats").document("dimensions").get()
+    dimensions = dimensions.to_dict() if dimensions.exists else {}
+    teachers = dimensions.get("teachers", [])
+    subjects = dimensions.get("subjects", [])
+    
+    tickets = db.collection("tickets")
+    responses = all_responses(db)
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    day_starts = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    
+    jobs = {
+        ("total", "tickets"): (tickets, None),
+        ("total", "responses"): (responses, "score.percentage")
+    }
+    for teacher in teachers:
+        jobs[("teacher", teacher)] = (tickets.where(filter=FieldFilter("teacher_name", "==", teacher)), None)
+    for day_start in day_starts:
+        jobs[("day", day_start)] = (responses
+                                    .where(filter=FieldFilter("completed_at", ">=", day_start))
+                                    .where(filter=FieldFilter("completed_at", "<", day_start + timedelta(days=1))), None)
+    for subject in subjects:
+        jobs[("subject", subject)] = (responses.where(filter=FieldFilter("subject", "==", subject)), "score.percentage")
+    
+    # Each aggregation is a separate round trip, so issue them concurrently
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {key: executor.submit(run_aggregation, query, field) for key, (query, field) in jobs.items()}
+        results = {key: future.result() for key, future in futures.items()}
+    
+    return {
+        "total_tickets": results[("total", "tickets")]["count"],
+        "total_responses": results[("total", "responses")]["count"],
+        "average_score": round(results[("total", "responses")]["avg"] or 0, 1),
+        "tickets_per_teacher": sorted(
+            [{"teacher": t, "tickets": results[("teacher", t)]["count"]} for t in teachers],
+            key=lambda row: row["tickets"], reverse=True),
+        "responses_per_day": [
+            {"day": d.strftime("%Y-%m-%d"), "responses": results[("day", d)]["count"]} for d in day_starts],
+        "subject_scores": [
+            {"subject": s, "responses": results[("subject", s)]["count"],
+             "average_score": round(results[("subject", s)]["avg"] or 0, 1)} for s in subjects],
+        "generated_at": datetime.now()
+    }
+
+def topic_rollup_id(teacher_name, subject, topic, subtopic):
+    """Stable document ID for one (teacher, subject, topic, subtopic) rollup"""
+    key = "\x1f".join([teacher_name, subject, topic, subtopic])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+def topic_rollup_deltas(ticket, responses):
+    """
+    Attempts and correct answers per (topic, subtopic) in one submission
+    
+    Args:
+        ticket: Ticket dict with its questions
+        responses: Answers keyed by question index (int or str)
+    
+    Returns:
+        dict: {(topic, subtopic): [attempts, correct]}
+    """
+    questions = ticket.get("questions", [])
+    deltas = {}
+    for index, answer in responses.items():
+        index = int(index)
+        if index >= len(questions):
+            continue
+        question = questions[index]
+        key = (question.get("topic") or "General", question.get("subtopic") or "General")
+        counts = deltas.setdefault(key, [0, 0])
+        counts[0] += 1
+        counts[1] += answer == question.get("correct_answer")
+    return deltas
+
+def update_topic_rollups(db, ticket, responses):
+    """
+    Add one submission to the teacher's topic_rollups documents
+    
+    Uses Increment transforms in a single batch, so concurrent submissions
+    never need to read or lock the rollup documents.
+    """
+    try:
+        deltas = topic_rollup_deltas(ticket, responses)
+        if not deltas:
+            return
+        teacher_name = ticket.get("teacher_name", "")
+        subject = ticket.get("subject", "")
+        batch = db.batch()
+        for (topic, subtopic), (attempts, correct) in deltas.items():
+            doc_id = topic_rollup_id(teacher_name, subject, topic, subtopic)
+            batch.set(db.collection("topic_rollups").document(doc_id), {
+                "teacher_name": teacher_name,
+                "subject": subject,
+                "topic": topic,
+                "subtopic": subtopic,
+                "attempts": firestore.Increment(attempts),
+                "correct": firestore.Increment(correct),
+                "updated_at": datetime.now()
+            }, merge=True)
+        batch.commit()
+    except Exception as e:
+        print(f"Error updating topic rollups: {e}")
+
+def get_topic_rollups(db, teacher_name):
+    """
+    Topic/subtopic mastery across all of a teacher's tickets
+    
+    Returns:
+        list: Rollup dicts with attempts, correct and accuracy (percentage)
+    """
+    try:
+        docs = db.collection("topic_rollups") \
+                 .where(filter=FieldFilter("teacher_name", "==", teacher_name)) \
+                 .stream()
+        rollups = []
+        for doc in docs:
+            rollup = doc.to_dict()
+            attempts = rollup.get("attempts", 0)
+            rollup["accuracy"] = round(rollup.get("correct", 0) / attempts * 100, 1) if attempts else 0
+            rollups.append(rollup)
+        return rollups
+    except Exception as e:
+        print(f"Error retrieving topic rollups: {e}")
+        return []
+
+def rebuild_topic_rollups(db, teacher_name):
+    """
+    Recompute a teacher's rollups from every stored response
+    
+    Needed once for responses saved before rollups existed; afterwards
+    they are kept up to date on each submission. Responses of archived
+    tickets are no longer in Firestore and drop out of the rebuilt totals.
+    
+    The rebuilt totals overwrite the rollup documents, so a submission
+    saved while the rebuild runs (between its reads and its writes) is
+    dropped from the totals; run it when no class is taking a ticket.
+    
+    Returns:
+        int: Number of rollup documents written, or None on error
+    """
+    try:
+        totals = {}
+        for ticket in get_all_tickets_by_teacher(db, teacher_name):
+            for response in get_ticket_responses(db, ticket["ticket_id"]):
+                deltas = topic_rollup_deltas(ticket, dict(match_response_answers(response, ticket.get("questions", []))))
+                for key, (attempts, correct) in deltas.items():
+                    counts = totals.setdefault((ticket.get("subject", ""),) + key, [0, 0])
+                    counts[0] += attempts
+                    counts[1] += correct
+    
+        stale = {doc.id for doc in db.collection("topic_rollups")
+                 .where(filter=FieldFilter("teacher_name", "==", teacher_name)).select([]).stream()}
+        writes = []
+        for (subject, topic, subtopic), (attempts, correct) in totals.items():
+            doc_id = topic_rollup_id(teacher_name, subject, topic, subtopic)
+            stale.discard(doc_id)
+            writes.append((doc_id, {
+                "teacher_name": teacher_name,
+                "subject": subject,
+                "topic": topic,
+                "subtopic": subtopic,
+                "attempts": attempts,
+                "correct": correct,
+                "updated_at": datetime.now()
+            }))
+    
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            batch = db.batch()
+            for doc_id, data in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(db.collection("topic_rollups").document(doc_id), data)
+            batch.commit()
+        stale = list(stale)
+        for start in range(0, len(stale), FIRESTORE_BATCH_LIMIT):
+            batch = db.batch()
+            for doc_id in stale[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.delete(db.collection("topic_rollups").document(doc_id))
+            batch.commit()
+        return len(writes)
+    
+    except Exception as e:
+        print(f"Error rebuilding topic rollups: {e}")
+        return None
@@ -0,0 +1,184 @@
+"""
+Text extraction from uploaded lecture files (PDF, PowerPoint, plain text)
+
+Files are read page by page (slide by slide for decks, block by block for
+text), and extraction stops once UPLOAD_MAX_CHARS have been collected, so
+memory stays bounded however large the upload is. Results are cached by a
+SHA-256 of the file contents, in process and in the lecture_file_cache
+collection: uploading the same deck again, e.g. for another section,
+skips parsing entirely.
+
+PDF support needs `pypdf` and PowerPoint support needs `python-pptx`;
+both are optional and only imported when such a file is read.
+"""
+import io
+import os
+import hashlib
+import threading
+from datetime import datetime
+
+from config import UPLOAD_MAX_CHARS
+
+SUPPORTED_EXTENSIONS = ("pdf", "pptx", "txt", "md")
+
+# Bytes read at a time while hashing or decoding
+READ_BLOCK_SIZE = 1024 * 1024
+
+_text_cache = {}
+_text_cache_lock = threading.Lock()
+
+
+def file_extension(filename):
+    return os.path.splitext(filename or "")[1].lstrip(".").lower()
+
+
+def content_digest(stream):
+    """SHA-256 of a binary stream, read in blocks; the stream is rewound afterwards"""
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def iter_pdf_text(stream):
+    """Text of each PDF page in turn"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ValueError("Reading PDF files needs the pypdf package (pip install pypdf)")
+
+    for page in PdfReader(stream).pages:
+        yield page.extract_text() or ""
+
+
+def iter_pptx_text(stream):
+    """Text of each slide in turn, including its speaker notes"""
+    try:
+        from pptx import Presentation
+    except ImportError:
+        raise ValueError("Reading PowerPoint files needs the python-pptx package (pip install python-pptx)")
+
+    for number, slide in enumerate(Presentation(stream).slides, start=1):
+        lines = [f"Slide {number}"]
+        for shape in slide.shapes:
+            if shape.has_text_frame and shape.text_frame.text.strip():
+                lines.append(shape.text_frame.text.strip())
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame.text.strip():
+            lines.append("Notes: " + slide.notes_slide.notes_text_frame.text.strip())
+        yield "\n".join(lines)
+
+
+def iter_plain_text(stream):
+    """Decoded blocks of a UTF-8 text file"""
+    reader = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    try:
+        for block in iter(lambda: reader.read(READ_BLOCK_SIZE), ""):
+            yield block
+    finally:
+        # Leave the caller's stream open
+        reader.detach()
+
+
+EXTRACTORS = {
+    "pdf": iter_pdf_text,
+    "pptx": iter_pptx_text,
+    "txt": iter_plain_text,
+    "md": iter_plain_text,
+}
+
+
+def extract_text(stream, filename, max_chars=UPLOAD_MAX_CHARS):
+    """
+    Extract a lecture file's text without holding more than max_chars of it
+
+    Args:
+        stream: Binary file-like object
+        filename: Original file name, used to pick the parser
+        max_chars: Extraction stops once this much text has been collected
+
+    Returns:
+        dict: text, parts (pages/slides/blocks read) and truncated
+
+    Raises:
+        ValueError: For unsupported file types, a missing optional parser,
+            or a file that cannot be parsed
+    """
+    extension = file_extension(filename)
+    if extension not in EXTRACTORS:
+        raise ValueError(f"Unsupported file type '.{extension}' (use {', '.join(SUPPORTED_EXTENSIONS)})")
+
+    # Text blocks are contiguous; pages and slides are joined by a blank line
+    separator = "" if extension in ("txt", "md") else "\n\n"
+    parts = []
+    size = 0
+    count = 0
+    truncated = False
+    try:
+        for part in EXTRACTORS[extension](stream):
+            count += 1
+            part = part.strip() if extension in ("pdf", "pptx") else part
+            if not part:
+                continue
+            if parts:
+                size += len(separator)
+            # Once the limit is reached, the next non-empty part ends extraction
+            if size + len(part) > max_chars:
+                if size < max_chars:
+                    parts.append(part[:max_chars - size])
+                truncated = True
+                break
+            parts.append(part)
+            size += len(part)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Could not read {filename}: {e}")
+
+    return {"text": separator.join(parts).strip(), "parts": count, "truncated": truncated}
+
+
+def load_lecture_file(stream, filename, db=None):
+    """
+    Text of an uploaded lecture file, parsed at most once per distinct content
+
+    Args:
+        stream: Binary file-like object (e.g. a Streamlit UploadedFile)
+        filename: Original file name
+        db: Optional Firestore client for the shared parse cache
+
+    Returns:
+        dict: text, parts, truncated, digest and cached (True if no parsing
+            was needed)
+    """
+    digest = content_digest(stream)
+    with _text_cache_lock:
+        cached = _text_cache.get(digest)
+    if cached is None and db is not None:
+        try:
+            snap = db.collection("lecture_file_cache").document(digest).get()
+            if snap.exists:
+                data = snap.to_dict()
+                cached = {key: data.get(key) for key in ("text", "parts", "truncated")}
+        except Exception as e:
+            print(f"Error reading lecture file cache: {e}")
+    if cached is not None:
+        with _text_cache_lock:
+            _text_cache[digest] = cached
+        return {**cached, "digest": digest, "cached": True}
+
+    result = extract_text(stream, filename)
+    entry = {"text": result["text"], "parts": result["parts"], "truncated": result["truncated"]}
+    with _text_cache_lock:
+        _text_cache[digest] = entry
+    if db is not None:
+        try:
+            db.collection("lecture_file_cache").document(digest).set({
+                **entry,
+                "filename": filename,
+                "created_at": datetime.now()
+            })
+        except Exception as e:
+            print(f"Error writing lecture file cache: {e}")
+    return {**entry, "digest": digest, "cached": False}
@@ -0,0 +1,267 @@
+"""
+Condense long lecture transcripts into a compact topic list before generation
+
+Pasting a whole transcript into the MCQ prompt is slow and can be
+truncated. Inputs longer than INGEST_THRESHOLD_CHARS are instead:
+
+1. split into chunks at paragraph (then sentence) boundaries,
+2. mapped: each chunk's key concepts are extracted with a fast "extract"
+   model call, up to INGEST_MAX_WORKERS chunks at a time,
+3. reduced: topics with the same name are merged and duplicate concepts
+   dropped, giving a short "- Topic: concept; concept" list for the prompt.
+
+Extractions are cached by a hash of the chunk's prompt, in process and in
+the lecture_chunk_cache collection. Chunk boundaries are content-defined
+(a chunk closes after a paragraph whose hash hits a fixed modulus once it
+is long enough), so editing one part of a transcript only changes the
+chunks around the edit and the rest are served from the cache.
+"""
+import re
+import json
+import hashlib
+import threading
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from usage_tracking import record_cache_hits
+from config import (
+    INGEST_THRESHOLD_CHARS, INGEST_CHUNK_MIN_CHARS, INGEST_CHUNK_MAX_CHARS, INGEST_MAX_WORKERS
+)
+
+EXTRACT_PROMPT = """You are preparing an engineering lecture for exit ticket questions. Below is one excerpt of a longer lecture transcript or set of notes.
+
+List the key concepts actually taught in this excerpt, grouped under short topic names. Include definitions, principles, equations and named techniques; leave out greetings, logistics and anecdotes.
+
+Output Format (JSON):
+{"topics": [{"topic": "Topic name", "concepts": ["Concept, definition or fact"]}]}
+
+Return ONLY valid JSON. Return {"topics": []} if the excerpt teaches nothing.
+
+Excerpt:
+"""
+
+# About one paragraph in this many ends a chunk once it has INGEST_CHUNK_MIN_CHARS
+BOUNDARY_MODULUS = 3
+
+_extract_cache = {}
+_extract_cache_lock = threading.Lock()
+
+
+def needs_ingestion(text):
+    return len(text or "") > INGEST_THRESHOLD_CHARS
+
+
+def _split_long(unit):
+    """Break an oversized paragraph at sentence ends, then at the size limit"""
+    pieces = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", unit):
+        while len(sentence) > INGEST_CHUNK_MAX_CHARS:
+            pieces.append(sentence[:INGEST_CHUNK_MAX_CHARS])
+            sentence = sentence[INGEST_CHUNK_MAX_CHARS:]
+        if current and len(current) + len(sentence) + 1 > INGEST_CHUNK_MAX_CHARS:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _is_boundary(unit):
+    return int(hashlib.sha1(unit.encode("utf-8")).hexdigest()[:8], 16) % BOUNDARY_MODULUS == 0
+
+
+def chunk_text(text):
+    """
+    Split a long text into chunks of at most INGEST_CHUNK_MAX_CHARS
+
+    Returns:
+        list: Chunk strings, in order
+    """
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if paragraph:
+            units.extend([paragraph] if len(paragraph) <= INGEST_CHUNK_MAX_CHARS else _split_long(paragraph))
+
+    chunks = []
+    current = []
+    size = 0
+    for unit in units:
+        if current and size + len(unit) > INGEST_CHUNK_MAX_CHARS:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += len(unit) + 2
+        if size >= INGEST_CHUNK_MIN_CHARS and _is_boundary(unit):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def build_extract_prompt(chunk):
+    return EXTRACT_PROMPT + chunk
+
+
+def chunk_digest(chunk):
+    """Cache key of a chunk; it covers the prompt too, so prompt changes invalidate it"""
+    return hashlib.sha256(build_extract_prompt(chunk).encode("utf-8")).hexdigest()
+
+
+def parse_extraction(response_text):
+    """Topic list from an extraction response, dropping malformed entries"""
+    start = response_text.find("{")
+    end = response_text.rfind("}") + 1
+    data = json.loads(response_text[start:end])
+    topics = []
+    for entry in data.get("topics", []):
+        if isinstance(entry, dict) and entry.get("topic"):
+            concepts = [str(c).strip() for c in entry.get("concepts", []) if str(c).strip()]
+            topics.append({"topic": str(entry["topic"]).strip(), "concepts": concepts})
+    return topics
+
+
+def extract_chunk(chunk):
+    """Key concepts of one chunk through the routed "extract" model"""
+    from model_router import generate_content
+
+    response, model_name = generate_content(build_extract_prompt(chunk), call_type="extract")
+    return parse_extraction(response.text)
+
+
+def load_cached_extractions(db, digests):
+    """Cached extractions for the given digests, from memory then Firestore"""
+    with _extract_cache_lock:
+        found = {d: _extract_cache[d] for d in digests if d in _extract_cache}
+
+    missing = [d for d in digests if d not in found]
+    if db is not None and missing:
+        try:
+            refs = [db.collection("lecture_chunk_cache").document(d) for d in missing]
+            for snap in db.get_all(refs):
+                if snap.exists:
+                    found[snap.id] = snap.to_dict().get("topics", [])
+        except Exception as e:
+            print(f"Error reading lecture chunk cache: {e}")
+
+    with _extract_cache_lock:
+        _extract_cache.update(found)
+    return found
+
+
+def store_extractions(db, extractions):
+    with _extract_cache_lock:
+        _extract_cache.update(extractions)
+    if db is None or not extractions:
+        return
+    try:
+        batch = db.batch()
+        for digest, topics in extractions.items():
+            batch.set(db.collection("lecture_chunk_cache").document(digest), {
+                "topics": topics,
+                "created_at": datetime.now()
+            })
+        batch.commit()
+    except Exception as e:
+        print(f"Error writing lecture chunk cache: {e}")
+
+
+def merge_topics(extractions):
+    """
+    Reduce per-chunk topic lists into one, in order of first appearance
+
+    Topics are matched case- and whitespace-insensitively and repeated
+    concepts within a topic are kept once.
+    """
+    merged = {}
+    for topics in extractions:
+        for entry in topics:
+            key = " ".join(entry["topic"].split()).casefold()
+            topic = merged.setdefault(key, {"topic": entry["topic"], "concepts": [], "seen": set()})
+            for concept in entry["concepts"]:
+                concept_key = " ".join(concept.split()).casefold()
+                if concept_key not in topic["seen"]:
+                    topic["seen"].add(concept_key)
+                    topic["concepts"].append(concept)
+    return [{"topic": t["topic"], "concepts": t["concepts"]} for t in merged.values()]
+
+
+def format_topics(topics):
+    return "\n".join(f"- {t['topic']}: {'; '.join(t['concepts'])}" if t["concepts"] else f"- {t['topic']}"
+                     for t in topics)
+
+
+def ingest_lecture(text, db=None, progress_callback=None):
+    """
+    Map-reduce a long lecture text into a compact topic list
+
+    Args:
+        text: Lecture transcript or notes
+        db: Optional Firestore client for the shared chunk cache
+        progress_callback: Optional callable(done, total) as chunks finish,
+            called from the caller's thread
+
+    Returns:
+        dict: topics (merged list), text (formatted for the prompt), chunks,
+            cached (chunks served from the cache) and failed (chunks that
+            could not be extracted and are passed through verbatim)
+    """
+    chunks = chunk_text(text)
+    digests = [chunk_digest(chunk) for chunk in chunks]
+    extractions = load_cached_extractions(db, list(dict.fromkeys(digests)))
+    cached = sum(1 for d in digests if d in extractions)
+
+    pending = {d: chunk for d, chunk in zip(digests, chunks) if d not in extractions}
+    record_cache_hits("extract", [build_extract_prompt(chunk) for d, chunk in zip(digests, chunks) if d in extractions])
+    done = cached
+    if progress_callback:
+        progress_callback(done, len(chunks))
+
+    fresh = {}
+    failed = set()
+    with ThreadPoolExecutor(max_workers=INGEST_MAX_WORKERS) as executor:
+        # Each call runs in a copy of this context so its usage is billed to the caller's scope
+        futures = {executor.submit(contextvars.copy_context().run, extract_chunk, chunk): d
+                   for d, chunk in pending.items()}
+        for future in as_completed(futures):
+            digest = futures[future]
+            try:
+                fresh[digest] = future.result()
+            except Exception as e:
+                print(f"Error extracting lecture chunk: {e}")
+                failed.add(digest)
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(chunks))
+
+    store_extractions(db, fresh)
+    extractions.update(fresh)
+
+    topics = merge_topics(extractions[d] for d in digests if d in extractions)
+    parts = [format_topics(topics)] if topics else []
+    # Nothing a failed chunk taught is lost: it goes to the prompt as written
+    parts += [chunk for d, chunk in zip(digests, chunks) if d in failed]
+
+    return {
+        "topics": topics,
+        "text": "\n\n".join(parts),
+        "chunks": len(chunks),
+        "cached": cached,
+        "failed": len(failed)
+    }
+
+
+def condense_lecture_topics(text, db=None, progress_callback=None):
+    """The text to put in the generation prompt: long inputs are ingested, short ones kept"""
+    if not needs_ingestion(text):
+        return text
+    try:
+        result = ingest_lecture(text, db, progress_callback)
+    except Exception as e:
+        print(f"Error ingesting lecture text: {e}")
+        return text
+    return result["text"] or text
@@ -1,31 +1,90 @@
 import streamlit as st
-import requests
 import firebase_admin
 from firebase_admin import credentials, firestore
+from cassette import wrap_firestore
+from auth_client import (
+    create_auth_backend,
+    get_user_profile,
+    store_session,
+    get_session,
+    drop_session,
+)
 
 # Initialize Firebase Admin once
 if not firebase_admin._apps:
     cred = credentials.Certificate("serviceAccountKey.json")
     firebase_admin.initialize_app(cred)
-db = firestore.client()
+db = wrap_firestore(firestore.client())
 
 API_KEY = st.secrets["firebase"]["apiKey"]
 
+auth_backend = create_auth_backend(API_KEY, db)
+
 def firebase_sign_in(email, password):
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={API_KEY}"
-    payload = {"email": email, "password": password, "returnSecureToken": True}
-    res = requests.post(url, json=payload)
-    if res.status_code == 200:
-        return res.json()
-    return None
+    return auth_backend.sign_in(email, password)
 
 def get_role(uid):
-    doc = db.collection("users").document(uid).get()
-    if doc.exists:
-        data = doc.to_dict()
-        return data.get("role", "Student")
+    profile = get_user_profile(auth_backend, uid)
+    if profile:
+        return profile.get("role", "Student")
     return "Student"
 
+def start_session(email, user, previous_session=None):
+    """
+    Populate session state for a signed-in user and remember the refresh token
+
+    A new session ID is minted every time (any ?session= value already in
+    the URL is ignored), and the one used to restore this login is dropped,
+    so an ID seen in the browser history stops working after the next reload.
+    A restored login keeps the expiry of the original sign-in.
+
+    Args:
+        email: Signed-in user's email
+        user: Sign-in or refresh payload with localId and refreshToken
+        previous_session: (session ID, stored session) this login was restored from
+    """
+    uid = user["localId"]
+    role = get_role(uid)
+
+    st.session_state.logged_in = True
+    st.session_state.username = email
+    st.session_state.role = role
+    st.session_state.user = {
+        "email": email,
+        "uid": uid,
+        "role": role
+    }
+
+    previous_id, previous = previous_session or (None, {})
+    session_id = store_session(email, user["refreshToken"], previous.get("created_at"))
+    if previous_id:
+        drop_session(previous_id)
+    st.query_params["session"] = session_id
+    return role
+
+def restore_session():
+    """Sign back in from a stored refresh token after a page reload"""
+    session_id = st.query_params.get("session")
+    if not session_id:
+        return False
+
+    session = get_session(session_id)
+    user = auth_backend.refresh(session["refresh_token"]) if session else None
+    if not user:
+        drop_session(session_id)
+        del st.query_params["session"]
+        return False
+
+    start_session(session["email"], user, previous_session=(session_id, session))
+    return True
+
+def logout():
+    """Forget the stored session so a reload shows the login page again"""
+    session_id = st.query_params.get("session")
+    if session_id:
+        drop_session(session_id)
+        del st.query_params["session"]
+
 def login():
     st.title("🔐 Login Portal")
 
@@ -35,17 +94,7 @@ def login():
     if st.button("Login"):
         user = firebase_sign_in(email, password)
         if user:
-            uid = user["localId"]
-            role = get_role(uid)
-
-            st.session_state.logged_in = True
-            st.session_state.username = email
-            st.session_state.role = role
-            st.session_state.user = {
-                "email": email,
-                "uid": uid,
-                "role": role
-            }
+            role = start_session(email, user)
 
             st.success(f"✅ Logged in as {role}: {email}")
             st.rerun()
@@ -0,0 +1,149 @@
+import os
+import json
+
+# Enhanced system prompt for better API integration
+SYSTEM_PROMPT = """You are a highly qualified MCQ generator for an engineering college lecture. Your task is to create exactly {num_questions} multiple-choice questions (MCQs) based strictly on the list of topics provided from a lecture. These MCQs serve as exit ticket questions to assess students' understanding of core concepts.
+
+Instructions:
+- Only use concepts that were explicitly covered in the given topic list
+- Do not include or infer content beyond the provided topics
+- Focus on the most essential technical points, definitions, principles, or equations
+- Each question must have one correct answer and three plausible distractors
+- The correct answer must be factually accurate
+- Write short, clear, and professional questions and answer choices
+- Use standard engineering terminology and units
+- Keep all technical details precise and concise
+
+Output Format (JSON):
+{
+  "questions": [
+    {
+      "question": "Question text here?",
+      "options": {
+        "A": "Option A text",
+        "B": "Option B text", 
+        "C": "Option C text",
+        "D": "Option D text"
+      },
+      "correct_answer": "C",
+      "explanation": "Brief explanation of why this answer is correct",
+      "topic": "Main topic of the question",
+      "subtopic": "Subtopic or Specific concept of focus area"
+    }
+  ]
+}
+
+Requirements:
+- Return ONLY valid JSON format
+- Ensure all questions are relevant to the provided topics and the subject
+- Do not deviate and hallucinate from the subject
+- Make explanations educational and clear
+- Each question MUST include both a "topic" and "subtopic" field. These are mandatory.
+- Use engineering-appropriate language and precision"""
+
+
+def load_google_api_key():
+    """
+    Find the Gemini API key without Streamlit
+
+    Checks the GOOGLE_API_KEY environment variable first, then the
+    [api_keys] section of .streamlit/secrets.toml used by the app.
+    """
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if api_key:
+        return api_key
+
+    secrets_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+    try:
+        import tomllib
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f).get("api_keys", {}).get("google_api_key")
+    except (OSError, ImportError, ValueError):
+        return None
+
+
+def configure_genai(api_key=None):
+    """Configure the Gemini client, returns False if no API key is available"""
+    import google.generativeai as genai
+
+    api_key = api_key or load_google_api_key()
+    if not api_key:
+        return False
+    genai.configure(api_key=api_key)
+    return True
+
+
+def build_mcq_prompt(lecture_topics, ai_instructions, num_questions, subject, existing_questions=None):
+    """Build the full generation prompt for a set of MCQs"""
+    # List questions that are being kept so replacements don't repeat them
+    existing_block = ""
+    if existing_questions:
+        existing_list = "\n".join(f"- {q}" for q in existing_questions)
+        existing_block = f"""
+Existing Questions (do NOT repeat or closely paraphrase these):
+{existing_list}
+"""
+
+    return f"""{SYSTEM_PROMPT}
+
+Subject:
+{subject}
+
+Lecture Topics:
+{lecture_topics}
+
+Additional Instructions:
+{ai_instructions if ai_instructions.strip() else "No additional instructions provided."}
+{existing_block}
+Please generate exactly {num_questions} MCQs based on the above topics and instructions. Do not generate fewer or more.
+
+Return ONLY the JSON format as specified above."""
+
+
+def parse_mcq_response(response_text):
+    """
+    Extract the MCQ JSON object from a model response
+
+    Raises:
+        json.JSONDecodeError: If the response doesn't contain valid JSON
+    """
+    # Find JSON content (handle cases where response might have extra text)
+    start_idx = response_text.find('{')
+    end_idx = response_text.rfind('}') + 1
+    json_str = response_text[start_idx:end_idx]
+
+    return json.loads(json_str)
+
+
+def generate_mcq_set(lecture_topics, ai_instructions, num_questions, subject, call_type="ticket", db=None):
+    """
+    Generate MCQs without any UI, for scripts and background jobs
+
+    Long lecture text is condensed first (see lecture_ingest.py); pass a
+    Firestore client to share the chunk cache with the app.
+
+    Returns:
+        list: Question objects tagged with the subject
+
+    Raises:
+        ValueError: If the model returns malformed JSON or too few questions
+    """
+    from model_router import generate_content
+    from lecture_ingest import condense_lecture_topics
+
+    lecture_topics = condense_lecture_topics(lecture_topics, db)
+    prompt = build_mcq_prompt(lecture_topics, ai_instructions, num_questions, subject)
+    response, model_name = generate_content(prompt, call_type=call_type)
+
+    try:
+        mcqs = parse_mcq_response(response.text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error parsing AI response from {model_name}: {e}")
+
+    questions = mcqs.get("questions", [])
+    if len(questions) < num_questions:
+        raise ValueError(f"Only {len(questions)} of {num_questions} questions were generated")
+
+    for q in questions:
+        q["subject"] = subject
+    return questions
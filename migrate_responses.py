@@ -0,0 +1,85 @@
+"""
+Move flat student_responses documents under tickets/{ticket_id}/responses
+
+Documents keep their IDs, so the migration can be interrupted and re-run
+safely. Set RESPONSES_LAYOUT=subcollection once it has finished.
+
+Usage:
+    python migrate_responses.py --dry-run
+    python migrate_responses.py --delete-source
+"""
+import argparse
+
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from firebase_helper import init_firestore, FIRESTORE_BATCH_LIMIT
+
+
+def migrate_responses(db, page_size=250, delete_source=False, dry_run=False):
+    """
+    Copy every flat response into its ticket's subcollection, page by page
+
+    Args:
+        db: Firestore client
+        page_size: Documents read and written per batch
+        delete_source: Also delete the flat document in the same batch
+        dry_run: Only count what would be moved
+
+    Returns:
+        dict: Counts of migrated and skipped (no ticket_id) documents
+    """
+    # A copy plus a delete is two operations per document
+    ops_per_doc = 2 if delete_source else 1
+    page_size = min(page_size, FIRESTORE_BATCH_LIMIT // ops_per_doc)
+
+    migrated = 0
+    skipped = 0
+    last_doc = None
+
+    while True:
+        query = db.collection("student_responses").order_by(FieldPath.document_id()).limit(page_size)
+        if last_doc is not None:
+            query = query.start_after(last_doc)
+        docs = list(query.stream())
+        if not docs:
+            break
+
+        batch = db.batch()
+        for doc in docs:
+            data = doc.to_dict()
+            ticket_id = (data.get("ticket_id") or "").upper().strip()
+            if not ticket_id:
+                skipped += 1
+                continue
+
+            target = db.collection("tickets").document(ticket_id).collection("responses").document(doc.id)
+            batch.set(target, data)
+            if delete_source:
+                batch.delete(doc.reference)
+            migrated += 1
+
+        if not dry_run:
+            batch.commit()
+        print(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} responses so far")
+
+        # Cursors are value-based, so this also works after the page was deleted
+        last_doc = docs[-1]
+        if len(docs) < page_size:
+            break
+
+    return {"migrated": migrated, "skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move student_responses into per-ticket subcollections")
+    parser.add_argument("--page-size", type=int, default=250)
+    parser.add_argument("--delete-source", action="store_true", help="Delete flat documents after copying")
+    parser.add_argument("--dry-run", action="store_true", help="Count documents without writing")
+    args = parser.parse_args()
+
+    result = migrate_responses(init_firestore(), args.page_size, args.delete_source, args.dry_run)
+    print(f"Done: {result['migrated']} migrated, {result['skipped']} skipped without ticket_id")
+
+
+if __name__ == "__main__":
+    main()
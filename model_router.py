@@ -0,0 +1,136 @@
+import time
+import threading
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from cassette import get_active_cassette, record_model_call, replay_model_call
+from usage_tracking import check_budget, record_usage
+from config import (
+    MODEL_ROUTES,
+    MODEL_TIMEOUTS,
+    MODEL_LATENCY_SMOOTHING,
+    MODEL_TIMEOUT_COOLDOWN,
+)
+
+# Per-model latency statistics shared by every session in this process
+_latency_stats = {}
+_stats_lock = threading.Lock()
+
+TIMEOUT_ERRORS = (google_exceptions.DeadlineExceeded, TimeoutError)
+
+
+def record_latency(model_name, seconds, timed_out=False):
+    """
+    Record the latency of a model call
+
+    Args:
+        model_name: Name of the Gemini model that was called
+        seconds: Wall-clock duration of the call
+        timed_out: True if the call hit its timeout
+    """
+    with _stats_lock:
+        stats = _latency_stats.setdefault(model_name, {
+            "calls": 0,
+            "timeouts": 0,
+            "avg_latency": None,
+            "last_timeout_at": None
+        })
+        stats["calls"] += 1
+
+        if timed_out:
+            stats["timeouts"] += 1
+            stats["last_timeout_at"] = time.monotonic()
+            return
+
+        if stats["avg_latency"] is None:
+            stats["avg_latency"] = seconds
+        else:
+            stats["avg_latency"] = (MODEL_LATENCY_SMOOTHING * seconds
+                                    + (1 - MODEL_LATENCY_SMOOTHING) * stats["avg_latency"])
+
+
+def get_latency_stats():
+    """Return a snapshot of the per-model latency statistics"""
+    with _stats_lock:
+        return {model: dict(stats) for model, stats in _latency_stats.items()}
+
+
+def route_models(call_type):
+    """
+    Order the configured models for a call type
+
+    Models keep their configured preference unless they timed out recently
+    or their average latency already exceeds the call type's timeout, in
+    which case they are tried only after the healthy ones.
+
+    Args:
+        call_type: Key into MODEL_ROUTES (e.g. 'ticket', 'regenerate')
+
+    Returns:
+        list: Model names in the order they should be tried
+    """
+    models = MODEL_ROUTES.get(call_type, MODEL_ROUTES["ticket"])
+    timeout = MODEL_TIMEOUTS.get(call_type, MODEL_TIMEOUTS["ticket"])
+    now = time.monotonic()
+
+    def is_degraded(model_name):
+        stats = _latency_stats.get(model_name)
+        if not stats:
+            return False
+        last_timeout = stats["last_timeout_at"]
+        if last_timeout is not None and now - last_timeout < MODEL_TIMEOUT_COOLDOWN:
+            return True
+        return stats["avg_latency"] is not None and stats["avg_latency"] > timeout
+
+    with _stats_lock:
+        healthy = [m for m in models if not is_degraded(m)]
+        degraded = [m for m in models if is_degraded(m)]
+
+    return healthy + degraded
+
+
+def generate_content(prompt, call_type="ticket"):
+    """
+    Send a prompt to the routed model, falling back to the next model on timeout
+
+    Args:
+        prompt: Full prompt text
+        call_type: Key into MODEL_ROUTES selecting the model tier
+
+    Returns:
+        tuple: (response, model_name) of the first model that answered
+
+    Raises:
+        BudgetExceededError: If the teacher's daily budget is used up
+    """
+    check_budget()
+
+    cassette = get_active_cassette()
+    if cassette and cassette.replaying:
+        response, model_name, latency = replay_model_call(cassette, prompt, call_type)
+        record_usage(call_type, model_name, response, latency)
+        return response, model_name
+
+    timeout = MODEL_TIMEOUTS.get(call_type, MODEL_TIMEOUTS["ticket"])
+    last_error = None
+
+    for model_name in route_models(call_type):
+        model = genai.GenerativeModel(model_name)
+        start = time.perf_counter()
+        try:
+            response = model.generate_content(prompt, request_options={"timeout": timeout})
+        except TIMEOUT_ERRORS as e:
+            record_latency(model_name, time.perf_counter() - start, timed_out=True)
+            print(f"Model {model_name} timed out after {timeout}s, trying fallback")
+            last_error = e
+            continue
+
+        latency = time.perf_counter() - start
+        record_latency(model_name, latency)
+        record_usage(call_type, model_name, response, latency)
+        if cassette:
+            record_model_call(cassette, prompt, call_type, model_name, response, latency)
+        return response, model_name
+
+    raise last_error
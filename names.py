@@ -0,0 +1,12 @@
+"""
+Normalization of typed names (students, teachers)
+
+Names are compared and hashed into document IDs in a case- and
+whitespace-insensitive form, so "Alice  Smith" and "alice smith" refer to
+the same person everywhere.
+"""
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a typed name"""
+    return " ".join((name or "").split()).casefold()
@@ -0,0 +1,44 @@
+import time
+import functools
+import threading
+
+from config import PERF_LOGGING
+
+# Accumulated server time per label, shared by every session in this process
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def record_timing(label, seconds):
+    """Add one measurement for a label and log it when PERF_LOGGING is on"""
+    with _timings_lock:
+        stats = _timings.setdefault(label, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += seconds * 1000
+        stats["max_ms"] = max(stats["max_ms"], seconds * 1000)
+
+    if PERF_LOGGING:
+        print(f"PERF {label}: {seconds * 1000:.1f} ms")
+
+
+def timed(label):
+    """Decorator that records how long each call of the function takes"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_timing(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def get_timings():
+    """Return {label: {count, total_ms, max_ms, avg_ms}} for every timed label"""
+    with _timings_lock:
+        return {
+            label: {**stats, "avg_ms": stats["total_ms"] / stats["count"]}
+            for label, stats in _timings.items()
+        }
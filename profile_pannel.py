@@ -1,6 +1,7 @@
 import streamlit as st
 from firebase_admin import auth
 from firebase_config import init_firebase
+from config import ADMIN_STATS_CACHE_TTL
 
 db = init_firebase()
 
@@ -39,11 +40,89 @@ def create_user_account():
         except Exception as e:
             st.error(f"❌ Error: {e}")
 
+def bulk_import_users():
+    st.title("👥 Bulk Import Users")
+    st.markdown("Upload a CSV with `email`, `password` and `role` (Student or Teacher) columns. "
+                "Re-uploading the same file is safe: existing accounts are kept and only their role is updated.")
+
+    uploaded = st.file_uploader("User CSV", type=["csv"])
+    if uploaded is None:
+        return
+
+    import io
+    from user_provisioning import parse_user_csv, import_users
+
+    rows, invalid = parse_user_csv(io.StringIO(uploaded.getvalue().decode("utf-8-sig")))
+    st.markdown(f"**Valid rows:** {len(rows)} | **Invalid rows:** {len(invalid)}")
+    if invalid:
+        st.warning("Fix or remove these rows, or import only the valid ones:")
+        st.dataframe(invalid, use_container_width=True)
+
+    if rows and st.button(f"Import {len(rows)} Users"):
+        with st.spinner("Importing users..."):
+            results = import_users(db, rows)
+        created = sum(1 for r in results if r["status"] == "created")
+        existing = sum(1 for r in results if r["status"] == "exists")
+        failed = sum(1 for r in results if r["status"] == "failed")
+        st.success(f"✅ Created {created} | Already existed {existing} | Failed {failed}")
+        st.dataframe(sorted(results + invalid, key=lambda r: r["row"]), use_container_width=True)
+
+@st.cache_data(ttl=ADMIN_STATS_CACHE_TTL, show_spinner="Running aggregation queries...")
+def load_school_stats(days):
+    from firebase_helper import get_school_stats
+    return get_school_stats(db, days)
+
+def school_statistics():
+    st.title("📈 School Statistics")
+
+    days = st.slider("Days of response history", 7, 90, 14)
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🔄 Refresh Now"):
+            load_school_stats.clear()
+    with col2:
+        if st.button("🧮 Rescan Teachers and Subjects", help="Needed once for tickets created before statistics existed"):
+            from firebase_helper import rebuild_stats_dimensions
+            with st.spinner("Scanning tickets..."):
+                rebuild_stats_dimensions(db)
+            load_school_stats.clear()
+
+    try:
+        stats = load_school_stats(days)
+    except Exception as e:
+        st.error(f"❌ Error loading statistics: {e}")
+        return
+
+    st.caption(f"Computed at {stats['generated_at'].strftime('%Y-%m-%d %H:%M')}, "
+               f"refreshed every {ADMIN_STATS_CACHE_TTL // 60} minutes")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("🎫 Tickets", stats["total_tickets"])
+    col2.metric("📝 Responses", stats["total_responses"])
+    col3.metric("📊 Average Score", f"{stats['average_score']}%")
+
+    st.subheader("Responses per Day")
+    st.bar_chart(stats["responses_per_day"], x="day", y="responses")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Tickets per Teacher")
+        st.dataframe(stats["tickets_per_teacher"], use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader("Mean Score per Subject")
+        st.dataframe(stats["subject_scores"], use_container_width=True, hide_index=True)
+
 def main():
     if not st.session_state.get("admin_logged_in", False):
         admin_login()
     else:
-        create_user_account()
+        mode = st.sidebar.radio("Mode", ["Single User", "Bulk CSV Import", "School Statistics"])
+        if mode == "Single User":
+            create_user_account()
+        elif mode == "Bulk CSV Import":
+            bulk_import_users()
+        else:
+            school_statistics()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,116 @@
+"""
+Balanced assignment of a ticket's questions to students
+
+Instead of a uniform random sample, each student gets the questions that
+have been shown least so far, spread across topics: topics are
+visited in order of how little they have been seen, and within a topic the
+least exposed question is picked. Ties are broken at random, so students
+sitting next to each other still see different sets. Every question
+therefore collects answers at nearly the same rate and per-question
+statistics settle with fewer submissions.
+
+A question's exposure is the number of submitted responses that showed
+it: it is recorded when a response is saved, not when questions are
+assigned, so reloads and abandoned quizzes don't inflate it. Counts live
+in EXPOSURE_COUNTER_SHARDS small documents per ticket
+(tickets/{ticket_id}/exposure/{shard}); each submission increments one
+random shard, so a whole class submitting at once doesn't contend on a
+single document.
+"""
+import random
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from ability_model import question_key
+from config import EXPOSURE_COUNTER_SHARDS
+
+
+def exposure_refs(db, ticket_id):
+    shards = db.collection("tickets").document(ticket_id).collection("exposure")
+    return [shards.document(str(shard)) for shard in range(EXPOSURE_COUNTER_SHARDS)]
+
+
+def get_exposure_counts(db, ticket_id):
+    """Submitted responses that showed each question (by question key), summed over shards"""
+    counts = {}
+    for snap in db.get_all(exposure_refs(db, ticket_id)):
+        if snap.exists:
+            for key, value in (snap.to_dict().get("counts") or {}).items():
+                counts[key] = counts.get(key, 0) + value
+    return counts
+
+
+def choose_balanced_questions(questions, exposure, count, rng=random):
+    """
+    Pick `count` questions, least exposed first and stratified by topic
+
+    Args:
+        questions: The ticket's questions
+        exposure: {question_key: submitted responses that showed it}
+        count: Number of questions to assign
+        rng: Random source used for tie-breaking
+
+    Returns:
+        list: Indices into questions, in the order they will be shown
+    """
+    counts = {question_key(q): exposure.get(question_key(q), 0) for q in questions}
+    by_topic = {}
+    for index, question in enumerate(questions):
+        by_topic.setdefault(question.get("topic") or "General", []).append(index)
+
+    chosen = []
+    while len(chosen) < min(count, len(questions)):
+        # Least seen topic that still has unassigned questions
+        open_topics = [topic for topic, indices in by_topic.items() if any(i not in chosen for i in indices)]
+        topic_exposure = {
+            topic: sum(counts[question_key(questions[i])] for i in by_topic[topic]) / len(by_topic[topic])
+            for topic in open_topics
+        }
+        topic = min(open_topics, key=lambda t: (topic_exposure[t], rng.random()))
+
+        index = min((i for i in by_topic[topic] if i not in chosen),
+                    key=lambda i: (counts[question_key(questions[i])], rng.random()))
+        chosen.append(index)
+        # Count the pick straight away so the next topic choice accounts for it
+        counts[question_key(questions[index])] += 1
+
+    rng.shuffle(chosen)
+    return chosen
+
+
+def record_exposure(db, ticket_id, question_ids):
+    """Count one submitted response towards the exposure of the questions it showed"""
+    try:
+        shard = random.choice(exposure_refs(db, ticket_id))
+        shard.set({
+            "counts": {question_id: firestore.Increment(1) for question_id in question_ids},
+            "updated_at": datetime.now()
+        }, merge=True)
+    except Exception as e:
+        print(f"Error recording question exposure: {e}")
+
+
+def assign_questions(db, ticket, count):
+    """
+    Choose a balanced question set for one student
+
+    Args:
+        db: Firestore client
+        ticket: Ticket dict with its full question list
+        count: Number of questions each student answers
+
+    Returns:
+        list: The assigned question dicts
+    """
+    questions = ticket.get("questions", [])
+    if len(questions) <= count:
+        return list(questions)
+
+    try:
+        exposure = get_exposure_counts(db, ticket["ticket_id"])
+    except Exception as e:
+        print(f"Error reading question exposure: {e}")
+        exposure = {}
+
+    return [questions[i] for i in choose_balanced_questions(questions, exposure, count)]
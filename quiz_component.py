@@ -0,0 +1,60 @@
+import os
+import functools
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+_COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "exit_ticket_quiz")
+
+_exit_ticket_quiz = components.declare_component("exit_ticket_quiz", path=_COMPONENT_DIR)
+
+
+def _lock_answers(questions, key):
+    """on_change callback: keep the first valid answer the browser reports for each question"""
+    locked = st.session_state.setdefault(f"{key}_answers", {})
+    value = st.session_state.get(key) or {}
+    # The browser is untrusted: keep only answers to real questions and options
+    for index, answer in (value.get("answers") or {}).items():
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < len(questions) and answer in questions[index]["options"]:
+            locked.setdefault(index, answer)
+
+
+def exit_ticket_quiz(questions, key):
+    """
+    Render the browser-side exit ticket quiz
+
+    Navigation happens in the browser, but the answer key stays on the
+    server until it is needed: each submitted answer is reported back and
+    locked in session state, and only then are that question's correct
+    answer and explanation sent to the browser. Changing an answer after
+    seeing the key has no effect. Call it inside a fragment so each answer
+    only reruns the quiz.
+
+    Args:
+        questions: Sampled question objects (question, options,
+            correct_answer, explanation)
+        key: Streamlit widget key; the locked answers are kept under
+            "{key}_answers" in session state
+
+    Returns:
+        dict: {question_index: answer} once the student finishes, None before that
+    """
+    locked = st.session_state.setdefault(f"{key}_answers", {})
+    payload = []
+    for index, q in enumerate(questions):
+        item = {"question": q["question"], "options": q["options"]}
+        if index in locked:
+            item.update(answer=locked[index], correct_answer=q["correct_answer"],
+                        explanation=q.get("explanation", ""))
+        payload.append(item)
+
+    # Component callbacks take no arguments, so bind them here
+    value = _exit_ticket_quiz(questions=payload, key=key, default=None,
+                              on_change=functools.partial(_lock_answers, questions, key))
+    if not value or not value.get("finished") or len(locked) < len(questions):
+        return None
+    return dict(locked)
@@ -0,0 +1,172 @@
+"""
+Recompute stored scores after a ticket's answer key changes
+
+All of a ticket's responses are loaded once and turned into an answer
+matrix (responses x questions, -1 where a question was not answered), so
+grading against the old and new answer keys is a pair of vectorized
+comparisons. Changed scores are written back with batched writes, and the
+topic rollups are corrected with the difference between the old and new
+per-question totals in the same pass.
+"""
+import numpy as np
+from firebase_admin import firestore
+from datetime import datetime
+
+from firebase_helper import (
+    ticket_responses_query, get_ticket_versions, match_response_answers, response_locatable,
+    topic_rollup_id, FIRESTORE_BATCH_LIMIT
+)
+from ability_model import question_key
+
+UNANSWERED = -1
+
+
+def encode_answer(answer):
+    """Option letter to a column-friendly integer (A=0, B=1, ...)"""
+    if isinstance(answer, str) and len(answer) == 1 and answer.isalpha():
+        return ord(answer.upper()) - ord("A")
+    return UNANSWERED
+
+
+def answer_key_vector(questions):
+    return np.array([encode_answer(q.get("correct_answer")) for q in questions], dtype=np.int8)
+
+
+def response_columns(response, key_index, num_questions):
+    """
+    Map a response's answers to question columns of the ticket
+
+    Returns None for legacy responses whose positions cannot be located
+    (see firebase_helper.response_locatable).
+    """
+    if not response_locatable(response, num_questions):
+        return None
+    return dict(match_response_answers(response, [None] * num_questions, key_index))
+
+
+def build_answer_matrix(responses, question_versions):
+    """
+    Answer matrix plus the number of questions each student was shown
+
+    Args:
+        responses: Response dicts
+        question_versions: Question lists of every ticket version, oldest
+            first; edits keep positions, so any version's key finds its column
+
+    Returns:
+        tuple: (answers, shown, located) where located marks rows that could
+            be mapped to ticket questions
+    """
+    key_index = {}
+    for questions in question_versions:
+        key_index.update({question_key(q): i for i, q in enumerate(questions)})
+    num_questions = len(question_versions[-1])
+
+    answers = np.full((len(responses), num_questions), UNANSWERED, dtype=np.int8)
+    shown = np.zeros(len(responses), dtype=np.int32)
+    located = np.zeros(len(responses), dtype=bool)
+    for row, response in enumerate(responses):
+        columns = response_columns(response, key_index, num_questions)
+        if columns is None:
+            continue
+        located[row] = True
+        shown[row] = len(response.get("question_ids") or response.get("question_keys") or []) or num_questions
+        for column, answer in columns.items():
+            answers[row, column] = encode_answer(answer)
+    return answers, shown, located
+
+
+def rollup_totals(questions, answered, correct):
+    """Per (topic, subtopic) attempts and correct counts from per-question column sums"""
+    totals = {}
+    for column, question in enumerate(questions):
+        key = (question.get("topic") or "General", question.get("subtopic") or "General")
+        counts = totals.setdefault(key, [0, 0])
+        counts[0] += int(answered[column])
+        counts[1] += int(correct[column])
+    return totals
+
+
+def regrade_ticket(db, previous_ticket, updated_ticket, progress_callback=None):
+    """
+    Regrade every response of a ticket against its updated answer key
+
+    Args:
+        db: Firestore client
+        previous_ticket: Ticket before the edit (responses were saved against it)
+        updated_ticket: Ticket after the edit, with questions in the same order
+        progress_callback: Optional callable(done, total) after each committed batch
+
+    Returns:
+        dict: Counts of responses checked, scores changed, and legacy
+            responses skipped because their questions cannot be identified
+    """
+    ticket_id = updated_ticket["ticket_id"]
+    old_questions = previous_ticket.get("questions", [])
+    new_questions = updated_ticket.get("questions", [])[:len(old_questions)]
+
+    docs = list(ticket_responses_query(db, ticket_id).stream())
+    if not docs or not old_questions:
+        return {"checked": len(docs), "changed": 0, "skipped": 0}
+    responses = [doc.to_dict() for doc in docs]
+
+    # Responses are located through the questions they were answered against
+    versions = [v.get("questions", []) for v in reversed(get_ticket_versions(db, ticket_id))]
+    answers, shown, located = build_answer_matrix(responses, versions + [old_questions])
+    answered = answers != UNANSWERED
+    old_correct = (answers == answer_key_vector(old_questions)) & answered
+    answers = answers[:, :len(new_questions)]
+    answered = answered[:, :len(new_questions)]
+    old_correct = old_correct[:, :len(new_questions)]
+    new_correct = (answers == answer_key_vector(new_questions)) & answered
+
+    new_counts = new_correct.sum(axis=1)
+    stored_counts = np.array([r.get("score", {}).get("correct_count", 0) for r in responses])
+    percentages = np.divide(new_counts * 100.0, shown, out=np.zeros(len(shown)), where=shown > 0)
+    changed_rows = np.flatnonzero(located & (stored_counts != new_counts))
+
+    regraded_at = datetime.now()
+    writes = []
+    for row in changed_rows:
+        writes.append((docs[row].reference, {
+            "score": {
+                "correct_count": int(new_counts[row]),
+                "total_questions": int(shown[row]),
+                "percentage": float(percentages[row])
+            },
+            "regraded_at": regraded_at,
+            "graded_version": updated_ticket.get("version", 1)
+        }))
+
+    # Rollup corrections: remove what was counted before, add the regraded totals
+    teacher_name = updated_ticket.get("teacher_name", "")
+    subject = updated_ticket.get("subject", "")
+    deltas = {}
+    for sign, questions, correct in ((-1, old_questions, old_correct), (1, new_questions, new_correct)):
+        for key, (attempts, correct_count) in rollup_totals(
+                questions, answered.sum(axis=0), correct.sum(axis=0)).items():
+            delta = deltas.setdefault(key, [0, 0])
+            delta[0] += sign * attempts
+            delta[1] += sign * correct_count
+    for (topic, subtopic), (attempts, correct_count) in deltas.items():
+        if attempts or correct_count:
+            writes.append((db.collection("topic_rollups").document(
+                topic_rollup_id(teacher_name, subject, topic, subtopic)), {
+                "teacher_name": teacher_name,
+                "subject": subject,
+                "topic": topic,
+                "subtopic": subtopic,
+                "attempts": firestore.Increment(attempts),
+                "correct": firestore.Increment(correct_count),
+                "updated_at": regraded_at
+            }))
+
+    for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for ref, data in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+            batch.set(ref, data, merge=True)
+        batch.commit()
+        if progress_callback:
+            progress_callback(min(start + FIRESTORE_BATCH_LIMIT, len(writes)), len(writes))
+
+    return {"checked": len(docs), "changed": len(changed_rows), "skipped": int((~located).sum())}
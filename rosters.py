@@ -0,0 +1,168 @@
+"""
+Class rosters and roster-backed completion tracking
+
+A roster is a named list of students owned by a teacher. Tickets point to
+a roster through their roster_id, and completion is worked out with set
+operations between the roster's normalized names and the names that
+submitted, so a 500-student class costs one roster lookup and one pass
+over the ticket's responses rather than a query per student.
+"""
+import time
+import threading
+from datetime import datetime
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from ability_model import normalize_student_name
+from config import ROSTER_CACHE_TTL
+
+_roster_cache = {}
+_roster_cache_lock = threading.Lock()
+
+
+def parse_roster_text(text):
+    """One student per line (or comma separated); blank and duplicate names are dropped"""
+    students = []
+    seen = set()
+    for line in text.replace(",", "\n").splitlines():
+        name = " ".join(line.split())
+        if name and normalize_student_name(name) not in seen:
+            seen.add(normalize_student_name(name))
+            students.append(name)
+    return students
+
+
+def save_roster(db, teacher_name, name, students, roster_id=None):
+    """
+    Create or replace a roster
+
+    Args:
+        db: Firestore client
+        teacher_name: Teacher who owns the roster
+        name: Class name shown to the teacher
+        students: Student names as they will type them
+        roster_id: Existing roster to overwrite, or None for a new one
+
+    Returns:
+        str: The roster ID, or None on error
+    """
+    try:
+        collection = db.collection("rosters")
+        doc_ref = collection.document(roster_id) if roster_id else collection.document()
+        doc_ref.set({
+            "name": name,
+            "teacher_name": teacher_name,
+            "students": students,
+            "student_count": len(students),
+            "updated_at": datetime.now()
+        })
+        invalidate_roster(doc_ref.id)
+        return doc_ref.id
+    except Exception as e:
+        print(f"Error saving roster: {e}")
+        return None
+
+
+def delete_roster(db, roster_id):
+    try:
+        db.collection("rosters").document(roster_id).delete()
+        invalidate_roster(roster_id)
+        return True
+    except Exception as e:
+        print(f"Error deleting roster: {e}")
+        return False
+
+
+def get_rosters_by_teacher(db, teacher_name):
+    """Roster summaries (id, name, student_count) without the student lists"""
+    try:
+        docs = db.collection("rosters") \
+                 .where(filter=FieldFilter("teacher_name", "==", teacher_name)) \
+                 .select(["name", "student_count"]) \
+                 .stream()
+        rosters = [{"roster_id": doc.id, **doc.to_dict()} for doc in docs]
+        rosters.sort(key=lambda r: r.get("name", "").lower())
+        return rosters
+    except Exception as e:
+        print(f"Error retrieving rosters: {e}")
+        return []
+
+
+def get_roster(db, roster_id):
+    """
+    A roster with its normalized name set, cached for ROSTER_CACHE_TTL seconds
+
+    Returns:
+        dict: Roster fields plus "normalized" {normalized name: display name}, or None
+    """
+    now = time.monotonic()
+    with _roster_cache_lock:
+        cached = _roster_cache.get(roster_id)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    try:
+        snap = db.collection("rosters").document(roster_id).get()
+    except Exception as e:
+        print(f"Error retrieving roster: {e}")
+        return None
+    roster = None
+    if snap.exists:
+        roster = {"roster_id": roster_id, **snap.to_dict()}
+        roster["normalized"] = {normalize_student_name(s): s for s in roster.get("students", [])}
+
+    with _roster_cache_lock:
+        _roster_cache[roster_id] = (roster, now + ROSTER_CACHE_TTL)
+    return roster
+
+
+def invalidate_roster(roster_id=None):
+    """Drop a cached roster (or every cached roster if roster_id is None)"""
+    with _roster_cache_lock:
+        if roster_id is None:
+            _roster_cache.clear()
+        else:
+            _roster_cache.pop(roster_id, None)
+
+
+def assign_roster(db, ticket_id, roster_id):
+    """Attach a roster to a ticket (None detaches it)"""
+    try:
+        db.collection("tickets").document(ticket_id.upper().strip()).update({
+            "roster_id": roster_id,
+            "updated_at": datetime.now()
+        })
+        return True
+    except Exception as e:
+        print(f"Error assigning roster: {e}")
+        return False
+
+
+def compute_completion(roster, submitted_names):
+    """
+    Split a roster into submitted and missing students
+
+    Args:
+        roster: Roster from get_roster
+        submitted_names: Names on the ticket's responses
+
+    Returns:
+        dict: completion_rate (percentage), completed and missing roster names,
+            and unexpected names that submitted but are not on the roster
+    """
+    expected = roster["normalized"]
+    submitted = {normalize_student_name(name): name for name in submitted_names}
+
+    completed = expected.keys() & submitted.keys()
+    missing = expected.keys() - submitted.keys()
+    unexpected = submitted.keys() - expected.keys()
+
+    return {
+        "roster_id": roster["roster_id"],
+        "roster_name": roster.get("name", ""),
+        "roster_size": len(expected),
+        "completion_rate": round(len(completed) / len(expected) * 100, 1) if expected else 0,
+        "completed": sorted(expected[key] for key in completed),
+        "missing": sorted(expected[key] for key in missing),
+        "unexpected": sorted(submitted[key] for key in unexpected)
+    }
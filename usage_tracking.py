@@ -0,0 +1,276 @@
+"""
+Token, latency and cost accounting for model calls
+
+Every successful call made through model_router.generate_content is
+measured from the response's usage_metadata and priced with MODEL_PRICING.
+Calls made inside a usage_scope are attributed to that scope's teacher
+(and generation draft): one model_usage document per call, plus Increment
+counters in usage_daily/{date}_{teacher} that the dashboard and the budget
+check read with a single document get. Tickets record the total spent on
+generating them when they are published.
+
+Budgets: before each call in a scope, the teacher's counters for today are
+compared with DAILY_BUDGET_USD and DAILY_TOKEN_BUDGET, and
+BudgetExceededError is raised once either is used up. The counters are
+cached for BUDGET_CHECK_CACHE_SECONDS so parallel extract calls share one
+read, and a failed read lets the call through rather than aborting it.
+
+Cache hits (lecture chunks served from lecture_chunk_cache) are counted
+with an estimate of the prompt tokens they avoided, so the savings of the
+caches show up next to the spend.
+"""
+import time
+import uuid
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from firebase_admin import firestore
+
+from names import normalize_name
+from config import MODEL_PRICING, MODEL_ROUTES, DAILY_BUDGET_USD, DAILY_TOKEN_BUDGET
+
+# Rough characters per token, used only to estimate what a cache hit saved
+CHARS_PER_TOKEN = 4
+
+# Seconds a teacher's daily counters are reused by the budget check
+BUDGET_CHECK_CACHE_SECONDS = 5
+
+USAGE_FIELDS = ("calls", "prompt_tokens", "output_tokens", "total_tokens", "cost_usd",
+                "latency_seconds", "cache_hits", "tokens_saved", "cost_saved_usd")
+
+
+class BudgetExceededError(Exception):
+    """Raised before a model call when the teacher's daily budget is used up"""
+
+
+class UsageScope:
+    """Who the calls in a `with usage_scope(...)` block are billed to, and their running totals"""
+
+    def __init__(self, db, teacher_name, draft_id=None):
+        self.db = db
+        self.teacher_name = teacher_name
+        self.draft_id = draft_id or uuid.uuid4().hex
+        self.totals = dict.fromkeys(USAGE_FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, counts):
+        with self._lock:
+            for field, value in counts.items():
+                self.totals[field] += value
+
+
+_current_scope = contextvars.ContextVar("usage_scope", default=None)
+
+_budget_cache = {}
+_budget_cache_lock = threading.Lock()
+
+
+@contextmanager
+def usage_scope(db, teacher_name, draft_id=None):
+    """
+    Attribute the model calls made in this block to a teacher
+
+    Worker threads started inside the block see the scope only if they run
+    in a copy of the caller's context (contextvars.copy_context().run).
+
+    Args:
+        db: Firestore client the usage is written to (None keeps it in memory)
+        teacher_name: Teacher billed for the calls
+        draft_id: Groups the calls of one generation session until it is
+            published as a ticket
+    """
+    scope = UsageScope(db, teacher_name, draft_id)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def current_scope():
+    return _current_scope.get()
+
+
+def call_cost(model_name, prompt_tokens, output_tokens):
+    """USD cost of a call from per-million-token prices"""
+    input_price, output_price = MODEL_PRICING.get(model_name, MODEL_PRICING["default"])
+    return (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def usage_counts(response):
+    """(prompt, output, total) token counts reported on a model response"""
+    metadata = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(metadata, "prompt_token_count", 0) or 0
+    output_tokens = getattr(metadata, "candidates_token_count", 0) or 0
+    total_tokens = getattr(metadata, "total_token_count", 0) or prompt_tokens + output_tokens
+    return prompt_tokens, output_tokens, total_tokens
+
+
+def daily_usage_ref(db, teacher_name, day=None):
+    teacher_id = hashlib.sha256(normalize_name(teacher_name).encode("utf-8")).hexdigest()[:16]
+    return db.collection("usage_daily").document(f"{(day or date.today()).isoformat()}_{teacher_id}")
+
+
+def _increment_daily(scope, call_type, counts):
+    """Add counts to the scope teacher's counters for today, overall and per call type"""
+    daily_usage_ref(scope.db, scope.teacher_name).set({
+        "teacher_name": scope.teacher_name,
+        "date": date.today().isoformat(),
+        **{field: firestore.Increment(value) for field, value in counts.items()},
+        "by_call_type": {call_type: {field: firestore.Increment(value) for field, value in counts.items()}},
+        "updated_at": datetime.now()
+    }, merge=True)
+
+
+def check_budget():
+    """
+    Raise BudgetExceededError if the current scope's teacher is over today's budget
+
+    Calls outside a scope (scripts without a teacher) are not limited. If
+    the counters cannot be read the call is allowed (fail open).
+    """
+    scope = current_scope()
+    if scope is None or scope.db is None or not (DAILY_BUDGET_USD or DAILY_TOKEN_BUDGET):
+        return
+    cache_key = (date.today().isoformat(), scope.teacher_name)
+    now = time.monotonic()
+    with _budget_cache_lock:
+        cached = _budget_cache.get(cache_key)
+    if cached and cached[1] > now:
+        usage = cached[0]
+    else:
+        try:
+            usage = get_daily_usage(scope.db, scope.teacher_name)
+        except Exception as e:
+            print(f"Error reading daily usage for the budget check: {e}")
+            return
+        with _budget_cache_lock:
+            _budget_cache[cache_key] = (usage, now + BUDGET_CHECK_CACHE_SECONDS)
+    if DAILY_BUDGET_USD and usage.get("cost_usd", 0) >= DAILY_BUDGET_USD:
+        raise BudgetExceededError(
+            f"Today's AI budget of ${DAILY_BUDGET_USD:.2f} is used up. Try again tomorrow or ask an admin to raise it.")
+    if DAILY_TOKEN_BUDGET and usage.get("total_tokens", 0) >= DAILY_TOKEN_BUDGET:
+        raise BudgetExceededError(
+            f"Today's AI budget of {DAILY_TOKEN_BUDGET:,} tokens is used up. Try again tomorrow or ask an admin to raise it.")
+
+
+def record_usage(call_type, model_name, response, latency):
+    """
+    Account for one successful model call
+
+    Returns:
+        dict: The call's model, token counts, cost and latency
+    """
+    prompt_tokens, output_tokens, total_tokens = usage_counts(response)
+    record = {
+        "call_type": call_type,
+        "model": model_name,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": total_tokens,
+        "cost_usd": call_cost(model_name, prompt_tokens, output_tokens),
+        "latency_seconds": round(latency, 3)
+    }
+
+    scope = current_scope()
+    if scope is None:
+        return record
+
+    counts = {field: record[field] for field in ("prompt_tokens", "output_tokens", "total_tokens",
+                                                 "cost_usd", "latency_seconds")}
+    counts["calls"] = 1
+    scope.add(counts)
+    if scope.db is not None:
+        try:
+            scope.db.collection("model_usage").add({
+                **record,
+                "teacher_name": scope.teacher_name,
+                "draft_id": scope.draft_id,
+                "created_at": datetime.now()
+            })
+            _increment_daily(scope, call_type, counts)
+        except Exception as e:
+            print(f"Error recording model usage: {e}")
+    return record
+
+
+def record_cache_hits(call_type, prompts):
+    """
+    Count model calls avoided by a cache, with the prompt tokens they would have used
+
+    Args:
+        call_type: Call type the cached results stand in for
+        prompts: Prompt texts that did not have to be sent
+    """
+    scope = current_scope()
+    if scope is None or not prompts:
+        return
+    tokens_saved = sum(len(prompt) for prompt in prompts) // CHARS_PER_TOKEN
+    model_name = MODEL_ROUTES.get(call_type, MODEL_ROUTES["ticket"])[0]
+    counts = {
+        "cache_hits": len(prompts),
+        "tokens_saved": tokens_saved,
+        "cost_saved_usd": call_cost(model_name, tokens_saved, 0)
+    }
+    scope.add(counts)
+    if scope.db is not None:
+        try:
+            _increment_daily(scope, call_type, counts)
+        except Exception as e:
+            print(f"Error recording cache savings: {e}")
+
+
+def merge_usage(total, usage):
+    """Sum two usage dicts (either may be None)"""
+    merged = dict.fromkeys(USAGE_FIELDS, 0)
+    for source in (total or {}, usage or {}):
+        for field in USAGE_FIELDS:
+            merged[field] += source.get(field, 0)
+    return merged
+
+
+def record_ticket_usage(db, ticket_id, usage, draft_id=None):
+    """Store what generating a ticket's questions cost on the ticket itself"""
+    if not usage:
+        return False
+    try:
+        db.collection("tickets").document(ticket_id).update({
+            "generation_usage": {**{field: usage.get(field, 0) for field in USAGE_FIELDS}, "draft_id": draft_id}
+        })
+        return True
+    except Exception as e:
+        print(f"Error recording ticket usage: {e}")
+        return False
+
+
+def get_daily_usage(db, teacher_name, day=None):
+    """A teacher's usage counters for one day ({} if nothing was spent)"""
+    snap = daily_usage_ref(db, teacher_name, day).get()
+    return snap.to_dict() if snap.exists else {}
+
+
+def get_usage_history(db, teacher_name, days=14):
+    """
+    Daily usage for the last `days` days, oldest first
+
+    Returns:
+        list: One dict per day with "date" and every usage field (zeros on idle days)
+    """
+    try:
+        today = date.today()
+        days_list = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+        refs = [daily_usage_ref(db, teacher_name, day) for day in days_list]
+        snapshots = {snap.reference.path: snap for snap in db.get_all(refs)}
+        history = []
+        for day, ref in zip(days_list, refs):
+            snap = snapshots.get(ref.path)
+            data = snap.to_dict() if snap and snap.exists else {}
+            history.append({"date": day.isoformat(), **merge_usage(data, None),
+                            "by_call_type": data.get("by_call_type", {})})
+        return history
+    except Exception as e:
+        print(f"Error retrieving usage history: {e}")
+        return []
@@ -0,0 +1,150 @@
+import re
+import csv
+import hmac
+import secrets
+import hashlib
+
+from firebase_admin import auth
+
+
+# Limits of the Firebase Admin APIs used below
+AUTH_IMPORT_BATCH_SIZE = 1000
+AUTH_LOOKUP_BATCH_SIZE = 100
+FIRESTORE_BATCH_LIMIT = 500
+
+VALID_ROLES = ("Student", "Teacher")
+MIN_PASSWORD_LENGTH = 6
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def parse_user_csv(file_obj):
+    """
+    Read and validate a user CSV with email, password and role columns
+
+    Args:
+        file_obj: Text file object (or list of lines) with a header row
+
+    Returns:
+        tuple: (valid_rows, results) where results holds an "invalid" entry
+            for every row that failed validation
+    """
+    rows = []
+    results = []
+    seen_emails = set()
+
+    for row_number, raw in enumerate(csv.DictReader(file_obj), start=1):
+        email = (raw.get("email") or "").strip().lower()
+        password = raw.get("password") or ""
+        role = (raw.get("role") or "Student").strip().title()
+
+        error = None
+        if not EMAIL_PATTERN.match(email):
+            error = "Invalid email address"
+        elif email in seen_emails:
+            error = "Duplicate email in file"
+        elif len(password) < MIN_PASSWORD_LENGTH:
+            error = f"Password must be at least {MIN_PASSWORD_LENGTH} characters"
+        elif role not in VALID_ROLES:
+            error = f"Role must be one of {', '.join(VALID_ROLES)}"
+
+        if error:
+            results.append({"row": row_number, "email": email, "status": "invalid", "message": error})
+            continue
+
+        seen_emails.add(email)
+        rows.append({"row": row_number, "email": email, "password": password, "role": role})
+
+    return rows, results
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _uid_for_email(email):
+    """Deterministic UID so a re-run after a partial failure targets the same user"""
+    return hashlib.sha256(email.encode("utf-8")).hexdigest()[:28]
+
+
+def find_existing_users(emails):
+    """Map already-registered emails to their UIDs using batched lookups"""
+    existing = {}
+    for chunk in _chunks(emails, AUTH_LOOKUP_BATCH_SIZE):
+        result = auth.get_users([auth.EmailIdentifier(email) for email in chunk])
+        for user in result.users:
+            existing[user.email.lower()] = user.uid
+    return existing
+
+
+def import_users(db, rows):
+    """
+    Create Firebase Auth users and their role documents in bulk
+
+    Existing accounts are left untouched in Firebase Auth but still get
+    their role written, so re-running the same CSV is safe.
+
+    Args:
+        db: Firestore client
+        rows: Validated rows from parse_user_csv
+
+    Returns:
+        list: Per-row result dicts with status created / exists / failed
+    """
+    results = {}
+    try:
+        existing = find_existing_users([row["email"] for row in rows])
+    except Exception as e:
+        # Without knowing who exists nothing can be imported safely
+        print(f"Error looking up existing users: {e}")
+        return [{"row": row["row"], "email": row["email"], "status": "failed",
+                 "message": f"Account lookup failed: {e}"} for row in rows]
+
+    new_rows = [row for row in rows if row["email"] not in existing]
+    for row in rows:
+        if row["email"] in existing:
+            row["uid"] = existing[row["email"]]
+            results[row["row"]] = {"row": row["row"], "email": row["email"], "status": "exists",
+                                   "message": f"Account already exists, role set to {row['role']}"}
+
+    # Passwords are imported as HMAC-SHA256 hashes; Firebase rehashes on first sign-in
+    hash_key = secrets.token_bytes(32)
+    for chunk in _chunks(new_rows, AUTH_IMPORT_BATCH_SIZE):
+        records = []
+        for row in chunk:
+            row["uid"] = _uid_for_email(row["email"])
+            password_hash = hmac.new(hash_key, row["password"].encode("utf-8"), hashlib.sha256).digest()
+            records.append(auth.ImportUserRecord(uid=row["uid"], email=row["email"], password_hash=password_hash))
+
+        try:
+            import_result = auth.import_users(records, hash_alg=auth.UserImportHash.hmac_sha256(key=hash_key))
+            failures = {error.index: error.reason for error in import_result.errors}
+        except Exception as e:
+            print(f"Error importing users: {e}")
+            failures = {i: str(e) for i in range(len(chunk))}
+
+        for i, row in enumerate(chunk):
+            if i in failures:
+                results[row["row"]] = {"row": row["row"], "email": row["email"], "status": "failed",
+                                       "message": failures[i]}
+            else:
+                results[row["row"]] = {"row": row["row"], "email": row["email"], "status": "created",
+                                       "message": f"Created with role {row['role']}"}
+
+    # Write roles for every account that exists now
+    role_rows = [row for row in rows if results[row["row"]]["status"] != "failed"]
+    for chunk in _chunks(role_rows, FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for row in chunk:
+            batch.set(db.collection("users").document(row["uid"]), {
+                "email": row["email"],
+                "role": row["role"]
+            }, merge=True)
+        try:
+            batch.commit()
+        except Exception as e:
+            print(f"Error writing user roles: {e}")
+            for row in chunk:
+                results[row["row"]].update(status="failed", message=f"Role not saved: {e}")
+
+    return [results[row["row"]] for row in rows]